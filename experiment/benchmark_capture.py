@@ -0,0 +1,153 @@
+"""
+Capture throughput benchmark for StereoCamera.
+
+Runs the end-to-end preview and capture_images() path against a camera backend
+(the file replay simulator by default, so it runs off the Pi) and reports
+preview latency, capture latency, shutter lag (exposure start minus the click,
+which happened --click-delay seconds before capture_images() is called, like the
+Streamlit rerun round trip), time until the pair is on disk, pairs/sec and peak RSS.
+
+    python experiment/benchmark_capture.py --pairs 20
+    python experiment/benchmark_capture.py --pairs 20 --zsl nearest --zsl-mb 512
+
+The quality gate is off unless --quality-gate is given, the black left test
+image of the replay backend fails it.
+    python experiment/benchmark_capture.py --backend picamera2
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import resource
+import tempfile
+import statistics
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(REPO_DIR, "src"))
+
+from cam import StereoCamera
+from cam.backends import get_backend
+from storage import CaptureCatalog
+import metrics
+
+
+class BenchmarkNumberplate:
+    """
+    In-memory stand-in for numberplate.Numberplate that is never full.
+    """
+    full = False
+    numberplate = "BENCH"
+
+    def add(self):
+        return True
+
+    def remove(self):
+        pass
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'mean_ms': statistics.mean(samples) * 1e3,
+        'p50_ms': samples[len(samples) // 2] * 1e3,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e3,
+        'max_ms': samples[-1] * 1e3,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kB on Linux, children covers the writer processes
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {'self_mb': own / 1024, 'children_mb': children / 1024}
+
+
+def stage_latencies():
+    return {
+        stage: {'count': values['count'], 'p50_ms': values['p50'] * 1e3, 'p95_ms': values['p95'] * 1e3}
+        for stage, values in metrics.REGISTRY.snapshot().items() if values['count']
+    }
+
+
+def run(args):
+    metrics.enable(args.metrics)
+    backend_kwargs = {}
+    if args.backend == "replay":
+        backend_kwargs = dict(
+            left_files=[os.path.join(REPO_DIR, "left_test.jpg")],
+            right_files=[os.path.join(REPO_DIR, "right_test.jpg")],
+            frame_interval=args.frame_interval,
+            start_delay=args.start_delay,
+            switch_delay=args.switch_delay,
+        )
+    backend = get_backend(args.backend, **backend_kwargs)
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "data", "images"))
+        catalog = CaptureCatalog(os.path.join(root, "catalog.sqlite"))
+        cam = StereoCamera(backend=backend, storage_format=args.storage_format, catalog=catalog)
+        cam.ROOT_DIR = root
+        numberplate = BenchmarkNumberplate()
+        cam.quality.update({'enabled': args.quality_gate})
+        if args.zsl:
+            cam.enable_zsl(args.zsl_mb, args.zsl)
+
+        preview_latency = []
+        for _ in range(args.previews):
+            start = time.perf_counter()
+            cam.get_preview()
+            preview_latency.append(time.perf_counter() - start)
+
+        capture_latency = []
+        shutter_lag = []
+        handles = []
+        start_all = time.perf_counter()
+        for _ in range(args.pairs):
+            click_ns = time.monotonic_ns()
+            time.sleep(args.click_delay)
+            start = time.perf_counter()
+            handle = cam.capture_images(label="bench", numberplate=numberplate, at_ns=click_ns)
+            capture_latency.append(time.perf_counter() - start)
+            exposure_ns = min(handle.metadata['left_timestamp'], handle.metadata['right_timestamp'])
+            shutter_lag.append((exposure_ns - click_ns) / 1e9)
+            handles.append(handle)
+        for handle in handles:
+            handle.result()
+        elapsed = time.perf_counter() - start_all
+
+        cam.close()
+
+    return {
+        'backend': backend.name,
+        'storage_format': args.storage_format,
+        'preview_latency': summarize(preview_latency) if preview_latency else None,
+        'capture_latency': summarize(capture_latency) if capture_latency else None,
+        'shutter_lag': summarize(shutter_lag) if shutter_lag else None,
+        'zsl': args.zsl,
+        'quality_gate': args.quality_gate,
+        'pairs': args.pairs,
+        'pairs_per_sec': args.pairs / elapsed if elapsed else None,
+        'peak_rss': peak_rss_mb(),
+        'stages': stage_latencies() if args.metrics else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="replay", help="Camera backend, replay or picamera2")
+    parser.add_argument("--storage-format", default="png", help="png or stpair")
+    parser.add_argument("--pairs", type=int, default=10, help="Number of stereo pairs to capture")
+    parser.add_argument("--previews", type=int, default=10, help="Number of previews to take")
+    parser.add_argument("--frame-interval", type=float, default=1 / 30, help="Replay seconds per frame")
+    parser.add_argument("--start-delay", type=float, default=1.0, help="Replay camera start time in seconds")
+    parser.add_argument("--switch-delay", type=float, default=0.1, help="Replay mode switch time in seconds")
+    parser.add_argument("--metrics", action="store_true", help="Record and report per-stage latencies")
+    parser.add_argument("--zsl", choices=["nearest", "sharpest"], help="Capture from the zero shutter lag ring")
+    parser.add_argument("--zsl-mb", type=float, help="Zero shutter lag ring size in MB")
+    parser.add_argument("--quality-gate", action="store_true", help="Check pairs with the quality gate")
+    parser.add_argument("--click-delay", type=float, default=0.0, help="Seconds between click and capture call")
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=2))
@@ -0,0 +1,109 @@
+"""
+Speed and accuracy of the coarse-to-fine tyre-ROI disparity against full-frame SGBM.
+
+Uses a synthetic stereo pair with known disparity (a textured tyre with grooves
+in front of a far background) or a real pair with --left/--right, where the
+full-frame result serves as the reference.
+
+    python experiment/benchmark_depth.py
+    python experiment/benchmark_depth.py --left img/test_l.png --right img/test_r.png
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from depth.matcher import load_config, compute_disparity, focal_length_px
+from depth.roi import coarse_to_fine_disparity
+
+
+def synthetic_pair(width, height, config, tyre_mm=1000.0, background_mm=3000.0, groove_mm=8.0, seed=0):
+    """
+    Returns:
+        tuple: (left, right, true_disparity, tread_mask)
+    """
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (0, 0), 1.5)
+    texture = cv2.normalize(texture, None, 0, 255, cv2.NORM_MINMAX)
+
+    focal_px = focal_length_px(config, width)
+    depth = np.full((height, width), background_mm, np.float32)
+    yy, xx = np.mgrid[0:height, 0:width]
+    tyre = (xx - width / 2) ** 2 + (yy - height / 2) ** 2 < (min(width, height) * 0.35) ** 2
+    grooves = tyre & ((xx // max(1, width // 40)) % 4 == 0)
+    depth[tyre] = tyre_mm
+    depth[grooves] = tyre_mm + groove_mm
+    disparity = focal_px * config['baseline_mm'] / depth
+
+    # Right image samples the left one shifted by the disparity
+    map_x = (xx + disparity).astype(np.float32)
+    right = cv2.remap(texture, map_x, yy.astype(np.float32), cv2.INTER_LINEAR)
+    tread = cv2.erode(tyre.astype(np.uint8), np.ones((15, 15), np.uint8)).astype(bool)
+    return texture, right, disparity, tread
+
+
+def error(disparity, reference, mask):
+    valid = mask & (disparity > 0) & (reference > 0)
+    return {
+        'mae_px': float(np.abs(disparity[valid] - reference[valid]).mean()) if valid.any() else None,
+        'coverage': float(valid.sum() / max(1, mask.sum())),
+    }
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--left", help="Left image, synthetic pair if omitted")
+    parser.add_argument("--right", help="Right image")
+    parser.add_argument("--size", default="3280x2464", help="Synthetic image size")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--config", help="Matcher config JSON")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.left:
+        left = cv2.imread(args.left, cv2.IMREAD_GRAYSCALE)
+        right = cv2.imread(args.right, cv2.IMREAD_GRAYSCALE)
+        truth, tread = None, None
+    else:
+        width, height = (int(v) for v in args.size.split("x"))
+        left, right, truth, tread = synthetic_pair(width, height, config)
+
+    focal_px = focal_length_px(config, left.shape[1])
+    full, full_time = timed(lambda: compute_disparity(left, right, config), args.repeat)
+    (roi_disparity, roi), roi_time = timed(
+        lambda: coarse_to_fine_disparity(left, right, config, focal_px, config['baseline_mm']), args.repeat
+    )
+
+    if truth is None:
+        # Real pair: compare against full frame inside the detected ROI
+        truth = full
+        tread = np.zeros(full.shape, bool)
+        if roi is not None:
+            x, y, w, h = roi
+            tread[y:y + h, x:x + w] = True
+
+    print(json.dumps({
+        'size': f"{left.shape[1]}x{left.shape[0]}",
+        'roi': roi,
+        'full': dict(seconds=full_time, **error(full, truth, tread)),
+        'roi_coarse_to_fine': dict(seconds=roi_time, **error(roi_disparity, truth, tread)),
+        'speedup': full_time / roi_time,
+    }, indent=2))
@@ -0,0 +1,100 @@
+"""
+Session image memory and rerun payload benchmark.
+
+Before: every session kept the last full resolution pair (2 x 24 MB arrays) in
+st.session_state and st.image encoded it again on every rerun (PNG, scaled to
+Streamlit's 1460 px content width). After: sessions keep two keys, the display
+copies are JPEG encoded once into the shared utils.display.DisplayImages cache and
+unchanged bytes keep their media URL, so a rerun sends no image data.
+
+    python experiment/benchmark_display.py --sessions 6 --reruns 20
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(REPO_DIR, "src"))
+
+from utils.display import DisplayImages
+
+SENSOR_SIZE = (3280, 2464)
+CONTENT_WIDTH = 1460  # Streamlit scales wider images down to this
+
+
+def make_frame():
+    # Test image scaled to the sensor, real captures have about its detail
+    with Image.open(os.path.join(REPO_DIR, "right_test.jpg")) as image:
+        return np.asarray(image.convert("RGB").resize(SENSOR_SIZE, Image.BILINEAR))
+
+
+def encode_before(frame):
+    image = Image.fromarray(frame)
+    image = image.resize((CONTENT_WIDTH, round(image.height * CONTENT_WIDTH / image.width)), Image.BILINEAR)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return len(buffer.getvalue())
+
+
+def run(args):
+    frame = make_frame()
+
+    # Before: per session state and per rerun encoding of both frames
+    before_session = 2 * frame.nbytes
+    start = time.perf_counter()
+    before_payload = 2 * encode_before(frame)
+    before_rerun = 2 * (time.perf_counter() - start)
+
+    # After: every session shows its own pair, the display copies share one cache
+    images = DisplayImages()
+    put_seconds = 0.0
+    for session in range(args.sessions):
+        shifted = np.roll(frame, 16 * session, axis=1)
+        start = time.perf_counter()
+        keys = [images.put(shifted), images.put(shifted[:, ::-1])]
+        put_seconds += time.perf_counter() - start
+    put_seconds /= 2 * args.sessions
+    after_session = sum(sys.getsizeof(key) for key in keys)
+    start = time.perf_counter()
+    for _ in range(args.reruns):
+        for key in keys:
+            images.get(key)
+    after_rerun = (time.perf_counter() - start) / args.reruns
+    after_capture_payload = sum(len(images.get(key)) for key in keys)  # first show after a capture
+
+    return {
+        'sessions': args.sessions,
+        'before': {
+            'session_bytes': before_session,
+            'all_sessions_bytes': args.sessions * before_session,
+            'rerun_payload_bytes': before_payload,
+            'rerun_encode_s': before_rerun,
+        },
+        'after': {
+            'session_bytes': after_session,
+            'shared_cache_bytes': images.nbytes,
+            'all_sessions_bytes': args.sessions * after_session + images.nbytes,
+            'capture_payload_bytes': after_capture_payload,
+            'rerun_payload_bytes': 0,  # same bytes, same media URL
+            'capture_encode_s': put_seconds,
+            'rerun_s': after_rerun,
+        },
+        'memory_reduction': (args.sessions * before_session) / (args.sessions * after_session + images.nbytes),
+        'payload_reduction_first_show': before_payload / after_capture_payload,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=6, help="Connected browser sessions")
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=4))
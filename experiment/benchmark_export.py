@@ -0,0 +1,136 @@
+"""
+Dataset export benchmark.
+
+Creates synthetic PNG pairs plus their catalog, exports them into tar shards
+and compares reading the pairs file by file (listing data/images and pairing
+_L/_R by filename, like the training jobs do) with streaming the shards.
+A second export with new captures shows the incremental append.
+
+    python experiment/benchmark_export.py --pairs 2000
+    python experiment/benchmark_export.py --pairs 2000 --size 820x616 --shard-size-mb 64
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(REPO_DIR, "src"))
+
+from storage import CaptureCatalog, export_shards, iter_samples
+
+
+def make_captures(images_dir, catalog, count, size):
+    width, height = size
+    rng = np.random.default_rng(0)
+    # One noisy frame, PNG sizes like a real capture instead of flat images
+    frame = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    records = []
+    for index in range(count):
+        unique_id = str(uuid.uuid4())
+        label = str(index % 8)
+        paths = []
+        for side in ("L", "R"):
+            path = os.path.join(images_dir, f"{unique_id}_{label}_{side}.png")
+            Image.fromarray(frame).save(path, compress_level=1)
+            paths.append(path)
+        metadata = {'id': unique_id, 'label': label, 'numberplate': "S-AB-1", 'controls': {'ExposureTime': 20000}}
+        with open(os.path.join(images_dir, f"{unique_id}_{label}.json"), "w") as f:
+            json.dump(metadata, f)
+        records.append({
+            'id': unique_id, 'numberplate': "S-AB-1", 'label': label, 'storage_format': "png",
+            'paths': paths, 'metadata': metadata,
+        })
+    catalog.add(records)
+
+
+def read_files(images_dir):
+    # Per-file access: list, pair by filename, open every file
+    count = 0
+    for filename in sorted(os.listdir(images_dir)):
+        if not filename.endswith("_L.png"):
+            continue
+        name = filename[:-len("_L.png")]
+        for suffix in ("_L.png", "_R.png", ".json"):
+            with open(os.path.join(images_dir, name + suffix), "rb") as f:
+                f.read()
+        count += 1
+    return count
+
+
+def drop_caches():
+    # Needs root, otherwise the page cache makes both reads memory bound
+    try:
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+
+def run(args):
+    size = tuple(int(value) for value in args.size.split("x"))
+    with tempfile.TemporaryDirectory() as root:
+        images_dir = os.path.join(root, "images")
+        shards_dir = os.path.join(root, "shards")
+        os.makedirs(images_dir)
+        catalog = CaptureCatalog(os.path.join(root, "catalog.sqlite"))
+        make_captures(images_dir, catalog, args.pairs, size)
+
+        start = time.perf_counter()
+        entries = export_shards(shards_dir, catalog, max_bytes=int(args.shard_size_mb * 2**20), workers=args.workers)
+        export_seconds = time.perf_counter() - start
+
+        cold = drop_caches()
+        start = time.perf_counter()
+        file_pairs = read_files(images_dir)
+        files_seconds = time.perf_counter() - start
+
+        drop_caches()
+        start = time.perf_counter()
+        shard_pairs = sum(1 for _ in iter_samples(shards_dir))
+        shards_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        shuffled_pairs = sum(1 for _ in iter_samples(shards_dir, shuffle=256, seed=0))
+        shuffled_seconds = time.perf_counter() - start
+
+        make_captures(images_dir, catalog, args.new_pairs, size)
+        start = time.perf_counter()
+        appended = export_shards(shards_dir, catalog, max_bytes=int(args.shard_size_mb * 2**20), workers=args.workers)
+        append_seconds = time.perf_counter() - start
+
+    return {
+        'pairs': args.pairs,
+        'shards': len(entries),
+        'export_s': export_seconds,
+        'cold_cache': cold,
+        'files_pairs_per_s': file_pairs / files_seconds,
+        'shards_pairs_per_s': shard_pairs / shards_seconds,
+        'shuffled_pairs_per_s': shuffled_pairs / shuffled_seconds,
+        'incremental': {
+            'new_pairs': args.new_pairs,
+            'exported': sum(len(entry['ids']) for entry in appended),
+            'new_shards': len(appended),
+            'seconds': append_seconds,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=1000)
+    parser.add_argument("--new-pairs", type=int, default=100, help="Captures added before the incremental export")
+    parser.add_argument("--size", default="320x240", help="Frame size WxH")
+    parser.add_argument("--shard-size-mb", type=float, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args), indent=4))
@@ -0,0 +1,65 @@
+"""
+Startup time, setter latency and animation frame rate of the LightController,
+measured against the simulated NeoPixel_SPI strip.
+
+    python experiment/benchmark_light.py
+    python experiment/benchmark_light.py --frame-rate 120 --updates 1000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from light import LightController
+from light.fake import FakeNeoPixelSPI
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frame-rate", type=int, default=60)
+    parser.add_argument("--updates", type=int, default=500, help="Brightness updates fired at the controller")
+    args = parser.parse_args()
+
+    pixels = FakeNeoPixelSPI(None, 8, auto_write=False)  # LightController.NUM_PIXELS
+
+    start = time.perf_counter()
+    light = LightController(pixels=pixels, frame_rate=args.frame_rate)
+    init_seconds = time.perf_counter() - start
+
+    # Startup animation frame timing
+    light.wait()
+    startup_frames = pixels.shows
+    intervals = np.diff([timestamp for timestamp, _, _ in pixels.frames])
+    startup_seconds = pixels.frames[-1][0] - pixels.frames[0][0]
+
+    # Setter latency, updates are coalesced into few frames
+    light.turn(True)
+    light.wait()
+    shows_before = pixels.shows
+    latencies = []
+    for i in range(args.updates):
+        start = time.perf_counter()
+        light.set_brightness((i % 100 + 1) / 100)
+        latencies.append(time.perf_counter() - start)
+    light.wait()
+    latencies = np.array(latencies) * 1000
+
+    print(json.dumps({
+        'init_ms': init_seconds * 1000,
+        'startup_frames': startup_frames,
+        'startup_seconds': startup_seconds,
+        'frame_rate': 1 / float(np.median(intervals)) if len(intervals) else None,
+        'setter_ms_p50': float(np.percentile(latencies, 50)),
+        'setter_ms_p99': float(np.percentile(latencies, 99)),
+        'updates': args.updates,
+        'frames_for_updates': pixels.shows - shows_before,
+        'final_brightness': pixels.frames[-1][1],
+    }, indent=4))
+
+    light.close()
@@ -0,0 +1,153 @@
+"""
+Cold start benchmark of the app controllers.
+
+Every mode runs in a fresh interpreter and reports the import time of the app
+modules, the time to first render (the point where the app hands the page to
+Streamlit) and the time until all controllers are ready:
+
+    sequential  controllers created one after the other before the page renders (old app.py)
+    parallel    the capture service creates its controllers in parallel, the page renders once
+                service.options() answered, the tread meter is created in the background (app.py)
+
+The replay camera backend and the simulated light strip are used, so it runs off the Pi.
+
+    python experiment/benchmark_startup.py
+    python experiment/benchmark_startup.py --start-delay 1.0 --repeat 3
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import subprocess
+
+PROCESS_START = time.perf_counter()
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(REPO_DIR, "src"))
+
+
+def factories(root, start_delay):
+    def create_light():
+        from light import LightController
+        from light.fake import FakeNeoPixelSPI
+        return LightController(pixels=FakeNeoPixelSPI(None, 8, auto_write=False))
+
+    def create_cam():
+        from cam import StereoCamera
+        from cam.backends import get_backend
+        from storage import CaptureCatalog
+        backend = get_backend(
+            "replay",
+            left_files=[os.path.join(REPO_DIR, "left_test.jpg")],
+            right_files=[os.path.join(REPO_DIR, "right_test.jpg")],
+            start_delay=start_delay,
+        )
+        cam = StereoCamera(backend=backend, catalog=CaptureCatalog(os.path.join(root, "catalog.sqlite")))
+        # The app opens the preview stream right away
+        cam.start_cameras()
+        return cam
+
+    def create_numberplate():
+        from numberplate import Numberplate
+        from numberplate.store import PlateStore
+        return Numberplate(store=PlateStore(os.path.join(root, "numberplates.sqlite")))
+
+    def create_tread_meter():
+        try:
+            from depth import TreadMeter
+        except ImportError:
+            return None
+        return TreadMeter()
+
+    return {
+        'light': create_light,
+        'cam': create_cam,
+        'numberplate': create_numberplate,
+        'tread_meter': create_tread_meter,
+    }
+
+
+def create_service(root, controllers):
+    """
+    Capture service on its own thread, created like python -m service serve does.
+    Returns:
+        tuple: (CaptureService, CaptureClient)
+    """
+    from utils import Resources
+    from service import CaptureService, CaptureClient
+
+    resources = Resources(controllers).start()
+    service = CaptureService(
+        resources.get('cam'), resources.get('light'), resources.get('numberplate'),
+        address=os.path.join(root, "capture.sock"), authkey=b"benchmark",
+    ).start()
+    resources.shutdown()
+    threading.Thread(target=service.serve_forever, daemon=True).start()
+    return service, CaptureClient(service.address, service.authkey)
+
+
+def child(mode, start_delay):
+    start = time.perf_counter()
+    import numpy  # noqa: F401, imported by the app before anything else
+    import metrics  # noqa: F401
+    from utils import Resources
+    import_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as root:
+        todo = factories(root, start_delay)
+        if mode == "sequential":
+            created = {name: factory() for name, factory in todo.items()}
+            first_render = time.perf_counter()
+            ready = first_render
+            created['light'].close()
+            created['cam'].close()
+        else:
+            create_tread_meter = todo.pop('tread_meter')
+            resources = Resources({
+                'service': lambda: create_service(root, todo),
+                'tread_meter': create_tread_meter,
+            }).start()
+            # The app renders its controls once the service answered
+            service, client = resources.get('service')
+            client.options()
+            first_render = time.perf_counter()
+            resources.get('tread_meter')
+            ready = time.perf_counter()
+            client.close()
+            service.stop()
+            resources.shutdown()
+
+        result = {
+            'mode': mode,
+            'import_ms': import_seconds * 1000,
+            'first_render_ms': (first_render - PROCESS_START) * 1000,
+            'ready_ms': (ready - PROCESS_START) * 1000,
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start-delay", type=float, default=1.0, help="Replay camera start time in seconds")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args.start_delay)))
+        sys.exit(0)
+
+    results = []
+    for mode in ("sequential", "parallel"):
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", mode, "--start-delay", str(args.start_delay)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            # The last line is the result, controllers may print before
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=4))
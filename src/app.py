@@ -9,36 +9,75 @@ import sys
 sys.path.append("./src")
 
 import streamlit as st
-import light
-import cam
-import numberplate
 import time
-import numpy as np
-
-# Initialise controller
-light = light.LightController()
-cam = cam.StereoCamera()
-numberplate = numberplate.Numberplate()
+import json
+from utils import Resources
+from utils.display import DisplayImages
+from service import ServiceError
+
+def create_client():
+    # Cameras, light and numberplate live in the capture service (python -m service serve),
+    # it is started in the background if it is not running yet. METRICS_PORT is passed on.
+    from service import CaptureClient
+    return CaptureClient.connect()
+
+def create_tread_meter():
+    try:
+        # Tread measurement needs OpenCV, the app works without it
+        from depth import TreadMeter
+    except ImportError:
+        return None
+    return TreadMeter()
+
+@st.cache_resource
+def controllers():
+    # Shared by all sessions. The service connection and the tread meter are
+    # created in parallel in the background while the page renders.
+    return Resources({
+        'service': create_client,
+        'tread_meter': create_tread_meter,
+    }).start()
+
+@st.cache_resource
+def display_images():
+    # JPEG display copies of all sessions in one LRU cache, sessions keep the keys
+    return DisplayImages()
 
 # -----------------------------------------------------------
 # Side config
 st.set_page_config(page_title="Stereo Image Capture", page_icon="📷", layout="wide")
+st.title("Stereo Image Capture")
+
+# Initialise controller
+resources = controllers()
+with st.spinner("Starting cameras and light..."):
+    service = resources.get('service')
+    cam_info = service.options()
 
 # Deactivate statistic collection
 # st.browser.gatherUsageStats = False
 
 # -----------------------------------------------------------
 # Session
-# Generate an empty black image (HxW, RGB)
-width, height = cam.get_cam_dims()['left']  
-empty_black_image = np.zeros((height, width, 3), dtype=np.uint8)
+images = display_images()
+# Black placeholder (display sized, shared by all sessions)
+width, height = cam_info['cam_dims']['left']
+empty_black_image = images.placeholder(width, height)
 
 default_session_state = {
     'light-brightness': 100,
     'light-switch': False,
+    'light-strobe': True,
     'label-input': '',
     'numberplate-input': '',
-    'last-image-left': empty_black_image,  
+    'burst-size': 1,
+    'burst-bracket': False,
+    'quality-gate': True,
+    'zsl-select': 'nearest',
+    'click-ns': None,
+    'tread-suggestion': None,
+    # Keys of the display copies in images
+    'last-image-left': empty_black_image,
     'last-image-right': empty_black_image,
     'cam-config': {
         # 'exposure': 10000,  
@@ -53,94 +92,186 @@ for key, value in default_session_state.items():
         st.session_state[key] = value
 
 # Initialize camera controls in session state
-for control in cam.CONTROLS.keys():
-    potential_options = cam.get_camera_options()
+potential_options = cam_info['controls']
+for control in cam_info['control_types'].keys():
     if f'cam-config-slider-{control}' not in st.session_state:
         st.session_state[f'cam-config-slider-{control}'] = potential_options[control]['default']
     if f'cam-config-text-{control}' not in st.session_state:
         st.session_state[f'cam-config-text-{control}'] = potential_options[control]['default']
 
+def measure_tread(left_image, right_image):
+    """
+    Measure the tread of a pair and keep the suggestion, pre-fills an empty label.
+    """
+    # Awaited only here, the page renders while OpenCV is still loading
+    tread_meter = resources.get('tread_meter')
+    if tread_meter is None:
+        return
+    try:
+        measurement = tread_meter.measure(left_image, right_image)
+    except Exception as e:
+        print(f"Error measuring tread depth: {e}")
+        return
+    st.session_state['tread-suggestion'] = measurement if measurement.depth_mm else None
+    if measurement.depth_mm and not st.session_state.get('label-input', '').strip():
+        st.session_state['label-input'] = measurement.label
+
+def show_pair(left_image, right_image):
+    """
+    Keep and show the display copies of a pair, the full resolution arrays are not kept.
+    """
+    st.session_state['last-image-left'] = images.put(left_image)
+    st.session_state['last-image-right'] = images.put(right_image)
+    frame_window_left.image(images.get(st.session_state['last-image-left'], empty_black_image))
+    frame_window_right.image(images.get(st.session_state['last-image-right'], empty_black_image))
+
+def change_zsl(toggled):
+    # Zero shutter lag is a state of the shared service, only changes made in this session are sent
+    enabled = st.session_state['zsl-enabled']
+    if toggled or enabled:
+        service.zsl(enabled=enabled, select=st.session_state['zsl-select'] if enabled else None)
+
+def mark_click():
+    # Runs first thing in the rerun of the click, the zero shutter lag pair closest to it is stored
+    st.session_state['click-ns'] = time.monotonic_ns()
+
+def use_tread_suggestion():
+    st.session_state['label-input'] = st.session_state['tread-suggestion'].label
+
 # -----------------------------------------------------------
 # Image preview
-st.title("Stereo Image Capture")
+# Unchanged JPEG bytes keep their media URL, reruns neither encode nor resend them.
+# An image evicted from the cache shows the placeholder.
 col1, col2 = st.columns(2)
 with col1:
-    frame_window_left = st.image(st.session_state.get('last-image-left', []), channels="RGB")
+    frame_window_left = st.image(images.get(st.session_state['last-image-left'], empty_black_image))
 with col2:
-    frame_window_right = st.image(st.session_state.get('last-image-right', []), channels="RGB")
+    frame_window_right = st.image(images.get(st.session_state['last-image-right'], empty_black_image))
 
 left_btn_col, middle_btn_col, right_btn_col = st.columns(3)
 
 with left_btn_col:
     # Button Cam Preview
     if st.button("📷 Capture Camera Preview"):
-        left_frame, right_frame = cam.get_preview()
-        # Update State
-        frame_window_left.image(left_frame, channels="RGB")
-        frame_window_right.image(right_frame, channels="RGB")
-        # Update session state with the captured frames
-        st.session_state['last-image-left'] = left_frame
-        st.session_state['last-image-right'] = right_frame
+        # Coalesced with the previews of other clients
+        left_frame, right_frame = service.preview(max_age=0.1)
+        show_pair(left_frame, right_frame)
+        measure_tread(left_frame, right_frame)
 
 #-----------------------------------------------------------
 with middle_btn_col:
     # Button to take pic
     label = st.session_state.get('label-input', '')
     current_numberplate = st.session_state.get('numberplate-input', '')
-    take_photo_disabled = numberplate.full or not bool(label.strip()) or not bool(current_numberplate.strip())
-    if st.button("📷 Take Photo", disabled=take_photo_disabled): 
-        new_left_img, new_right_img = cam.capture_images(label=st.session_state.get("label-input", ""), numberplate = numberplate)
-
-        # Update state
-        frame_window_left.image(new_left_img, channels="RGB")
-        frame_window_right.image(new_right_img, channels="RGB")
-        # Update session state with new images
-        st.session_state['last-image-left'] = new_left_img
-        st.session_state['last-image-right'] = new_right_img
+    plate_status = service.numberplate(current_numberplate)
+    take_photo_disabled = plate_status['full'] or not bool(label.strip()) or not bool(current_numberplate.strip())
+    if st.button("📷 Take Photo", disabled=take_photo_disabled, on_click=mark_click): 
+        tread_meter = resources.get('tread_meter')
+        try:
+            # Queued behind captures of other clients
+            capture = service.capture(
+                label=st.session_state.get("label-input", ""),
+                numberplate=current_numberplate,
+                count=int(st.session_state.get("burst-size", 1)),
+                bracket=st.session_state.get("burst-bracket", False),
+                at_ns=st.session_state.get("click-ns"),
+                check_quality=st.session_state.get("quality-gate", True),
+                # Display copies and a grayscale pair at the tread measurement width, not the 48 MB pair
+                measure_width=tread_meter.config['tread_measure_width'] if tread_meter is not None else None,
+            )
+        except ServiceError as e:
+            if e.kind == "CaptureRejected":
+                # Nothing was written or counted
+                st.warning(f"🔁 {e.message}")
+            else:
+                st.error(f"Capture failed: {e}")
+        else:
+            if capture['rejected']:
+                st.warning(f"🔁 {capture['rejected']} pair(s) of the burst failed the quality gate and were dropped")
+            if capture['duplicates']:
+                # Kept and counted, the operator decides whether to delete it
+                st.warning(f"👯 Looks like {len(capture['duplicates'])} earlier capture(s) of this numberplate, delete it if the tyre position was shot twice")
+            # Files are written in the background, show the middle pair of the burst right away
+            show_pair(capture['left'], capture['right'])
+            # Suggestion for the next capture of this tyre
+            if 'measure_left' in capture:
+                measure_tread(capture['measure_left'], capture['measure_right'])
 
 # -----------------------------------------------------------
 # Delete last images
-disable_delte_btn = not cam.can_delete_last_images()
+disable_delte_btn = not service.status()['can_delete']
 with right_btn_col:
     if st.button("🗑️ Delete Last Images", disabled=disable_delte_btn ):
-        cam.delete_last_images(numberplate)
+        service.delete_last()
         # Clear the image windows
-        frame_window_left.image(empty_black_image, channels="RGB")
-        frame_window_right.image(empty_black_image, channels="RGB")
+        frame_window_left.image(images.get(empty_black_image))
+        frame_window_right.image(images.get(empty_black_image))
         # Clear session state images
         st.session_state['last-image-left'] = empty_black_image
         st.session_state['last-image-right'] = empty_black_image
 
 # -----------------------------------------------------------
 # Label input (in mm)
-tyre_label = st.text_input("📐 Profile Depth", value=st.session_state.get("label-iput",""), placeholder="in mm", key="label-input")
+col1_label, col2_label = st.columns([3, 1])
+tyre_label = col1_label.text_input("📐 Profile Depth", value=st.session_state.get("label-iput",""), placeholder="in mm", key="label-input")
+suggestion = st.session_state.get('tread-suggestion')
+if suggestion is not None:
+    col2_label.button(
+        f"📏 {suggestion.label} mm ({suggestion.confidence:.0%})",
+        help=f"Measured tread depth and confidence ({suggestion.seconds:.2f}s), click to use it as label",
+        on_click=use_tread_suggestion,
+    )
 # -----------------------------------------------------------
 # Numberplate input
 numberplate_input = st.text_input("🚗 Numberplate", value=st.session_state.get("numberplate-input", ""), placeholder="Format: S-AB-1234", key="numberplate-input").upper()
 
 # numberplate.numberplate = numberplate_input
-numberplate.numberplate = st.session_state.get("numberplate-input", "").upper()
+plate_status = service.numberplate(st.session_state.get("numberplate-input", "").upper())
 
-if not numberplate.validate():
+if not plate_status['valid']:
     st.warning("❌ Numberplate format is invalid")
 
-if numberplate.full:
+if plate_status['full']:
     st.warning("❗ Numberplate is full. Please delete some entries before adding new ones.")
 # -----------------------------------------------------------
+# Burst capture
+col1_burst, col2_burst, col3_burst = st.columns([3, 1, 1])
+burst_size = col1_burst.number_input("🎞️ Burst Size", min_value=1, max_value=cam_info['max_burst'], value=st.session_state.get("burst-size", 1), step=1, key="burst-size")
+burst_bracket = col2_burst.toggle("🌗 Exposure Bracket", value=st.session_state.get("burst-bracket", False), key="burst-bracket")
+# Blurred, badly exposed or unlit pairs are rejected before they are written or counted
+quality_gate = col3_burst.toggle("✅ Quality Gate", value=st.session_state.get("quality-gate", True), key="quality-gate")
+# -----------------------------------------------------------
+# Zero shutter lag: the cameras record full resolution pairs continuously, Take Photo
+# stores the pair exposed at the click (or the sharpest recent one) instead of the next frame
+# The widgets show the state of the service, set by any client
+zsl_status = service.status()['zsl']
+st.session_state['zsl-enabled'] = zsl_status['enabled']
+if zsl_status['enabled']:
+    st.session_state['zsl-select'] = zsl_status['select']
+col1_zsl, col2_zsl = st.columns([3, 1])
+col1_zsl.radio(
+    "🎯 Pair Selection", options=["nearest", "sharpest"], horizontal=True, key="zsl-select",
+    on_change=change_zsl, args=(False,),
+)
+col2_zsl.toggle("⏱️ Zero Shutter Lag", key="zsl-enabled", on_change=change_zsl, args=(True,))
+if zsl_status['enabled']:
+    st.caption(f"Recording {zsl_status['capacity']} pairs ({zsl_status['memory_mb']:.0f} MB), {zsl_status['dropped']} dropped")
+# -----------------------------------------------------------
 # Light control
 # Light config (slider & toggle)
-col1_light, col2_light = st.columns([3, 1])
+col1_light, col2_light, col3_light = st.columns([3, 1, 1])
 
 brightness = col1_light.slider( "☀️ Brightness", value=st.session_state.get("light-brightness", 100), min_value=1, max_value=100, key="light-brightness")
-light.set_brightness(st.session_state['light-brightness'] / 100.0)
-
 light_on = col2_light.toggle("💡 Light", value=st.session_state.get("light-switch", False), key="light-switch")
-light.turn(light_on)
+
+# Flash the light during captures only, lead/lag end up in the capture metadata
+strobe_on = col3_light.toggle("⚡ Strobe", value=st.session_state.get("light-strobe", True), key="light-strobe")
+service.light(brightness=st.session_state['light-brightness'] / 100.0, on=light_on, strobe=strobe_on)
 
 # -----------------------------------------------------------
 # Camera controls
 new_controls = {}
-cam_options = cam.get_camera_options()
+cam_options = cam_info['controls']
 
 save_col_1, save_col_2, save_col_3, save_col_4 = st.columns([2,1, 2, 1])
 with save_col_1:
@@ -152,14 +283,14 @@ with save_col_1:
 with save_col_2:
     # Button for saving camera config
     if st.button("💾 Save Camera Config"):
-        cam.save_cam_config(config_name)
+        service.save_config(config_name)
         # st.success("Camera configuration saved successfully!")
 
 with save_col_3:
     # Selection of available camera controls
     selected_control_file = st.selectbox(
         "📸 Select Camera Control File",
-        options=cam.get_saved_configs(),
+        options=service.configs(),
     )
 
 
@@ -167,7 +298,7 @@ with save_col_3:
 with save_col_4:
     # Button for loading camera config
     if st.button("📂 Load Camera Config"):
-        control_values = cam.load_config(selected_control_file)
+        control_values = service.load_config(selected_control_file)
         # Update session state with loaded config
         for control in control_values.keys():
             st.session_state[f'cam-config-slider-{control}'] = control_values[control]
@@ -179,13 +310,13 @@ def update_cam_config_text(control):
 def update_cam_config_slider(control):
     st.session_state[f'cam-config-slider-{control}'] = st.session_state[f'cam-config-text-{control}']
 
-for control in cam.CONTROLS.keys():
+for control in cam_info['control_types'].keys():
     # Update session (cam-config) with default values if not present
     if control not in st.session_state['cam-config']:
         st.session_state['cam-config'][control] = cam_options[control]['default']
 
 with st.container(height=400):
-    st.subheader(f"Camera Controls: {cam.current_config}")
+    st.subheader(f"Camera Controls: {service.status()['current_config']}")
     for control in cam_options.keys():
         # control_col_1, control_col_2 = st.columns([3, 1])
 
@@ -214,9 +345,36 @@ with st.container(height=400):
 
 # Update session state with new controls
 st.session_state['cam-config'] = new_controls
-# Apply new controls to cameras
+# Apply new controls to cameras, only changed controls reach the hardware
 session_controls = st.session_state.get('cam-config', {})
-cam.adjust_config(session_controls)
+service.adjust_config(session_controls)
+status = service.status()
+st.caption(
+    f"Hardware writes: camera {status['hardware_writes']['camera']}, light {status['hardware_writes']['light']}"
+    f" · Service clients: {status['clients']}, queued captures: {status['queued']}"
+)
+
+# -----------------------------------------------------------
+# Diagnostics
+with st.expander("🩺 Diagnostics"):
+    # Stages are recorded in the capture service
+    metrics_enabled = st.toggle("Record stage latencies", value=service.metrics()['enabled'], key="metrics-enabled")
+    snapshot = service.metrics(enable=metrics_enabled)['stages']
+    if snapshot:
+        st.dataframe([
+            {
+                'stage': stage,
+                'count': values['count'],
+                'mean ms': values['mean'] * 1000,
+                'p50 ms': values['p50'] * 1000,
+                'p95 ms': values['p95'] * 1000,
+                'p99 ms': values['p99'] * 1000,
+            } for stage, values in snapshot.items() if values['count']
+        ])
+        st.download_button("⬇️ Metrics JSON", json.dumps(snapshot, indent=4), file_name="metrics.json")
+    elif metrics_enabled:
+        st.caption("No captures recorded yet")
+    st.caption("Startup: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in resources.seconds.items()))
 
 # for control, value in st.session_state['cam-config'].items():
 #     print(f"Control: {control}, Value: {value}")
@@ -0,0 +1,3 @@
+from .calibration import StereoCalibration, Rectifier, CalibrationStore, calibrate
+
+__all__ = ["StereoCalibration", "Rectifier", "CalibrationStore", "calibrate"]
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Stereo calibration command line.
+
+    cd src && python -m calibration capture --pairs 15 --pattern 9x6 --square 25
+    cd src && python -m calibration solve --pattern 9x6 --square 25
+    cd src && python -m calibration maps 3280x2464 820x616
+"""
+
+import argparse
+
+from .calibration import CalibrationStore, calibrate
+
+
+def _size(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def solve(store, args):
+    calibration = calibrate(store.stored_pairs(), args.pattern, args.square)
+    store.save(calibration, args.name)
+    print(f"Calibration {args.name}: RMS {calibration.rms:.3f} px, baseline {calibration.baseline_mm:.1f} mm, "
+          f"focal length {calibration.focal_length_px:.1f} px")
+    # Precompute the maps for the calibration resolution
+    store.rectifier(args.name).maps(calibration.image_size)
+
+
+def capture(store, args):
+    from cam import StereoCamera
+
+    cam = StereoCamera()
+    try:
+        store.capture_pairs(
+            cam, args.pairs, args.pattern, delay=args.delay,
+            on_pair=lambda count, found: print(f"{count}/{args.pairs} pairs {'(board found)' if found else '(board not found)'}")
+        )
+    finally:
+        cam.close()
+    solve(store, args)
+
+
+def maps(store, args):
+    rectifier = store.rectifier(args.name)
+    for size in args.sizes:
+        rectifier.maps(size)
+        print(f"Cached rectification maps for {size[0]}x{size[1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m calibration", description="Stereo calibration")
+    parser.add_argument("--name", default=CalibrationStore.DEFAULT_NAME, help="Calibration name")
+    parser.add_argument("--directory", help="Calibration directory, defaults to data/calibration")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (
+        ("capture", capture, "Capture checkerboard pairs and solve the calibration"),
+        ("solve", solve, "Solve the calibration from the stored checkerboard pairs"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--pattern", type=_size, default=(9, 6), help="Inner corners, e.g. 9x6")
+        command.add_argument("--square", type=float, default=25.0, help="Square size in mm")
+        command.set_defaults(func=func)
+        if name == "capture":
+            command.add_argument("--pairs", type=int, default=15, help="Number of pairs with a visible board")
+            command.add_argument("--delay", type=float, default=2.0, help="Seconds between pairs")
+
+    maps_parser = commands.add_parser("maps", help="Precompute rectification maps for resolutions")
+    maps_parser.add_argument("sizes", type=_size, nargs="+", help="e.g. 3280x2464")
+    maps_parser.set_defaults(func=maps)
+
+    args = parser.parse_args()
+    args.func(CalibrationStore(args.directory), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Stereo calibration and cached rectification maps.
+
+Checkerboard pairs are captured with StereoCamera, intrinsics and extrinsics are
+solved with cv2.stereoCalibrate and stored in data/calibration. The
+initUndistortRectifyMap lookup tables are computed once per resolution and
+cached on disk, rectifying a pair afterwards is a single remap per image.
+"""
+
+import os
+import sys
+import json
+import glob
+import hashlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class StereoCalibration:
+    """
+    Result of a stereo calibration at image_size (width, height).
+    """
+    MATRICES = ('K1', 'D1', 'K2', 'D2', 'R', 'T', 'E', 'F', 'R1', 'R2', 'P1', 'P2', 'Q')
+
+    def __init__(self, image_size, rms=None, **matrices):
+        self.image_size = tuple(image_size)
+        self.rms = rms
+        for name in self.MATRICES:
+            setattr(self, name, np.asarray(matrices[name], dtype=np.float64))
+
+    @property
+    def baseline_mm(self):
+        # T is in the unit of the square size, which is given in mm
+        return float(np.linalg.norm(self.T))
+
+    @property
+    def focal_length_px(self):
+        # Focal length of the rectified cameras
+        return float(self.P1[0, 0])
+
+    def fingerprint(self):
+        """
+        Short hash identifying the calibration, used to key cached maps.
+        """
+        digest = hashlib.sha1()
+        digest.update(json.dumps(self.image_size).encode())
+        for name in self.MATRICES:
+            digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return digest.hexdigest()[:12]
+
+    def to_dict(self):
+        data = {'image_size': list(self.image_size), 'rms': self.rms}
+        data.update({name: getattr(self, name).tolist() for name in self.MATRICES})
+        return data
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(**json.load(f))
+
+
+def find_corners(image, pattern_size):
+    """
+    Find the inner checkerboard corners with sub-pixel accuracy.
+    :param pattern_size: Inner corners (columns, rows)
+    Returns:
+        np.ndarray or None: Corners of shape (N, 1, 2)
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    flags = cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE | cv2.CALIB_CB_FAST_CHECK
+    found, corners = cv2.findChessboardCorners(gray, pattern_size, flags)
+    if not found:
+        return None
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 1e-3)
+    return cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+
+
+def calibrate(pairs, pattern_size, square_size_mm):
+    """
+    Solve intrinsics and extrinsics from checkerboard pairs.
+    :param pairs: Iterable of (left_image, right_image)
+    :param pattern_size: Inner corners (columns, rows)
+    :param square_size_mm: Edge length of one square in mm
+    Returns:
+        StereoCalibration
+    """
+    board = np.zeros((pattern_size[0] * pattern_size[1], 3), np.float32)
+    board[:, :2] = np.mgrid[0:pattern_size[0], 0:pattern_size[1]].T.reshape(-1, 2) * square_size_mm
+
+    object_points, left_points, right_points = [], [], []
+    image_size = None
+    for left, right in pairs:
+        image_size = (left.shape[1], left.shape[0])
+        left_corners = find_corners(left, pattern_size)
+        right_corners = find_corners(right, pattern_size)
+        if left_corners is None or right_corners is None:
+            continue
+        object_points.append(board)
+        left_points.append(left_corners)
+        right_points.append(right_corners)
+
+    if len(object_points) < 3:
+        raise ValueError(f"Checkerboard found in only {len(object_points)} pairs, at least 3 are needed")
+
+    # Intrinsics per camera first, then the extrinsics with fixed intrinsics
+    _, K1, D1, _, _ = cv2.calibrateCamera(object_points, left_points, image_size, None, None)
+    _, K2, D2, _, _ = cv2.calibrateCamera(object_points, right_points, image_size, None, None)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 1e-5)
+    rms, K1, D1, K2, D2, R, T, E, F = cv2.stereoCalibrate(
+        object_points, left_points, right_points, K1, D1, K2, D2, image_size,
+        criteria=criteria, flags=cv2.CALIB_FIX_INTRINSIC
+    )
+    R1, R2, P1, P2, Q, _, _ = cv2.stereoRectify(K1, D1, K2, D2, image_size, R, T, alpha=0)
+
+    return StereoCalibration(
+        image_size, rms=float(rms),
+        K1=K1, D1=D1, K2=K2, D2=D2, R=R, T=T, E=E, F=F, R1=R1, R2=R2, P1=P1, P2=P2, Q=Q
+    )
+
+
+def _scale_rows(matrix, sx, sy):
+    # Scale the first two rows of a camera or projection matrix to another resolution
+    scaled = matrix.copy()
+    scaled[0] *= sx
+    scaled[1] *= sy
+    return scaled
+
+
+class Rectifier:
+    """
+    Rectifies stereo pairs with lookup tables computed once per resolution.
+    Maps are kept in memory and cached on disk as .npz next to the calibration.
+    """
+
+    def __init__(self, calibration, cache_dir=None):
+        self.calibration = calibration
+        self.cache_dir = cache_dir
+        self._maps = {}
+
+    def _cache_path(self, size):
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"maps_{self.calibration.fingerprint()}_{size[0]}x{size[1]}.npz")
+
+    def maps(self, size):
+        """
+        Returns:
+            tuple: (left_map1, left_map2, right_map1, right_map2) for cv2.remap
+        """
+        size = tuple(size)
+        if size in self._maps:
+            return self._maps[size]
+
+        cache_path = self._cache_path(size)
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                maps = tuple(cached[name] for name in ('lx', 'ly', 'rx', 'ry'))
+        else:
+            maps = self._compute_maps(size)
+            if cache_path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.part.npz"
+                np.savez(tmp_path, lx=maps[0], ly=maps[1], rx=maps[2], ry=maps[3])
+                os.replace(tmp_path, cache_path)
+
+        self._maps[size] = maps
+        return maps
+
+    def _compute_maps(self, size):
+        c = self.calibration
+        sx = size[0] / c.image_size[0]
+        sy = size[1] / c.image_size[1]
+        # Fixed point maps (CV_16SC2) are compact and the fastest input for remap
+        left = cv2.initUndistortRectifyMap(
+            _scale_rows(c.K1, sx, sy), c.D1, c.R1, _scale_rows(c.P1, sx, sy), size, cv2.CV_16SC2
+        )
+        right = cv2.initUndistortRectifyMap(
+            _scale_rows(c.K2, sx, sy), c.D2, c.R2, _scale_rows(c.P2, sx, sy), size, cv2.CV_16SC2
+        )
+        return left[0], left[1], right[0], right[1]
+
+    def rectify(self, left, right):
+        """
+        Returns:
+            tuple: (left_rectified, right_rectified)
+        """
+        size = (left.shape[1], left.shape[0])
+        lx, ly, rx, ry = self.maps(size)
+        return (
+            cv2.remap(left, lx, ly, cv2.INTER_LINEAR),
+            cv2.remap(right, rx, ry, cv2.INTER_LINEAR),
+        )
+
+
+class CalibrationStore:
+    """
+    Calibrations and cached maps in data/calibration, next to data/cam_configs.
+    """
+    ROOT_DIR = Path(sys.prefix).parent
+    CALIBRATION_PATH = "./data/calibration"
+    DEFAULT_NAME = "stereo"
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(self.ROOT_DIR, self.CALIBRATION_PATH)
+        self._rectifiers = {}
+
+    @property
+    def pairs_dir(self):
+        return os.path.join(self.directory, "pairs")
+
+    @property
+    def maps_dir(self):
+        return os.path.join(self.directory, "maps")
+
+    def calibration_path(self, name=DEFAULT_NAME):
+        return os.path.join(self.directory, f"calibration_{name}.json")
+
+    def save(self, calibration, name=DEFAULT_NAME):
+        os.makedirs(self.directory, exist_ok=True)
+        calibration.save(self.calibration_path(name))
+        self._rectifiers.pop(name, None)
+
+    def load(self, name=DEFAULT_NAME):
+        path = self.calibration_path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Calibration {name} does not exist, run python -m calibration first.")
+        return StereoCalibration.load(path)
+
+    def rectifier(self, name=DEFAULT_NAME):
+        if name not in self._rectifiers:
+            self._rectifiers[name] = Rectifier(self.load(name), cache_dir=self.maps_dir)
+        return self._rectifiers[name]
+
+    def capture_pairs(self, cam, count, pattern_size, delay=2.0, on_pair=None):
+        """
+        Capture checkerboard pairs with a StereoCamera and keep those where both
+        cameras see the board. Pairs are stored in pairs_dir so calibration can be rerun.
+        :param delay: Seconds between pairs to move the board
+        :param on_pair: Optional callback(index, found) for progress output
+        Returns:
+            list: (left, right) arrays
+        """
+        import time
+        from PIL import Image
+
+        os.makedirs(self.pairs_dir, exist_ok=True)
+        pairs = []
+        with cam.session():
+            while len(pairs) < count:
+                time.sleep(delay)
+                left, right, _ = cam.grab_pair()
+                found = find_corners(left, pattern_size) is not None and find_corners(right, pattern_size) is not None
+                if found:
+                    index = len(pairs)
+                    Image.fromarray(left).save(os.path.join(self.pairs_dir, f"{index:03d}_L.png"))
+                    Image.fromarray(right).save(os.path.join(self.pairs_dir, f"{index:03d}_R.png"))
+                    pairs.append((left, right))
+                if on_pair is not None:
+                    on_pair(len(pairs), found)
+        return pairs
+
+    def stored_pairs(self):
+        """
+        Yield the checkerboard pairs saved by capture_pairs().
+        """
+        for left_path in sorted(glob.glob(os.path.join(self.pairs_dir, "*_L.png"))):
+            right_path = left_path[:-len("_L.png")] + "_R.png"
+            if os.path.exists(right_path):
+                yield cv2.imread(left_path, cv2.IMREAD_GRAYSCALE), cv2.imread(right_path, cv2.IMREAD_GRAYSCALE)
@@ -1,3 +1,4 @@
 from .cams import StereoCamera
+from .quality import QualityGate, CaptureRejected
 
-__all__ = ["StereoCamera"]
\ No newline at end of file
+__all__ = ["StereoCamera", "QualityGate", "CaptureRejected"]
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Camera backends used by StereoCamera.
+
+A backend opens the two Picamera2 compatible devices (index 0 is the right
+camera, index 1 the left one). The real backend wraps picamera2, the replay
+backend serves frames from image files so the capture path can be run and
+profiled off the Pi.
+"""
+
+import os
+import sys
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+from .fake import FakePicamera2
+
+
+class CameraBackend:
+    name = None
+
+    def open(self, index):
+        """
+        Open the camera with the given index.
+        Returns:
+            A Picamera2 compatible camera.
+        """
+        raise NotImplementedError
+
+    def close_all(self):
+        """
+        Release every camera opened by this or a previous process.
+        """
+
+
+class Picamera2Backend(CameraBackend):
+    name = "picamera2"
+
+    def __init__(self, camera_cls=None):
+        """
+        :param camera_cls: Picamera2 compatible class, defaults to picamera2.Picamera2
+        """
+        if camera_cls is None:
+            # Imported lazily, picamera2 and libcamera only exist on the Pi
+            from picamera2 import Picamera2
+            camera_cls = Picamera2
+        self.camera_cls = camera_cls
+
+    def open(self, index):
+        return self.camera_cls(index)
+
+    def close_all(self):
+        self.camera_cls.close_all()
+
+
+class ReplayCamera(FakePicamera2):
+    """
+    Fake camera that cycles through a list of image files, resized to the
+    configured stream size.
+    """
+
+    def __init__(self, camera_num, files, **kwargs):
+        super().__init__(camera_num, **kwargs)
+        if not files:
+            raise ValueError("ReplayCamera needs at least one image file")
+        self.files = list(files)
+        self._cycle = itertools.cycle(self.files)
+        self._cache = {}
+
+    def _load(self, path, size):
+        key = (path, tuple(size))
+        if key not in self._cache:
+            from PIL import Image
+            with Image.open(path) as image:
+                image = image.convert("RGB")
+                if image.size != tuple(size):
+                    image = image.resize(tuple(size), Image.BILINEAR)
+                self._cache[key] = np.asarray(image)
+        return self._cache[key]
+
+    def _make_frame(self, stream):
+        if stream['format'] not in ('BGR888', 'RGB888'):
+            return super()._make_frame(stream)
+        # Copy like picamera2 does when the buffer is turned into an array
+        return self._load(next(self._cycle), stream['size']).copy()
+
+
+class ReplayBackend(CameraBackend):
+    name = "replay"
+
+    ROOT_DIR = Path(sys.prefix).parent
+    LEFT_FILES = ["./left_test.jpg"]
+    RIGHT_FILES = ["./right_test.jpg"]
+
+    def __init__(self, left_files=None, right_files=None, frame_interval=None, start_delay=0.0, switch_delay=0.0):
+        """
+        :param left_files: Image files replayed by the left camera
+        :param right_files: Image files replayed by the right camera
+        :param frame_interval: Seconds between two frames, defaults to 30 fps
+        :param start_delay: Simulated pipeline start time in seconds
+        :param switch_delay: Simulated mode switch time in seconds
+        """
+        self.left_files = [os.path.join(self.ROOT_DIR, f) for f in (left_files or self.LEFT_FILES)]
+        self.right_files = [os.path.join(self.ROOT_DIR, f) for f in (right_files or self.RIGHT_FILES)]
+        self.timing = dict(frame_interval=frame_interval, start_delay=start_delay, switch_delay=switch_delay)
+
+    def open(self, index):
+        files = self.right_files if index == 0 else self.left_files
+        return ReplayCamera(index, files, **self.timing)
+
+    def close_all(self):
+        ReplayCamera.close_all()
+
+
+BACKENDS = {
+    Picamera2Backend.name: Picamera2Backend,
+    ReplayBackend.name: ReplayBackend,
+}
+
+
+def get_backend(name=None, **kwargs):
+    """
+    Create a backend by name, defaults to the CAM_BACKEND environment variable
+    or picamera2.
+    """
+    name = name or os.environ.get("CAM_BACKEND", Picamera2Backend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown camera backend: {name}, choose from {list(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
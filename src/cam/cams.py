@@ -1,15 +1,22 @@
 import uuid
-from picamera2 import Picamera2, Preview
 import time
 import os
-from libcamera import controls
+import threading
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
 from utils.decorators import singleton
+from .pairing import PairCapturer
+from .writer import ImageWriter
+from .backends import get_backend
+from .ring import FrameRing, ZslRecorder
+from .quality import QualityGate, CaptureRejected
+from storage.catalog import CaptureCatalog
+from storage.duplicates import DuplicateIndex, fingerprint
+from metrics import timer, observe
 import sys
 import json
 
 
-
 @singleton
 class StereoCamera:
     ROOT_DIR = Path(sys.prefix).parent
@@ -24,38 +31,131 @@ class StereoCamera:
             'ExposureTime': int
         }
 
+    # Seconds the cameras keep streaming after the last user released the session.
+    # None keeps them running until stop()/close(), 0 stops right away.
+    IDLE_TIMEOUT = 60.0
+
+    # Pairs whose SensorTimestamps differ by more than MAX_SKEW_MS are retried
+    MAX_SKEW_MS = 10.0
+    MAX_PAIR_RETRIES = 4
+
+    # "png": {id}_{label}_L/R.png plus a JSON sidecar, "stpair": one {id}_{label}.stpair container
+    STORAGE_FORMATS = ("png", "stpair")
+    STORAGE_FORMAT = "png"
+    CONTAINER_COMPRESSION = "none"  # "none" is memory-mappable, "zlib" is smaller
+
+    # Burst capture
+    MAX_BURST = 8
+    BRACKET_CONTROLS = ('ExposureTime', 'AnalogueGain')
+    BRACKET_SETTLE_FRAMES = 8  # frames to wait for bracket controls to take effect
+    BRACKET_TOLERANCE = 0.05  # relative deviation accepted in the request metadata
+    AUTO_EXPOSURE = 0  # ExposureTime/AnalogueGain value handing the control back to the AGC
+
+    # Strobe: with a LightController set, the light is switched on right before
+    # the exposure of the captured pairs and off right after
+    STROBE_BRIGHTNESS = 1.0
+    STROBE_SETTLE_FRAMES = 4  # frames to skip until one was exposed entirely with the light on
+
+    # Preview stream size, a quarter of the 3280x2464 sensor fits a half width column
+    PREVIEW_SIZE = (820, 616)
+
+    # Zero shutter lag: full resolution pairs are recorded continuously into a ring
+    # of ZSL_MEMORY_MB (CAM_ZSL_MB), a capture picks the pair exposed closest to the
+    # click ("nearest") or the sharpest of the last ZSL_WINDOW pairs ("sharpest")
+    ZSL_MEMORY_MB = 512
+    ZSL_SELECTIONS = ("nearest", "sharpest")
+    ZSL_SELECT = "nearest"
+    ZSL_WINDOW = 8
+    ZSL_CAMERA_BUFFERS = 3  # camera buffers of the streaming still config
+    ZSL_FIRST_FRAME_TIMEOUT = 10.0  # seconds to wait for the first recorded pair
+
     current_controls = {}
     current_config = None
 
-    def __init__(self):
+    def __init__(self, backend=None, idle_timeout=IDLE_TIMEOUT, storage_format=None, catalog=None):
         """
-        Initialize the stereo camera setup with two Picamera2 instances:
+        Initialize the stereo camera setup with two cameras opened by the backend:
         - right_cam for the right camera (index 0)
         - left_cam for the left camera (index 1)
 
-        Configures and starts both cameras using default preview configurations.
+        Configures both cameras using preview configurations. Streaming is started
+        lazily by the first session and kept alive until idle_timeout expires.
+
+        :param backend: CameraBackend, defaults to get_backend() (CAM_BACKEND or picamera2)
+        :param idle_timeout: Seconds to keep streaming after the last session
+        :param storage_format: "png" or "stpair", defaults to CAM_STORAGE_FORMAT or STORAGE_FORMAT
+        :param catalog: CaptureCatalog every capture is recorded in, defaults to data/catalog.sqlite
         """
+        self.backend = backend or get_backend()
+        self.catalog = catalog if catalog is not None else CaptureCatalog()
+
+        self.storage_format = storage_format or os.environ.get("CAM_STORAGE_FORMAT", self.STORAGE_FORMAT)
+        if self.storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {self.storage_format}, choose from {self.STORAGE_FORMATS}")
+
         # Kill all existing camera instances
         try:
-            Picamera2.close_all()
+            self.backend.close_all()
         except Exception as e:
             print(f"Error closing existing cameras: {e}")
 
-        self.right_cam = Picamera2(0)
-        self.left_cam = Picamera2(1)
+        self.right_cam = self.backend.open(0)
+        self.left_cam = self.backend.open(1)
+
+        # Streaming session state
+        self.idle_timeout = idle_timeout
+        self.streaming = False
+        self._session_users = 0
+        self._idle_timer = None
+        self._session_lock = threading.RLock()
 
-        self.last_captured = [None, None]  # Store last captured images for potential delete
+        self.last_captured = []  # CaptureHandles of the last capture (one per pair) for potential delete
+
+        # Controls are only pushed when they differ from what the sensors already have,
+        # hardware_writes counts the set_controls calls that reached a camera
+        self.hardware_writes = 0
+        self._camera_options = None
+
+        # Strobe light, see set_strobe()
+        self.light = None
+        self.strobe_brightness = self.STROBE_BRIGHTNESS
+        self.last_strobe = []  # strobe timing of the pairs of the last capture
+
+        self.pairs = PairCapturer(self.left_cam, self.right_cam, self.MAX_SKEW_MS, self.MAX_PAIR_RETRIES)
+        self.writer = ImageWriter()
 
 
         # Configure the cameras
-        # preview_config = picam2.create_preview_configuration()
-        # capture_config = picam2.create_still_configuration()
+        # Full resolution still config, only used while capturing
         self.right_config = self.right_cam.create_still_configuration()
         self.left_config = self.left_cam.create_still_configuration()
         # print(right_config)
 
-        self.right_cam.configure(self.right_config)
-        self.left_cam.configure(self.left_config)
+        # Display sized preview config the cameras stream in otherwise
+        preview_main = {'size': self.PREVIEW_SIZE, 'format': 'BGR888'}
+        self.right_preview_config = self.right_cam.create_preview_configuration(main=preview_main)
+        self.left_preview_config = self.left_cam.create_preview_configuration(main=preview_main)
+
+        # Full resolution config streamed continuously in zero shutter lag mode
+        self.right_zsl_config = self.right_cam.create_still_configuration(buffer_count=self.ZSL_CAMERA_BUFFERS)
+        self.left_zsl_config = self.left_cam.create_still_configuration(buffer_count=self.ZSL_CAMERA_BUFFERS)
+
+        self.right_cam.configure(self.right_preview_config)
+        self.left_cam.configure(self.left_preview_config)
+        self.mode = "preview"
+
+        # Pairs failing the gate are neither written nor counted, thresholds are
+        # stored with the camera config
+        self.quality = QualityGate()
+
+        # Fingerprints of the catalog captures, a capture resembling an earlier one
+        # of the same numberplate lists it under "duplicates" in its metadata
+        self.duplicates = DuplicateIndex(self.catalog)
+
+        # Zero shutter lag, see enable_zsl()
+        self.zsl = None
+        self.zsl_select = self.ZSL_SELECT
+        self.zsl_window = self.ZSL_WINDOW
 
         # Start the cam
         # self.right_cam.start()
@@ -64,21 +164,122 @@ class StereoCamera:
         # Focus has to be set manulally for each camera
 
     def start_cameras(self):
-        # Start the cam
-        self.right_cam.start()
-        self.left_cam.start()
+        # Start the cam, no-op while already streaming
+        with self._session_lock:
+            self._cancel_idle_timer()
+            if not self.streaming:
+                # Both pipelines come up in parallel
+                with timer('camera_start'):
+                    self.pairs.map(lambda cam: cam.start(), self.left_cam, self.right_cam)
+                self.streaming = True
 
     def stop_cameras(self):
         # Stop the cam
-        self.right_cam.stop()
-        self.left_cam.stop()
+        with self._session_lock:
+            self._cancel_idle_timer()
+            if self.streaming:
+                self.right_cam.stop()
+                self.left_cam.stop()
+                self.streaming = False
+
+    def set_mode(self, mode):
+        """
+        Switch both cameras between the "preview", "still" and "zsl" configuration.
+        Running cameras are switched in parallel, stopped ones only reconfigured.
+        """
+        if mode not in ("preview", "still", "zsl"):
+            raise ValueError(f"Unknown camera mode: {mode}")
+
+        with self._session_lock:
+            if mode == self.mode:
+                return
+            if mode == "still":
+                configs = (self.left_config, self.right_config)
+            elif mode == "zsl":
+                configs = (self.left_zsl_config, self.right_zsl_config)
+            else:
+                configs = (self.left_preview_config, self.right_preview_config)
+            # Configuring loads the controls of the config, the ones set with adjust_config()
+            # go into it so they apply from the first frame after the switch
+            for config in configs:
+                config['controls'].update(self.current_controls)
+
+            if self.streaming:
+                self.pairs.map(
+                    lambda args: args[0].switch_mode(args[1]),
+                    (self.left_cam, configs[0]), (self.right_cam, configs[1])
+                )
+            else:
+                self.left_cam.configure(configs[0])
+                self.right_cam.configure(configs[1])
+            self.mode = mode
+
+    def _cancel_idle_timer(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _stop_if_idle(self):
+        with self._session_lock:
+            self._idle_timer = None
+            if self._session_users == 0:
+                self.stop_cameras()
+
+    def acquire(self):
+        """
+        Register a user of the streaming session, starting the cameras if needed.
+        """
+        with self._session_lock:
+            self._session_users += 1
+            self.start_cameras()
+
+    def release(self):
+        """
+        Unregister a user of the streaming session. Once nobody uses the cameras
+        they are stopped after idle_timeout seconds.
+        """
+        with self._session_lock:
+            self._session_users = max(0, self._session_users - 1)
+            if self._session_users > 0 or self.idle_timeout is None:
+                return
+            self._cancel_idle_timer()
+            if self.idle_timeout <= 0:
+                self.stop_cameras()
+            else:
+                self._idle_timer = threading.Timer(self.idle_timeout, self._stop_if_idle)
+                self._idle_timer.daemon = True
+                self._idle_timer.start()
+
+    @contextmanager
+    def session(self):
+        """
+        Keep both cameras streaming for the duration of the with-block.
+        """
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
 
+    def _set_controls(self, controls):
+        # Push controls to both sensors
+        self.right_cam.set_controls(controls)
+        self.left_cam.set_controls(controls)
+        self.hardware_writes += 2
 
     def adjust_config(self, controls_dict={}):
+        """
+        Set the camera controls, only those that changed since the last call are
+        written to the cameras, so calling this on every UI rerun is cheap.
+        Returns:
+            dict: The controls that were written
+        """
         # Cast types for specific controls
         # FLoat: Sharpness, Contrast, AnalogueGain
         # Int: NoiseReductionMode, FrameDurationLimits, ExposureTime
         # print(f"Adjusting camera controls with: {controls_dict}")
+        controls_dict = dict(controls_dict)
         for control, value in controls_dict.items():
             if control in self.CONTROLS:
                 try:
@@ -87,10 +288,15 @@ class StereoCamera:
                     print(f"Error converting {control} to {self.CONTROLS[control]}: {e}")
                     continue
         # print(f"Setting controls: {controls_dict}")
+        changed = {
+            control: value for control, value in controls_dict.items()
+            if self.current_controls.get(control) != value
+        }
         self.current_controls = controls_dict
-        # Set controls for both cameras
-        self.right_cam.set_controls(self.current_controls)
-        self.left_cam.set_controls(self.current_controls)
+        # Set changed controls for both cameras
+        if changed:
+            self._set_controls(changed)
+        return changed
 
         # with self.right_cam.controls as right_controls:
         #     right_controls.ExposureTime = self.current_controls.get('ExposureTime', 10000)
@@ -106,15 +312,24 @@ class StereoCamera:
             right=self.right_config['main']['size']
         )
 
+    def get_preview_dims(self):
+        return dict(
+            left=self.left_preview_config['main']['size'],
+            right=self.right_preview_config['main']['size']
+        )
+
     def get_camera_options(self):
-        # Get min, max, default values for camera_controls
-        return {
-            control: {
-                'min': self.left_cam.camera_controls[control][0],
-                'max': self.left_cam.camera_controls[control][1],
-                'default': self.left_cam.camera_controls[control][2]
-            } for control in self.CONTROLS.keys() if control in self.left_cam.camera_controls
-        }
+        # Get min, max, default values for camera_controls.
+        # The limits are static for a sensor, build them once.
+        if self._camera_options is None:
+            self._camera_options = {
+                control: {
+                    'min': self.left_cam.camera_controls[control][0],
+                    'max': self.left_cam.camera_controls[control][1],
+                    'default': self.left_cam.camera_controls[control][2]
+                } for control in self.CONTROLS.keys() if control in self.left_cam.camera_controls
+            }
+        return self._camera_options
 
     def get_control_controls(self):
         # Aperture, Shutter-Speed, ISO
@@ -124,26 +339,33 @@ class StereoCamera:
         )
 
     def can_delete_last_images(self):
-        if self.last_captured[0] is None or self.last_captured[1] is None:
-            return False
-        return True
+        return len(self.last_captured) > 0
 
     def delete_last_images(self, numberplate):
         """
-        Delete the last captured images from both cameras.
+        Delete the last captured images (a single pair or a whole burst) from both cameras.
         This method assumes that the last captured images are stored in self.last_captured.
         """
         if not self.can_delete_last_images():
             return False
 
         try:
-            # Try to remove the files
-            os.remove(self.last_captured[0])
-            os.remove(self.last_captured[1])
-            # Adjust numberplate count
+            # Drop the catalog rows and the files in one transaction,
+            # a failing file removal rolls the catalog back
+            with self.catalog.transaction() as db:
+                self.catalog.remove([handle.metadata['id'] for handle in self.last_captured], db=db)
+                for handle in self.last_captured:
+                    # Files may still be in the writer queue
+                    handle.exception()
+                    # Try to remove the files
+                    for path in handle.paths + [handle.metadata_path]:
+                        if path is not None and os.path.exists(path):
+                            os.remove(path)
+            self.duplicates.remove([handle.metadata['id'] for handle in self.last_captured])
+            # Adjust numberplate count, a burst counts as one entry
             numberplate.remove()
             # Clear History
-            self.last_captured = [None, None]
+            self.last_captured = []
             return True
         except Exception as e:
             print(f"Error deleting images: {e}")
@@ -151,58 +373,407 @@ class StereoCamera:
 
     def get_preview(self):
         """
-        Capture and return frames from both left and right cameras.
+        Capture and return display sized frames from both left and right cameras.
         Returns:
             tuple: (left_frame, right_frame), both as PIL images.
         """
-        self.start_cameras()
+        if self.zsl is not None:
+            return self._zsl_preview()
+        with self.session():
+            self.set_mode("preview")
+            with self.pairs.capture() as pair:
+                return self.pairs.map(
+                    lambda request: request.make_image("main"),
+                    pair.left_request, pair.right_request
+                )
+    
 
-        left_frame = self.left_cam.capture_image()
-        right_frame = self.right_cam.capture_image()
+    def grab_pair(self):
+        """
+        Capture one full resolution pair without storing it, e.g. for calibration.
+        Returns:
+            tuple: (left_array, right_array, metadata)
+        """
+        if self.zsl is not None:
+            return self.zsl.ring.copy(*self._zsl_frames(1))[0]
+        with self.session():
+            self.set_mode("still")
+            return self._capture_arrays()
 
-        self.stop_cameras()
-        
-        return left_frame, right_frame
-    
+    def capture_images(self, label, numberplate, at_ns=None, check_quality=True):
+        """
+        Capture a stereo pair and queue it for encoding and writing.
+        :param at_ns: Click time the zero shutter lag pair is picked for, defaults to now
+        :param check_quality: Reject the pair if it fails the quality gate
+        Returns:
+            CaptureHandle: Handle with the raw arrays and the pending file paths,
+            None if the numberplate is full. metadata['duplicates'] lists earlier
+            captures of the numberplate that look the same (id, group_id, distance).
+        Raises:
+            CaptureRejected: The pair failed the quality gate
+        """
+        handles = self.capture_burst(label, numberplate, count=1, at_ns=at_ns, check_quality=check_quality)
+        return handles[0] if handles else None
 
-    def capture_images(self, label, numberplate):
+    def capture_burst(self, label, numberplate, count, bracket=None, at_ns=None, check_quality=True):
+        """
+        Capture count stereo pairs from the running stream as one grouped capture.
+        The group counts as a single numberplate entry and shares one id, pair i
+        is stored as {id}-{i}_{label}_L/R.png.
+
+        :param count: Number of stereo pairs, at most MAX_BURST
+        :param bracket: Optional list of control overrides, one dict per pair
+                        (see exposure_bracket()), cycled if shorter than count
+        :param at_ns: Click time (time.monotonic_ns()) the zero shutter lag pair is picked for,
+                      defaults to now
+        :param check_quality: Drop pairs failing the quality gate (see self.quality), the
+                              exposure is not checked for bracketed pairs
+        Returns:
+            list: CaptureHandle per passed pair, None if the numberplate is full.
+        Raises:
+            CaptureRejected: No pair passed, nothing was written or counted
+        """
+        if not 1 <= count <= self.MAX_BURST:
+            raise ValueError(f"Burst size must be between 1 and {self.MAX_BURST}")
+        if numberplate.full:
+            return None
 
-        self.start_cameras()
+        with self.session():
+            return self._capture_burst(label, numberplate, count, bracket, at_ns, check_quality)
 
+    def _capture_burst(self, label, numberplate, count, bracket, at_ns=None, check_quality=True):
         images_dir = os.path.join(self.ROOT_DIR, self.IMAGE_PATH)
-        unique_id = str(uuid.uuid4())
-
-        left_filename = f"{unique_id}_{label}_L.png"
-        right_filename = f"{unique_id}_{label}_R.png"
+        group_id = str(uuid.uuid4())
+        if at_ns is None:
+            at_ns = time.monotonic_ns()
+
+        flash = None
+        if self.zsl is not None and not bracket:
+            # Already exposed, the light has to be on instead of strobing
+            captured = self.zsl.ring.copy(*self._zsl_frames(count, at_ns))
+        else:
+            captured, flash = self._capture_live(count, bracket)
+
+        if flash is not None:
+            for _, _, metadata in captured:
+                metadata['strobe'] = self._strobe_timing(flash, metadata)
+            self.last_strobe = [metadata['strobe'] for _, _, metadata in captured]
+
+        if check_quality and self.quality.enabled:
+            for left_array, right_array, metadata in captured:
+                metadata['quality'] = self.quality.check(left_array, right_array, exposure=not bracket)
+            passed = [pair for pair in captured if pair[2]['quality']['passed']]
+            if not passed:
+                raise CaptureRejected([metadata['quality'] for _, _, metadata in captured])
+            captured = passed
+            count = len(captured)
+
+        # Shooting the same tyre position twice is only reported, the operator decides
+        for left_array, right_array, metadata in captured:
+            with timer('fingerprint'):
+                metadata['fingerprint'] = fingerprint(left_array, right_array)
+                metadata['duplicates'] = self.duplicates.find(numberplate.numberplate, metadata['fingerprint'])
+        similar = {match['group_id'] for _, _, metadata in captured for match in metadata['duplicates']}
+        if similar:
+            print(f"Capture resembles {len(similar)} earlier capture(s) of {numberplate.numberplate}: {', '.join(sorted(similar))}")
+
+        # Numberplates, only pairs that are kept count. The store checks the quota
+        # atomically, another process may have filled the plate since numberplate.full
+        if not numberplate.add():
+            print(f"Numberplate {numberplate.numberplate} is full, capture discarded")
+            return None
+
+        handles = []
+        for index, (left_array, right_array, metadata) in enumerate(captured):
+            unique_id = group_id if count == 1 else f"{group_id}-{index:02d}"
+            metadata.update(
+                id=unique_id, label=label, numberplate=numberplate.numberplate, config_name=self.current_config,
+                group_id=group_id, group_index=index, group_size=count
+            )
+
+            # Encoding and writing happens in the background
+            if self.storage_format == "stpair":
+                path = os.path.join(images_dir, f"{unique_id}_{label}.stpair")
+                handles.append(self.writer.submit_container(
+                    left_array, right_array, path, metadata, self.CONTAINER_COMPRESSION
+                ))
+            else:
+                left_path = os.path.join(images_dir, f"{unique_id}_{label}_L.png")
+                right_path = os.path.join(images_dir, f"{unique_id}_{label}_R.png")
+                metadata_path = os.path.join(images_dir, f"{unique_id}_{label}.json")
+                handles.append(self.writer.submit(
+                    left_array, right_array, left_path, right_path, metadata_path, metadata
+                ))
+
+        # Record the whole group in one transaction, pairs that fail to be
+        # written are dropped from the catalog again
+        self.catalog.add([self._catalog_record(handle) for handle in handles])
+        for handle in handles:
+            self.duplicates.add(numberplate.numberplate, handle.metadata['id'], group_id, handle.metadata['fingerprint'])
+            handle.future.add_done_callback(lambda future, capture_id=handle.metadata['id']: self._on_written(future, capture_id))
+
+        # Image-History
+        self.last_captured = handles
+        return handles
+
+    def _capture_live(self, count, bracket):
+        """
+        Capture count pairs from the stream after now.
+        Returns:
+            tuple: (list of (left_array, right_array, metadata), Strobe or None)
+        """
+        # Bracketed pairs need new controls, zero shutter lag recording pauses for them
+        recorder = self.zsl
+        if recorder is not None:
+            recorder.stop()
 
-        left_path = os.path.join(images_dir, left_filename)
-        right_path = os.path.join(images_dir, right_filename)
+        # Full resolution frames are only produced while capturing,
+        # the cameras stay in still mode until the next preview
+        self.set_mode("zsl" if recorder is not None else "still")
 
-        if not numberplate.full:
-            # Numberplates
-            numberplate.add()
-            # Image-History
-            self.last_captured = [left_path, right_path]
+        # Grab all pairs first so the burst is not slowed down by the writer queue.
+        # The strobe light is on for the whole burst only.
+        restore = self._bracket_restore(bracket) if bracket else {}
 
+        captured = []
+        strobe = self.light.strobe(self.strobe_brightness) if self.light is not None else nullcontext()
+        try:
+            with strobe as flash:
+                for index in range(count):
+                    overrides = bracket[index % len(bracket)] if bracket else None
+                    not_before_ns = flash.on_ns if flash is not None else None
+                    captured.append(self._capture_arrays(overrides, not_before_ns))
+        finally:
+            if restore:
+                self._set_controls(restore)
+            if recorder is not None:
+                recorder.start()
+        return captured, flash
+
+    def _bracket_restore(self, bracket):
+        """
+        Controls writing back the state before a bracketed burst. Controls set with
+        adjust_config() get their value back, the others return to automatic exposure
+        (0 releases a fixed ExposureTime/AnalogueGain), so no bracket step or sensor
+        default stays fixed.
+        """
+        restore = {}
+        for control in {control for overrides in bracket for control in overrides}:
+            restore[control] = self.current_controls.get(control, self.AUTO_EXPOSURE)
+        if not any(control in self.current_controls for control in self.BRACKET_CONTROLS):
+            restore['AeEnable'] = True
+        return restore
+
+    # -----------------------------------------------------------
+    # Zero shutter lag
+    def enable_zsl(self, memory_mb=None, select=None, window=None):
+        """
+        Stream full resolution pairs continuously into a preallocated ring, captures
+        pick an already exposed pair instead of waiting for the next frame.
+        The cameras keep streaming until disable_zsl().
 
-            # Capture images
-            self.left_cam.capture_file(left_path)
-            self.right_cam.capture_file(right_path)
+        :param memory_mb: Ring size in MB, defaults to CAM_ZSL_MB or ZSL_MEMORY_MB
+        :param select: "nearest" pair to the click or "sharpest" of the last window pairs
+        :param window: Pairs considered by "sharpest"
+        Returns:
+            FrameRing: The ring the pairs are recorded into
+        """
+        select = select or self.zsl_select
+        if select not in self.ZSL_SELECTIONS:
+            raise ValueError(f"Unknown zero shutter lag selection: {select}, choose from {self.ZSL_SELECTIONS}")
+        self.zsl_select = select
+        self.zsl_window = window or self.zsl_window
+        if memory_mb is None:
+            memory_mb = float(os.environ.get("CAM_ZSL_MB", self.ZSL_MEMORY_MB))
+
+        with self._session_lock:
+            width, height = self.left_zsl_config['main']['size']
+            shape = (height, width, 3)
+            capacity = FrameRing.capacity_for(memory_mb * 2**20, shape)
+            if self.zsl is not None and self.zsl.running and self.zsl.ring.capacity == capacity:
+                return self.zsl.ring
+            self.disable_zsl()
+            # Allocated once, pairs are copied into the slots in place
+            ring = FrameRing(capacity, shape)
+            self.set_mode("zsl")
+            self.acquire()
+            self.zsl = ZslRecorder(self.pairs, ring)
+            self.zsl.start()
+            return ring
+
+    def disable_zsl(self):
+        """
+        Stop recording and free the ring.
+        """
+        with self._session_lock:
+            if self.zsl is None:
+                return
+            self.zsl.stop()
+            self.zsl = None
+            self.release()
+
+    def _zsl_frames(self, count, at_ns=None):
+        """
+        Frame numbers of the selected pair and the count - 1 pairs before it.
+        """
+        recorder = self.zsl
+        if not recorder.running:
+            raise RuntimeError(f"Zero shutter lag recording stopped: {recorder.error}")
+        # Right after enabling the ring is still empty
+        if not recorder.ring.wait(1, timeout=self.ZSL_FIRST_FRAME_TIMEOUT):
+            raise RuntimeError("No zero shutter lag pair recorded yet")
+        if self.zsl_select == "sharpest":
+            frame = recorder.ring.select(window=self.zsl_window, sharpest=True)
+        else:
+            frame = recorder.ring.select(at_ns=at_ns)
+        return recorder.ring.neighbours(frame, count)
+
+    def _zsl_preview(self):
+        # Display sized view of the latest pair, strided like the preview stream scaler
+        from PIL import Image
+        if not self.zsl.ring.wait(1, timeout=self.ZSL_FIRST_FRAME_TIMEOUT):
+            raise RuntimeError("No zero shutter lag pair recorded yet")
+        frame = self.zsl.ring.select()
+        step = max(1, self.left_zsl_config['main']['size'][0] // self.PREVIEW_SIZE[0])
+        with self.zsl.ring.read(frame) as [(left, right, _)]:
+            return Image.fromarray(left[::step, ::step].copy()), Image.fromarray(right[::step, ::step].copy())
+
+    def _catalog_record(self, handle):
+        metadata = handle.metadata
+        return {
+            'id': metadata['id'],
+            'group_id': metadata['group_id'],
+            'numberplate': metadata['numberplate'],
+            'label': metadata['label'],
+            'config_name': metadata['config_name'],
+            'created_at': time.time(),
+            'storage_format': self.storage_format,
+            'paths': handle.paths + ([handle.metadata_path] if handle.metadata_path else []),
+            'metadata': metadata,
+            'fingerprint': metadata.get('fingerprint'),
+        }
 
-            self.stop_cameras()
+    def _on_written(self, future, capture_id):
+        if future.cancelled() or future.exception() is not None:
+            try:
+                self.catalog.remove([capture_id])
+                self.duplicates.remove([capture_id])
+            except Exception as e:
+                print(f"Error removing {capture_id} from the catalog: {e}")
 
-            return self.last_captured
-        
-        self.stop_cameras()
+    def _capture_arrays(self, overrides=None, not_before_ns=None):
+        """
+        Capture one pair, applying the control overrides first.
+        :param not_before_ns: Skip pairs whose exposure started before this time.monotonic_ns()
+        Returns:
+            tuple: (left_array, right_array, metadata)
+        """
+        controls = dict(self.current_controls)
+        if overrides:
+            controls.update(overrides)
+            self._set_controls(controls)
+
+        # Capture both cameras in parallel, copy the arrays out of the buffers.
+        # Controls need a few frames to take effect, skip pairs until they did.
+        # Frames queued before the strobe went on are skipped as well.
+        settle_frames = max(
+            self.BRACKET_SETTLE_FRAMES if overrides else 1,
+            self.STROBE_SETTLE_FRAMES if not_before_ns is not None else 1,
+        )
+        start = time.perf_counter()
+        for attempt in range(settle_frames):
+            with self.pairs.capture() as pair:
+                settled = not overrides or self._controls_applied(pair, overrides)
+                lit = not_before_ns is None or min(pair.left_timestamp, pair.right_timestamp) >= not_before_ns
+                if not (settled and lit) and attempt < settle_frames - 1:
+                    continue
+                if not settled:
+                    print(f"Bracket controls {overrides} did not settle, using the last frame")
+                if not lit:
+                    print("No frame exposed entirely with the strobe on, using the last frame")
+                if settle_frames > 1:
+                    observe('ae_settle', time.perf_counter() - start)
+                left_array, right_array = self.pairs.map(
+                    lambda request: request.make_array("main"),
+                    pair.left_request, pair.right_request
+                )
+                return left_array, right_array, dict(pair.to_dict(), controls=controls)
+
+    def _controls_applied(self, pair, overrides):
+        for metadata in (pair.left_metadata, pair.right_metadata):
+            for control, value in overrides.items():
+                actual = metadata.get(control)
+                if actual is None:
+                    continue
+                if abs(actual - value) > self.BRACKET_TOLERANCE * abs(value):
+                    return False
+        return True
 
+    @staticmethod
+    def _strobe_timing(strobe, metadata):
+        """
+        Lead: light on until the exposure started, lag: exposure end until light off.
+        Negative values mean the light was not on for the whole exposure.
+        """
+        start = min(metadata['left_timestamp'], metadata['right_timestamp'])
+        exposure_ns = 1000 * max(
+            metadata['left_metadata'].get('ExposureTime', 0), metadata['right_metadata'].get('ExposureTime', 0)
+        )
+        end = max(metadata['left_timestamp'], metadata['right_timestamp']) + exposure_ns
+        return {
+            'brightness': strobe.brightness,
+            'lead_ms': (start - strobe.on_ns) / 1e6 if strobe.on_ns is not None else None,
+            'lag_ms': (strobe.off_ns - end) / 1e6 if strobe.off_ns is not None else None,
+        }
 
+    def exposure_bracket(self, count, ev_step=1.0, control='ExposureTime'):
+        """
+        Build control overrides stepping control symmetrically around its current value.
+        :param count: Number of steps
+        :param ev_step: Distance between steps in EV (factor 2 per EV)
+        :param control: ExposureTime or AnalogueGain
+        Returns:
+            list: One dict of control overrides per step.
+        """
+        if control not in self.BRACKET_CONTROLS:
+            raise ValueError(f"Bracketing is supported for {self.BRACKET_CONTROLS}, not {control}")
+        options = self.get_camera_options()[control]
+        base = self.current_controls.get(control, options['default'])
+
+        bracket = []
+        for index in range(count):
+            ev = (index - (count - 1) / 2) * ev_step
+            value = min(max(base * 2 ** ev, options['min']), options['max'])
+            bracket.append({control: self.CONTROLS[control](value)})
+        return bracket
 
     def stop(self):
         """
         Stop both camera streams without fully releasing the camera resources.
         """
-        self.left_cam.stop()
-        self.right_cam.stop()
+        with self._session_lock:
+            self.disable_zsl()
+            self._session_users = 0
+            self.stop_cameras()
+
+    def set_strobe(self, light, brightness=STROBE_BRIGHTNESS):
+        """
+        Flash a light during captures, the lead/lag of every pair is stored in
+        its metadata under 'strobe' (and in last_strobe).
+        :param light: LightController, None disables the strobe
+        :param brightness: Brightness while capturing
+        """
+        self.light = light
+        self.strobe_brightness = brightness
+
+    def set_skew_policy(self, max_skew_ms=MAX_SKEW_MS, max_retries=MAX_PAIR_RETRIES):
+        """
+        Configure how far apart the left and right SensorTimestamps may be.
+        :param max_skew_ms: Maximum accepted skew in milliseconds
+        :param max_retries: Number of re-captures before the best effort pair is kept
+        """
+        self.pairs.max_skew_ms = max_skew_ms
+        self.pairs.max_retries = max_retries
 
     def close(self):
         """
@@ -211,11 +782,21 @@ class StereoCamera:
         """
         # stop if needed
         try:
-            self.left_cam.stop()
-            self.right_cam.stop()
+            self.stop()
+        except Exception:
+            pass
+
+        try:
+            self.pairs.shutdown()
         except Exception:
             pass
 
+        # make sure no queued pair is lost
+        try:
+            self.writer.shutdown()
+        except Exception as e:
+            print(f"Error flushing image writer: {e}")
+
         # close handles
         try:
             self.left_cam.close()
@@ -235,7 +816,8 @@ class StereoCamera:
     def save_cam_config(self, name=str(uuid.uuid4())[:8]):
         settings_file = os.path.join(self.ROOT_DIR, self.CONFIG_PATH, f'camera_settings_{name}.json')
         with open(settings_file, 'w') as f:
-            json.dump(self.current_controls, f, indent=4)
+            # Quality gate thresholds are kept next to the controls they were tuned for
+            json.dump(dict(self.current_controls, quality=self.quality.thresholds), f, indent=4)
 
     def get_saved_configs(self):
         # Get all available files in the CONFIG_PATH directory
@@ -256,6 +838,8 @@ class StereoCamera:
             raise FileNotFoundError(f"Configuration file {config_name} does not exist.")
         with open(config_file, 'r') as f:
             config_data = json.load(f)
+        # Configs saved before the quality gate use the default thresholds
+        self.quality = QualityGate(config_data.pop('quality', None))
         self.adjust_config(config_data)
         # Store the current config name
         self.current_config = config_name
@@ -263,8 +847,9 @@ class StereoCamera:
         return config_data
 
 if __name__ == "__main__":
-    right_cam = Picamera2(0)
-    left_cam  = Picamera2(1)
+    backend = get_backend()
+    right_cam = backend.open(0)
+    left_cam  = backend.open(1)
 
     # Configure the cameras
     right_camera_config = right_cam.create_preview_configuration()
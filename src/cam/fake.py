@@ -0,0 +1,231 @@
+"""
+Stand-in for ``picamera2.Picamera2`` that runs without a Raspberry Pi.
+
+Only the subset of the API used by ``StereoCamera`` is implemented. Starting a
+camera sleeps for ``start_delay`` seconds to mimic the pipeline restart and the
+AE/AWB convergence of the real IMX219, and frames are delivered at
+``frame_interval`` so that latencies measured against the fake are comparable
+to the hardware.
+"""
+
+import time
+import threading
+
+import numpy as np
+
+
+class FakeRequest:
+    """
+    Completed request as returned by ``FakePicamera2.capture_request()``.
+    """
+
+    def __init__(self, camera, arrays, metadata):
+        self.camera = camera
+        self.arrays = arrays
+        self.metadata = metadata
+        self.released = False
+
+    def make_array(self, name="main"):
+        return self.arrays[name]
+
+    def make_image(self, name="main"):
+        from PIL import Image
+        return Image.fromarray(self.arrays[name])
+
+    def get_metadata(self):
+        return dict(self.metadata)
+
+    def save(self, name, file_output, format=None):
+        self.make_image(name).save(file_output, format=format)
+
+    def release(self):
+        self.released = True
+
+
+class FakePicamera2:
+    START_DELAY = 1.0  # seconds until the pipeline delivers settled frames
+    SWITCH_DELAY = 0.1  # seconds for a mode switch of a running camera
+    FRAME_INTERVAL = 1 / 30  # seconds between two frames of the stream
+    SENSOR_SIZE = (3280, 2464)
+
+    # (min, max, default) like Picamera2.camera_controls
+    CAMERA_CONTROLS = {
+        'Sharpness': (0.0, 16.0, 1.0),
+        'NoiseReductionMode': (0, 4, 0),
+        'Contrast': (0.0, 32.0, 1.0),
+        'AnalogueGain': (1.0, 10.666667, 1.0),
+        'ExposureTime': (75, 11766829, 20000),
+    }
+
+    _instances = []
+
+    def __init__(self, camera_num=0, start_delay=None, frame_interval=None, switch_delay=None):
+        self.camera_num = camera_num
+        self.start_delay = self.START_DELAY if start_delay is None else start_delay
+        self.frame_interval = self.FRAME_INTERVAL if frame_interval is None else frame_interval
+        self.switch_delay = self.SWITCH_DELAY if switch_delay is None else switch_delay
+        self.camera_controls = dict(self.CAMERA_CONTROLS)
+        self.controls = {}
+        self.camera_config = None
+        self.started = False
+        self.closed = False
+
+        # Lifecycle counters, handy for asserting how often the pipeline restarts
+        self.start_count = 0
+        self.stop_count = 0
+        self.switch_count = 0
+        self.frame_count = 0
+
+        self._lock = threading.Lock()
+        self._stream_start = None
+        FakePicamera2._instances.append(self)
+
+    @classmethod
+    def close_all(cls):
+        for camera in list(cls._instances):
+            camera.close()
+
+    # -----------------------------------------------------------
+    # Configuration
+    def _make_config(self, use_case, main, lores, buffer_count):
+        main = dict(main or {})
+        main.setdefault('format', 'BGR888')
+        main.setdefault('size', self.SENSOR_SIZE)
+        if lores is not None:
+            lores = dict(lores)
+            lores.setdefault('format', 'YUV420')
+        return {
+            'use_case': use_case,
+            'buffer_count': buffer_count,
+            'main': main,
+            'lores': lores,
+            'controls': {},
+        }
+
+    def create_still_configuration(self, main=None, lores=None, buffer_count=1, **kwargs):
+        return self._make_config('still', main, lores, buffer_count)
+
+    def create_preview_configuration(self, main=None, lores=None, buffer_count=4, **kwargs):
+        main = dict(main or {})
+        main.setdefault('size', (640, 480))
+        return self._make_config('preview', main, lores, buffer_count)
+
+    def create_video_configuration(self, main=None, lores=None, buffer_count=6, **kwargs):
+        main = dict(main or {})
+        main.setdefault('size', (1280, 720))
+        return self._make_config('video', main, lores, buffer_count)
+
+    def configure(self, camera_config):
+        if self.started:
+            raise RuntimeError("Camera must be stopped before configuring")
+        self.camera_config = camera_config
+        # Like Picamera2, the controls of the config replace the ones set before
+        self.controls = dict(camera_config.get('controls', {}))
+
+    # -----------------------------------------------------------
+    # Lifecycle
+    def start(self):
+        if self.closed:
+            raise RuntimeError("Camera has been closed")
+        if self.started:
+            return
+        if self.camera_config is None:
+            self.configure(self.create_preview_configuration())
+        time.sleep(self.start_delay)
+        self.started = True
+        self.start_count += 1
+        self._stream_start = time.monotonic_ns()
+
+    def switch_mode(self, camera_config):
+        """
+        Reconfigure a running camera, AE/AWB state is kept.
+        """
+        if not self.started:
+            self.configure(camera_config)
+            return
+        self.started = False
+        self.configure(camera_config)
+        time.sleep(self.switch_delay)
+        self.started = True
+        self.switch_count += 1
+        self._stream_start = time.monotonic_ns()
+
+    def stop(self):
+        if self.started:
+            self.started = False
+            self.stop_count += 1
+
+    def close(self):
+        self.stop()
+        self.closed = True
+        if self in FakePicamera2._instances:
+            FakePicamera2._instances.remove(self)
+
+    def set_controls(self, controls):
+        self.controls.update(controls)
+
+    # -----------------------------------------------------------
+    # Capturing
+    def _make_frame(self, stream):
+        width, height = stream['size']
+        if stream['format'] == 'YUV420':
+            return np.zeros((height * 3 // 2, width), dtype=np.uint8)
+        return np.zeros((height, width, 3), dtype=np.uint8)
+
+    def _wait_for_frame(self):
+        # Block until the next frame boundary of the running stream
+        interval_ns = int(self.frame_interval * 1e9)
+        now = time.monotonic_ns()
+        if interval_ns > 0:
+            elapsed = now - self._stream_start
+            next_frame = self._stream_start + (elapsed // interval_ns + 1) * interval_ns
+            time.sleep((next_frame - now) / 1e9)
+            return next_frame
+        return now
+
+    def capture_request(self):
+        if not self.started:
+            raise RuntimeError("Camera is not running")
+        with self._lock:
+            timestamp = self._wait_for_frame()
+            self.frame_count += 1
+            arrays = {'main': self._make_frame(self.camera_config['main'])}
+            if self.camera_config.get('lores'):
+                arrays['lores'] = self._make_frame(self.camera_config['lores'])
+            metadata = {
+                'SensorTimestamp': timestamp,
+                'FrameDuration': int(self.frame_interval * 1e6),
+                # 0 (or never set) leaves them to the automatic exposure, which settles on the default
+                'ExposureTime': self.controls.get('ExposureTime') or self.camera_controls['ExposureTime'][2],
+                'AnalogueGain': self.controls.get('AnalogueGain') or self.camera_controls['AnalogueGain'][2],
+            }
+        return FakeRequest(self, arrays, metadata)
+
+    def capture_array(self, name="main"):
+        request = self.capture_request()
+        try:
+            return request.make_array(name)
+        finally:
+            request.release()
+
+    def capture_image(self, name="main"):
+        request = self.capture_request()
+        try:
+            return request.make_image(name)
+        finally:
+            request.release()
+
+    def capture_metadata(self):
+        request = self.capture_request()
+        try:
+            return request.get_metadata()
+        finally:
+            request.release()
+
+    def capture_file(self, file_output, name="main", format=None):
+        request = self.capture_request()
+        try:
+            request.save(name, file_output, format=format)
+            return request.get_metadata()
+        finally:
+            request.release()
@@ -0,0 +1,129 @@
+"""
+Concurrent left/right request capture paired by sensor timestamp.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from metrics import timer, observe
+
+
+class StereoPair:
+    """
+    A left and right completed request captured as one stereo pair.
+    Both requests hold camera buffers until release() is called.
+    """
+
+    def __init__(self, left_request, right_request, attempts=1):
+        self.left_request = left_request
+        self.right_request = right_request
+        self.left_metadata = left_request.get_metadata()
+        self.right_metadata = right_request.get_metadata()
+        self.attempts = attempts
+
+    @property
+    def left_timestamp(self):
+        return self.left_metadata.get('SensorTimestamp', 0)
+
+    @property
+    def right_timestamp(self):
+        return self.right_metadata.get('SensorTimestamp', 0)
+
+    @property
+    def skew_ns(self):
+        """
+        Signed inter-camera skew in nanoseconds (left minus right).
+        """
+        return self.left_timestamp - self.right_timestamp
+
+    @property
+    def skew_ms(self):
+        return abs(self.skew_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            'left_timestamp': self.left_timestamp,
+            'right_timestamp': self.right_timestamp,
+            'skew_ns': self.skew_ns,
+            'attempts': self.attempts,
+            'left_metadata': self.left_metadata,
+            'right_metadata': self.right_metadata,
+        }
+
+    def release(self):
+        self.left_request.release()
+        self.right_request.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class PairCapturer:
+    """
+    Grabs requests from both running cameras in parallel and pairs them by
+    their SensorTimestamp. If the skew exceeds max_skew_ms the older request is
+    dropped and replaced by the next frame of that camera, up to max_retries times.
+    """
+
+    def __init__(self, left_cam, right_cam, max_skew_ms=10.0, max_retries=4):
+        self.left_cam = left_cam
+        self.right_cam = right_cam
+        self.max_skew_ms = max_skew_ms
+        self.max_retries = max_retries
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stereo-pair")
+
+    def capture(self):
+        """
+        Capture one stereo pair.
+        Returns:
+            StereoPair: The best pair found, the caller has to release() it.
+        """
+        with timer('request_capture'):
+            futures = (
+                self.executor.submit(self.left_cam.capture_request),
+                self.executor.submit(self.right_cam.capture_request),
+            )
+            wait(futures)
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                # Give the buffer of the camera that did deliver back, otherwise
+                # every failure leaks one request of its pool until the camera stalls
+                for future in futures:
+                    if future.exception() is None:
+                        future.result().release()
+                raise errors[0]
+            pair = StereoPair(futures[0].result(), futures[1].result())
+
+        while pair.skew_ms > self.max_skew_ms and pair.attempts <= self.max_retries:
+            # Replace the request that was exposed first with a newer frame
+            newer_left = pair.skew_ns < 0
+            kept = pair.right_request if newer_left else pair.left_request
+            (pair.left_request if newer_left else pair.right_request).release()
+            try:
+                if newer_left:
+                    pair = StereoPair(self.left_cam.capture_request(), kept, pair.attempts + 1)
+                else:
+                    pair = StereoPair(kept, self.right_cam.capture_request(), pair.attempts + 1)
+            except Exception:
+                kept.release()
+                raise
+
+        observe('pair_skew', abs(pair.skew_ns) / 1e9)
+        if pair.skew_ms > self.max_skew_ms:
+            print(f"Stereo pair skew {pair.skew_ms:.2f} ms exceeds {self.max_skew_ms} ms after {pair.attempts} attempts")
+        return pair
+
+    def map(self, fn, left, right):
+        """
+        Run fn for the left and right side in parallel.
+        Returns:
+            tuple: (fn(left), fn(right))
+        """
+        left_future = self.executor.submit(fn, left)
+        right_future = self.executor.submit(fn, right)
+        return left_future.result(), right_future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
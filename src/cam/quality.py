@@ -0,0 +1,133 @@
+"""
+Fast image quality measures on downsampled frames.
+
+The quality gate checks every captured pair before it is written or counted
+for its numberplate: blur (variance of the Laplacian), over- and under-exposure
+(share of clipped pixels), a missing light (mean brightness) and a left/right
+brightness mismatch. All measures run on every STEP-th pixel, about 20 ms
+per full resolution pair.
+"""
+
+import time
+
+import numpy as np
+
+from metrics import timer
+
+STEP = 4  # pixel stride, 3280x2464 -> 820x616
+
+# Stored with the camera config JSON under "quality"
+DEFAULT_THRESHOLDS = {
+    'enabled': True,
+    'step': STEP,
+    'min_sharpness': 15.0,  # Laplacian variance of the downsampled luma
+    'min_brightness': 20.0,  # mean luma, below the light was off
+    'max_overexposed': 0.02,  # share of pixels >= 250
+    'max_underexposed': 0.5,  # share of pixels <= 5
+    'max_brightness_mismatch': 0.25,  # |left - right| / brighter mean
+}
+
+
+class CaptureRejected(Exception):
+    """
+    No pair of a capture passed the quality gate, it was neither written nor counted.
+    """
+
+    def __init__(self, reports):
+        self.reports = reports
+        reasons = sorted({reason for report in reports for reason in report['reasons']})
+        super().__init__(f"Retake needed: {', '.join(reasons)}")
+
+
+def sharpness(array, step=STEP):
+    """
+    Variance of the Laplacian of the green channel, sampled every step pixels.
+    Higher is sharper, only comparable between frames of the same scene.
+    """
+    green = array[::step, ::step, 1] if array.ndim == 3 else array[::step, ::step]
+    green = green.astype(np.float32)
+    laplacian = (
+        green[1:-1, :-2] + green[1:-1, 2:] + green[:-2, 1:-1] + green[2:, 1:-1] - 4 * green[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def luma(array, step=STEP):
+    """
+    (R + 2G + B) / 4 of every step-th pixel as float32, independent of RGB/BGR order.
+    """
+    sample = array[::step, ::step].astype(np.float32)
+    return (sample[..., 0] + 2 * sample[..., 1] + sample[..., 2]) * 0.25
+
+
+def measure(array, step=STEP):
+    """
+    Returns:
+        dict: sharpness, brightness, overexposed and underexposed share of one frame
+    """
+    values = luma(array, step)
+    return {
+        'sharpness': sharpness(values, step=1),
+        'brightness': float(values.mean()),
+        'overexposed': float(np.count_nonzero(values >= 250) / values.size),
+        'underexposed': float(np.count_nonzero(values <= 5) / values.size),
+    }
+
+
+class QualityGate:
+    def __init__(self, thresholds=None):
+        """
+        :param thresholds: Overrides of DEFAULT_THRESHOLDS
+        """
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        self.update(thresholds)
+
+    @property
+    def enabled(self):
+        return bool(self.thresholds['enabled'])
+
+    def update(self, thresholds=None):
+        """
+        Set thresholds, unknown keys are ignored.
+        """
+        for key, value in (thresholds or {}).items():
+            if key in DEFAULT_THRESHOLDS:
+                self.thresholds[key] = type(DEFAULT_THRESHOLDS[key])(value)
+
+    def check(self, left, right, exposure=True):
+        """
+        Measure a pair against the thresholds.
+        :param exposure: Check the exposure, off for intentionally bracketed pairs
+        Returns:
+            dict: passed, reasons, left and right measures, brightness_mismatch and seconds
+        """
+        start = time.perf_counter()
+        limits = self.thresholds
+        with timer('quality_gate'):
+            sides = {'left': measure(left, limits['step']), 'right': measure(right, limits['step'])}
+
+        reasons = []
+        for side, values in sides.items():
+            if values['sharpness'] < limits['min_sharpness']:
+                reasons.append(f"{side} blurred")
+            if not exposure:
+                continue
+            if values['brightness'] < limits['min_brightness']:
+                reasons.append(f"{side} too dark")
+            if values['overexposed'] > limits['max_overexposed']:
+                reasons.append(f"{side} overexposed")
+            if values['underexposed'] > limits['max_underexposed']:
+                reasons.append(f"{side} underexposed")
+
+        brighter = max(sides['left']['brightness'], sides['right']['brightness'], 1.0)
+        mismatch = abs(sides['left']['brightness'] - sides['right']['brightness']) / brighter
+        if mismatch > limits['max_brightness_mismatch']:
+            reasons.append("left/right brightness mismatch")
+
+        return {
+            'passed': not reasons,
+            'reasons': reasons,
+            'brightness_mismatch': mismatch,
+            'seconds': time.perf_counter() - start,
+            **sides,
+        }
@@ -0,0 +1,245 @@
+"""
+Zero shutter lag: both cameras stream continuously into a preallocated ring of
+frame buffers, a capture picks a pair that was already exposed.
+
+The ring is allocated once for a memory budget (a full resolution pair is
+about 48 MB) and its slots are overwritten in place, oldest first. Readers pin
+a slot while they copy it out, the recorder skips pinned slots.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from .fake import FakeRequest
+from .quality import sharpness
+
+try:
+    # Maps the camera buffer without the copy make_array() does
+    from picamera2 import MappedArray
+except ImportError:
+    MappedArray = None
+
+
+def copy_frame(request, out, name="main"):
+    """
+    Copy a stream of a completed request into a preallocated array.
+    """
+    if MappedArray is None or isinstance(request, FakeRequest):
+        np.copyto(out, request.make_array(name))
+        return
+    with MappedArray(request, name) as mapped:
+        np.copyto(out, mapped.array)
+
+
+class FrameRing:
+    """
+    Fixed size ring of stereo pairs with their exposure time and focus measure.
+    """
+
+    def __init__(self, capacity, shape, dtype=np.uint8):
+        """
+        :param capacity: Number of pairs
+        :param shape: Shape of one frame, (height, width, channels)
+        """
+        if capacity < 1:
+            raise ValueError("The ring needs at least one slot")
+        self.capacity = capacity
+        self.left = np.zeros((capacity, *shape), dtype=dtype)
+        self.right = np.zeros((capacity, *shape), dtype=dtype)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)  # exposure start, earlier camera
+        self.sharpness = np.zeros(capacity, dtype=np.float32)
+        self.sequence = np.full(capacity, -1, dtype=np.int64)  # frame number of the slot, -1 while empty or written
+        self.metadata = [None] * capacity
+
+        self.written = 0
+        self._cursor = 0
+        self._pinned = [0] * capacity
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def capacity_for(memory_bytes, shape, dtype=np.uint8):
+        """
+        Returns:
+            int: Pairs of the given frame shape fitting into memory_bytes, at least 2
+        """
+        pair_bytes = 2 * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return max(2, int(memory_bytes // pair_bytes))
+
+    @classmethod
+    def for_memory(cls, memory_bytes, shape, dtype=np.uint8):
+        """
+        The largest ring that fits into memory_bytes.
+        """
+        return cls(cls.capacity_for(memory_bytes, shape, dtype), shape, dtype)
+
+    @property
+    def nbytes(self):
+        return self.left.nbytes + self.right.nbytes
+
+    def __len__(self):
+        return int((self.sequence >= 0).sum())
+
+    # -----------------------------------------------------------
+    # Writing
+    def reserve(self):
+        """
+        Claim the oldest slot that is not being read.
+        Returns:
+            int: Slot index, None if every slot is pinned
+        """
+        with self._condition:
+            for offset in range(self.capacity):
+                slot = (self._cursor + offset) % self.capacity
+                if not self._pinned[slot]:
+                    self._cursor = (slot + 1) % self.capacity
+                    self.sequence[slot] = -1
+                    return slot
+        return None
+
+    def commit(self, slot, timestamp, focus, metadata):
+        with self._condition:
+            self.timestamps[slot] = timestamp
+            self.sharpness[slot] = focus
+            self.metadata[slot] = metadata
+            self.sequence[slot] = self.written
+            self.written += 1
+            self._condition.notify_all()
+
+    # -----------------------------------------------------------
+    # Reading
+    def wait(self, count=1, timeout=None):
+        """
+        Block until count pairs were committed.
+        Returns:
+            bool: False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self.written >= count, timeout)
+
+    def select(self, at_ns=None, window=None, sharpest=False):
+        """
+        Frame number of a pair in the ring.
+        :param at_ns: Pick the pair exposed closest to this time.monotonic_ns(), latest if None
+        :param window: Only consider the window most recent pairs
+        :param sharpest: Pick the sharpest pair in the window instead
+        Returns:
+            int: Frame number, None while the ring is empty
+        """
+        with self._condition:
+            valid = np.flatnonzero(self.sequence >= 0)
+            if window is not None:
+                valid = valid[self.sequence[valid] >= self.written - window]
+            if valid.size == 0:
+                return None
+            if sharpest:
+                slot = valid[np.argmax(self.sharpness[valid])]
+            elif at_ns is not None:
+                slot = valid[np.argmin(np.abs(self.timestamps[valid] - at_ns))]
+            else:
+                slot = valid[np.argmax(self.sequence[valid])]
+            return int(self.sequence[slot])
+
+    def neighbours(self, frame, count):
+        """
+        Frame numbers of count consecutive pairs ending with frame, as far as still in the ring.
+        """
+        with self._condition:
+            present = set(self.sequence[self.sequence >= 0].tolist())
+        return [number for number in range(frame - count + 1, frame + 1) if number in present]
+
+    @contextmanager
+    def read(self, *frames):
+        """
+        Pin the slots of the frame numbers, yields a (left, right, metadata) view per frame.
+        Raises:
+            KeyError: A frame was overwritten
+        """
+        with self._condition:
+            slots = []
+            for frame in frames:
+                found = np.flatnonzero(self.sequence == frame)
+                if found.size == 0:
+                    raise KeyError(f"Frame {frame} is no longer in the ring")
+                slots.append(int(found[0]))
+            for slot in slots:
+                self._pinned[slot] += 1
+        try:
+            yield [(self.left[slot], self.right[slot], self.metadata[slot]) for slot in slots]
+        finally:
+            with self._condition:
+                for slot in slots:
+                    self._pinned[slot] -= 1
+
+    def copy(self, *frames):
+        """
+        Returns:
+            list: (left_array, right_array, metadata) per frame, copied out of the ring
+        """
+        with self.read(*frames) as views:
+            return [(left.copy(), right.copy(), dict(metadata)) for left, right, metadata in views]
+
+
+class ZslRecorder:
+    """
+    Background thread feeding the pairs of the running cameras into a FrameRing.
+    """
+
+    def __init__(self, pairs, ring, focus=sharpness):
+        """
+        :param pairs: PairCapturer of the running cameras
+        :param ring: FrameRing with the frame shape of the main stream
+        :param focus: Focus measure of the left frame
+        """
+        self.pairs = pairs
+        self.ring = ring
+        self.focus = focus
+        self.dropped = 0  # frames skipped because every slot was pinned
+        self.error = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="zsl-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop after the pair in flight, the ring keeps its frames.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._record()
+            except Exception as e:
+                # Cameras stopped or reconfigured underneath
+                print(f"Zero shutter lag recording stopped: {e}")
+                self.error = e
+                return
+
+    def _record(self):
+        with self.pairs.capture() as pair:
+            slot = self.ring.reserve()
+            if slot is None:
+                self.dropped += 1
+                return
+            self.pairs.map(
+                lambda args: copy_frame(args[0], args[1]),
+                (pair.left_request, self.ring.left[slot]), (pair.right_request, self.ring.right[slot]),
+            )
+            metadata = dict(pair.to_dict(), recorded_ns=time.monotonic_ns())
+        self.ring.commit(slot, min(pair.left_timestamp, pair.right_timestamp), self.focus(self.ring.left[slot]), metadata)
@@ -0,0 +1,189 @@
+"""
+Background encode-and-write pipeline for captured stereo pairs.
+
+Encoding two full resolution PNGs takes seconds on a Pi 5, so capture_images()
+only copies the raw arrays out of the camera buffers and hands them to a pool
+of worker processes. The number of pairs in flight is bounded, submitting
+blocks once the queue is full.
+"""
+
+import io
+import os
+import json
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from metrics import observe
+
+
+def _save_array(array, path):
+    """
+    Returns:
+        tuple: (encode_seconds, write_seconds)
+    """
+    from PIL import Image
+
+    start = time.perf_counter()
+    extension = os.path.splitext(path)[1].lower()
+    image_format = Image.registered_extensions().get(extension)
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format=image_format)
+    encoded = time.perf_counter()
+
+    # Write to a temporary file first so readers never see half written images
+    tmp_path = f"{path}.part"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(tmp_path, path)
+    return encoded - start, time.perf_counter() - encoded
+
+
+def _write_pair(left_array, right_array, left_path, right_path, metadata_path=None, metadata=None):
+    """
+    Worker entry point, encodes and writes one stereo pair.
+    Returns:
+        tuple: ((left_path, right_path), timings) with timings the encode/file_write seconds
+    """
+    left_encode, left_write = _save_array(left_array, left_path)
+    right_encode, right_write = _save_array(right_array, right_path)
+    start = time.perf_counter()
+    if metadata_path is not None:
+        with open(metadata_path, 'w') as f:
+            json.dump(metadata or {}, f, indent=4, default=str)
+    timings = {
+        'encode': left_encode + right_encode,
+        'file_write': left_write + right_write + time.perf_counter() - start,
+    }
+    return (left_path, right_path), timings
+
+
+def _write_container(left_array, right_array, path, metadata=None, compression="none"):
+    """
+    Worker entry point, writes one stereo pair into a single .stpair container.
+    Arrays are streamed into the file, the whole write counts as file_write.
+    Returns:
+        tuple: ((path,), timings)
+    """
+    from storage.container import write_pair
+
+    start = time.perf_counter()
+    write_pair(path, left_array, right_array, metadata, compression=compression)
+    return (path,), {'file_write': time.perf_counter() - start}
+
+
+class CaptureHandle:
+    """
+    Handle for a pair that is being written in the background.
+    The raw arrays stay available for display while the files are written.
+    """
+
+    def __init__(self, future, left_image, right_image, paths, metadata_path=None, metadata=None):
+        self.future = future
+        self.left_image = left_image
+        self.right_image = right_image
+        self.paths = list(paths)  # [left, right] PNGs or [container]
+        self.metadata_path = metadata_path
+        self.metadata = metadata or {}
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Block until the pair is written.
+        Returns:
+            tuple: The written paths
+        """
+        return self.future.result(timeout)[0]
+
+    def exception(self, timeout=None):
+        return self.future.exception(timeout)
+
+
+class ImageWriter:
+    WORKERS = 2
+    QUEUE_SIZE = 4  # pairs in flight before submit() blocks
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def submit(self, left_image, right_image, left_path, right_path, metadata_path=None, metadata=None, timeout=None):
+        """
+        Queue a pair for encoding as two image files plus a JSON sidecar.
+        Blocks while queue_size pairs are in flight.
+        :param timeout: Seconds to wait for a free slot, None waits forever
+        Returns:
+            CaptureHandle: Handle to poll or wait for the written files.
+        """
+        future = self._submit(
+            timeout, _write_pair, left_image, right_image, left_path, right_path, metadata_path, metadata
+        )
+        return CaptureHandle(future, left_image, right_image, [left_path, right_path], metadata_path, metadata)
+
+    def submit_container(self, left_image, right_image, path, metadata=None, compression="none", timeout=None):
+        """
+        Queue a pair for writing into a single .stpair container, metadata is
+        stored in the container header.
+        Returns:
+            CaptureHandle: Handle to poll or wait for the written file.
+        """
+        future = self._submit(timeout, _write_container, left_image, right_image, path, metadata, compression)
+        return CaptureHandle(future, left_image, right_image, [path], None, metadata)
+
+    def _submit(self, timeout, fn, *args):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"Image writer queue is full ({self.queue_size} pairs pending)")
+
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Error writing images: {future.exception()}")
+            return
+        # Timings are measured in the worker process, recorded here
+        _, timings = future.result()
+        for stage, seconds in timings.items():
+            observe(stage, seconds)
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued pair has been written.
+        """
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass  # already reported by _on_done
+
+    def shutdown(self):
+        """
+        Flush all pending pairs and stop the worker processes.
+        """
+        self.flush()
+        self.executor.shutdown(wait=True)
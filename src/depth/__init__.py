@@ -0,0 +1,5 @@
+from .matcher import load_config, save_config, compute_disparity, disparity_to_depth
+from .batch import find_pairs, run_batch
+from .tread import TreadMeter, TreadMeasurement, measure_tread
+
+__all__ = ["load_config", "save_config", "compute_disparity", "disparity_to_depth", "find_pairs", "run_batch", "TreadMeter", "TreadMeasurement", "measure_tread"]
\ No newline at end of file
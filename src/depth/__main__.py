@@ -0,0 +1,69 @@
+"""
+Batch depth-map command line.
+
+    cd src && python -m depth ../data/images --output ../data/depth
+    cd src && python -m depth --catalog ../data/catalog.sqlite --numberplate S-AB-1234
+    cd src && python -m depth --write-config  # dump the matcher config for editing
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from .matcher import ROOT_DIR, CONFIG_PATH, load_config, save_config
+from .batch import find_pairs, catalog_pairs, run_batch
+
+OUTPUT_PATH = "./data/depth"
+CACHE_PATH = "./data/depth_cache"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m depth", description="Compute depth maps for stereo pairs")
+    parser.add_argument("images", nargs="?", help="Capture directory with PNG pairs or .stpair containers")
+    parser.add_argument("--catalog", help="Take the pairs from a capture catalog instead")
+    parser.add_argument("--numberplate", help="Catalog filter")
+    parser.add_argument("--config-name", help="Catalog filter on the camera config name")
+    parser.add_argument("--output", default=os.path.join(ROOT_DIR, OUTPUT_PATH), help="Output directory")
+    parser.add_argument("--config", help=f"Matcher config JSON, defaults to {CONFIG_PATH}")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to the number of cores")
+    parser.add_argument("--calibration-dir", help="Calibration directory, defaults to data/calibration")
+    parser.add_argument("--cache-dir", default=os.path.join(ROOT_DIR, CACHE_PATH), help="Result cache directory")
+    parser.add_argument("--cache-size-mb", type=int, default=2048, help="Cache size bound in MB")
+    parser.add_argument("--no-cache", action="store_true", help="Always recompute")
+    parser.add_argument("--force", action="store_true", help="Also process pairs that already have outputs")
+    parser.add_argument("--write-config", action="store_true", help="Write the effective matcher config and exit")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.write_config:
+        save_config(config, args.config)
+        print(json.dumps(config, indent=4))
+        return
+
+    if args.catalog:
+        from storage.catalog import CaptureCatalog
+        pairs = catalog_pairs(CaptureCatalog(args.catalog), numberplate=args.numberplate, config_name=args.config_name)
+    elif args.images:
+        pairs = find_pairs(args.images)
+    else:
+        parser.error("either a capture directory or --catalog is required")
+
+    def progress(done, total, name):
+        print(f"\r{done}/{total} {name}", end="", file=sys.stderr, flush=True)
+
+    stats = run_batch(pairs, args.output, config, workers=args.workers,
+                      calibration_dir=args.calibration_dir, progress=progress,
+                      cache_dir=None if args.no_cache else args.cache_dir,
+                      cache_max_bytes=args.cache_size_mb * 1024**2, force=args.force)
+    print(file=sys.stderr)
+    print(f"Processed {stats['processed']} pairs ({stats['skipped']} already done, {len(stats['failed'])} failed) "
+          f"in {stats['seconds']:.1f} s, {stats['pairs_per_sec']:.2f} pairs/sec")
+    if not args.no_cache:
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        hit_rate = stats['cache_hits'] / lookups if lookups else 0.0
+        print(f"Cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses ({hit_rate:.0%} hit rate)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Batch depth-map engine.
+
+Computes disparity and depth maps for every stereo pair of a capture directory
+(or catalog query) in parallel across cores. Results are written as 16-bit PNGs:
+
+    {name}_disparity.png        disparity * 16 (StereoSGBM fixed point)
+    {name}_depth_mm.png         depth in mm
+    {name}_depth_filtered_mm.png  median filtered depth in mm
+
+The depth file is written last, pairs that already have it are skipped, so an
+interrupted run can simply be restarted. With a cache directory the results
+are also looked up in / stored into a content-addressed DepthCache, so
+re-running over the same captures with the same parameters skips the matcher.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from .matcher import (
+    compute_disparity, create_matcher, disparity_to_depth, focal_length_px, baseline_mm, to_uint16
+)
+from .roi import coarse_to_fine_disparity
+from .cache import DepthCache
+
+CONTAINER_EXTENSION = ".stpair"
+
+
+def find_pairs(images_dir):
+    """
+    Find the stereo pairs of a capture directory.
+    Returns:
+        list: (name, paths) with paths [left.png, right.png] or [container.stpair]
+    """
+    pairs = []
+    for filename in sorted(os.listdir(images_dir)):
+        if filename.endswith("_L.png"):
+            name = filename[:-len("_L.png")]
+            right_path = os.path.join(images_dir, f"{name}_R.png")
+            if os.path.exists(right_path):
+                pairs.append((name, [os.path.join(images_dir, filename), right_path]))
+        elif filename.endswith(CONTAINER_EXTENSION):
+            pairs.append((filename[:-len(CONTAINER_EXTENSION)], [os.path.join(images_dir, filename)]))
+    return pairs
+
+
+def catalog_pairs(catalog, **filters):
+    """
+    Stereo pairs of a catalog query, filters as in CaptureCatalog.query().
+    """
+    pairs = []
+    for capture in catalog.query(**filters):
+        paths = [path for path in capture['paths'] if not path.endswith(".json")]
+        name = os.path.basename(paths[0])
+        for suffix in ("_L.png", CONTAINER_EXTENSION):
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+        pairs.append((name, paths))
+    return pairs
+
+
+def load_gray_pair(paths):
+    """
+    Returns:
+        tuple: (left, right) as uint8 grayscale arrays
+    """
+    if len(paths) == 1 and paths[0].endswith(CONTAINER_EXTENSION):
+        from storage.container import StereoPairFile
+        pair = StereoPairFile(paths[0])
+        return tuple(cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY) for image in (pair.left, pair.right))
+    return cv2.imread(paths[0], cv2.IMREAD_GRAYSCALE), cv2.imread(paths[1], cv2.IMREAD_GRAYSCALE)
+
+
+def output_paths(output_dir, name):
+    return {
+        'disparity': os.path.join(output_dir, f"{name}_disparity.png"),
+        'depth': os.path.join(output_dir, f"{name}_depth_mm.png"),
+        'filtered': os.path.join(output_dir, f"{name}_depth_filtered_mm.png"),
+    }
+
+
+def is_done(output_dir, name):
+    return os.path.exists(output_paths(output_dir, name)['depth'])
+
+
+def _write_png(path, image):
+    tmp_path = f"{path}.part.png"
+    cv2.imwrite(tmp_path, image)
+    os.replace(tmp_path, path)
+
+
+# Per worker process state, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(config, calibration_dir, cache_dir=None, cache_max_bytes=None):
+    # One pair per core, keep OpenCV from spawning its own threads on top
+    cv2.setNumThreads(1)
+    _worker['config'] = config
+    _worker['matcher'] = create_matcher(config)
+    _worker['rectifier'] = None
+    _worker['cache'] = DepthCache(cache_dir, cache_max_bytes) if cache_dir else None
+    if config.get('calibration'):
+        from calibration import CalibrationStore
+        try:
+            _worker['rectifier'] = CalibrationStore(calibration_dir).rectifier(config['calibration'])
+        except FileNotFoundError:
+            pass
+
+
+def compute_pair(paths, config, matcher=None, rectifier=None):
+    """
+    Compute disparity, depth and filtered depth of one pair.
+    Returns:
+        dict: disparity (float32 px), depth (uint16 mm), filtered (uint16 mm or None)
+    """
+    left, right = load_gray_pair(paths)
+    calibration = None
+    if rectifier is not None:
+        left, right = rectifier.rectify(left, right)
+        calibration = rectifier.calibration
+
+    focal_px = focal_length_px(config, left.shape[1], calibration)
+    baseline = baseline_mm(config, calibration)
+    if config.get('disparity_mode') == 'roi':
+        disparity, _ = coarse_to_fine_disparity(left, right, config, focal_px, baseline)
+    else:
+        disparity = compute_disparity(left, right, config, matcher)
+    depth_16bit = to_uint16(disparity_to_depth(disparity, focal_px, baseline, config['min_disparity']))
+    filtered = cv2.medianBlur(depth_16bit, config['median_filter']) if config.get('median_filter') else None
+    return {'disparity': disparity, 'depth': depth_16bit, 'filtered': filtered}
+
+
+def process_pair(name, paths, output_dir, config=None, matcher=None, rectifier=None, cache=None):
+    """
+    Compute (or fetch from the cache) and write the disparity and depth maps of one pair.
+    Returns:
+        tuple: (name, seconds, cache_hit) with cache_hit None if no cache is used
+    """
+    start = time.perf_counter()
+    config = config or _worker['config']
+    matcher = matcher or _worker.get('matcher')
+    rectifier = rectifier if rectifier is not None else _worker.get('rectifier')
+    cache = cache if cache is not None else _worker.get('cache')
+
+    results = None
+    cache_hit = None
+    if cache is not None:
+        key = DepthCache.key(paths, config, rectifier.calibration if rectifier is not None else None)
+        results = cache.get(key)
+        cache_hit = results is not None
+    if results is None:
+        results = compute_pair(paths, config, matcher, rectifier)
+        if cache is not None:
+            cache.put(key, **{name: array for name, array in results.items() if array is not None})
+
+    paths_out = output_paths(output_dir, name)
+    _write_png(paths_out['disparity'], np.clip(results['disparity'] * 16, 0, 65535).astype(np.uint16))
+    if results.get('filtered') is not None:
+        _write_png(paths_out['filtered'], results['filtered'])
+    # Written last, marks the pair as done
+    _write_png(paths_out['depth'], results['depth'])
+
+    return name, time.perf_counter() - start, cache_hit
+
+
+def run_batch(pairs, output_dir, config, workers=None, calibration_dir=None, progress=None,
+              cache_dir=None, cache_max_bytes=2 * 1024**3, force=False):
+    """
+    Process all pairs that are not done yet with a process pool.
+    :param pairs: (name, paths) as returned by find_pairs()/catalog_pairs()
+    :param workers: Worker processes, defaults to the number of cores
+    :param progress: Optional callback(done, total, name)
+    :param cache_dir: DepthCache directory, None disables the cache
+    :param cache_max_bytes: Size bound of the cache
+    :param force: Recompute pairs that already have outputs (the cache still applies)
+    Returns:
+        dict: processed, skipped, failed, seconds, pairs_per_sec, cache_hits, cache_misses
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    todo = [(name, paths) for name, paths in pairs if force or not is_done(output_dir, name)]
+    skipped = len(pairs) - len(todo)
+
+    processed = 0
+    failed = []
+    cache_hits = 0
+    cache_misses = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(), initializer=_init_worker,
+        initargs=(config, calibration_dir, cache_dir, cache_max_bytes)
+    ) as executor:
+        futures = {executor.submit(process_pair, name, paths, output_dir): name for name, paths in todo}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                _, _, cache_hit = future.result()
+                processed += 1
+                cache_hits += cache_hit is True
+                cache_misses += cache_hit is False
+            except Exception as e:
+                print(f"Error computing depth for {name}: {e}")
+                failed.append(name)
+            if progress is not None:
+                progress(processed + len(failed), len(todo), name)
+    seconds = time.perf_counter() - start
+
+    if cache_dir:
+        # Workers only evict every few puts, enforce the bound once at the end
+        DepthCache(cache_dir, cache_max_bytes).evict()
+
+    return {
+        'processed': processed,
+        'skipped': skipped,
+        'failed': failed,
+        'seconds': seconds,
+        'pairs_per_sec': processed / seconds if seconds > 0 else 0.0,
+        'cache_hits': cache_hits,
+        'cache_misses': cache_misses,
+    }
@@ -0,0 +1,125 @@
+"""
+Content-addressed on-disk cache for disparity/depth results.
+
+The key is a hash over the bytes of the pair's files, the full matcher config
+and the calibration fingerprint, so re-running the depth extraction with the
+same settings is a lookup and any parameter change is a new entry. The cache
+directory is bounded in size, least recently used entries are evicted first
+(file mtime is bumped on every hit).
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+# Bump when the stored arrays change meaning
+CACHE_VERSION = 1
+
+
+class DepthCache:
+    EXTENSION = ".npz"
+    EVICT_EVERY = 16  # puts between directory scans for eviction
+
+    def __init__(self, directory, max_bytes=2 * 1024**3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(paths, config, calibration=None):
+        """
+        Hash of the pair content plus every parameter that influences the result.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(CACHE_VERSION).encode())
+        for path in paths:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+        digest.update((calibration.fingerprint() if calibration is not None else "uncalibrated").encode())
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.EXTENSION)
+
+    def get(self, key):
+        """
+        Returns:
+            dict or None: Cached arrays (disparity, depth, filtered)
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as cached:
+                arrays = {name: cached[name] for name in cached.files}
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+        # Mark as recently used
+        os.utime(path)
+        self.hits += 1
+        return arrays
+
+    def put(self, key, **arrays):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.part.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+        self._puts += 1
+        if self._puts % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def entries(self):
+        """
+        Returns:
+            list: (mtime, size, path) of all entries, oldest first
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                if filename.endswith(self.EXTENSION) and ".part" not in filename:
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue  # evicted by another process
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+        Returns:
+            int: Number of evicted entries
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        return evicted
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,137 @@
+"""
+SGBM disparity and depth computation shared by the batch engine and experiments.
+
+Matcher parameters live in one JSON config (data/depth/matcher.json) so every
+worker, CLI run and experiment uses the same settings. Missing keys fall back to
+DEFAULT_CONFIG, which mirrors experiment/depth_map.py.
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ROOT_DIR = Path(sys.prefix).parent
+CONFIG_PATH = "./data/depth/matcher.json"
+
+DEFAULT_CONFIG = {
+    # StereoSGBM
+    'min_disparity': 0,
+    'num_disparities': 160,  # must be divisible by 16
+    'block_size': 7,
+    'window_size': 5,  # P1/P2 smoothness penalties scale with window_size**2
+    'disp12_max_diff': 1,
+    'uniqueness_ratio': 10,
+    'speckle_window_size': 50,
+    'speckle_range': 1,
+    'pre_filter_cap': 63,
+    'mode': 'SGBM_3WAY',
+    # Optics, used when no stereo calibration is available (IMX219 datasheet)
+    'focal_length_mm': 2.6,
+    'sensor_width_mm': 3.68,
+    'baseline_mm': 60.0,
+    # Disparity mode: "full" matches the whole frame, "roi" runs coarse-to-fine
+    # and matches full resolution only inside the tyre region (see depth.roi)
+    'disparity_mode': 'full',
+    'coarse_levels': 2,  # pyramid levels for the coarse pass, 2 = 1/4 resolution
+    'tire_min_mm': 200,
+    'tire_max_mm': 1500,
+    'roi_min_area': 0.01,  # fraction of the frame the tyre must cover
+    'roi_margin_px': 64,
+    'disparity_margin': 8,  # pixels added around the coarse disparity range
+    # Tread measurement (see depth.tread)
+    'tread_measure_width': 1640,  # working resolution, keeps a measurement below a second on the Pi
+    'tread_min_groove_mm': 0.5,
+    'tread_min_groove_fraction': 0.02,  # share of tyre pixels behind the blocks needed for a groove
+    'tread_max_groove_mm': 20.0,  # residuals beyond this are mismatches
+    'tread_edge_px': 8,  # ignored border along the tyre outline
+    'tread_floor_percentile': 90,
+    # Post processing
+    'median_filter': 3,
+    # Rectification with the stereo calibration from data/calibration, if present
+    'calibration': 'stereo',
+}
+
+MODES = {
+    'SGBM': cv2.STEREO_SGBM_MODE_SGBM,
+    'HH': cv2.STEREO_SGBM_MODE_HH,
+    'SGBM_3WAY': cv2.STEREO_SGBM_MODE_SGBM_3WAY,
+    'HH4': cv2.STEREO_SGBM_MODE_HH4,
+}
+
+
+def load_config(path=None):
+    """
+    Load the matcher config, merged over DEFAULT_CONFIG.
+    :param path: JSON file, defaults to data/depth/matcher.json if it exists
+    """
+    config = dict(DEFAULT_CONFIG)
+    path = path or os.path.join(ROOT_DIR, CONFIG_PATH)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def save_config(config, path=None):
+    path = path or os.path.join(ROOT_DIR, CONFIG_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=4)
+
+
+def create_matcher(config, min_disparity=None, num_disparities=None):
+    """
+    Create a StereoSGBM matcher from the config, the disparity range can be overridden.
+    """
+    window_size = config['window_size']
+    return cv2.StereoSGBM_create(
+        minDisparity=config['min_disparity'] if min_disparity is None else min_disparity,
+        numDisparities=config['num_disparities'] if num_disparities is None else num_disparities,
+        blockSize=config['block_size'],
+        P1=8 * 3 * window_size**2,
+        P2=32 * 3 * window_size**2,
+        disp12MaxDiff=config['disp12_max_diff'],
+        uniquenessRatio=config['uniqueness_ratio'],
+        speckleWindowSize=config['speckle_window_size'],
+        speckleRange=config['speckle_range'],
+        preFilterCap=config['pre_filter_cap'],
+        mode=MODES[config['mode']],
+    )
+
+
+def compute_disparity(left, right, config, matcher=None):
+    """
+    Returns:
+        np.ndarray: float32 disparity in pixels
+    """
+    matcher = matcher or create_matcher(config)
+    return matcher.compute(left, right).astype(np.float32) / 16.0
+
+
+def focal_length_px(config, image_width, calibration=None):
+    if calibration is not None:
+        # Rectified focal length, scaled to the image width
+        return calibration.focal_length_px * image_width / calibration.image_size[0]
+    return config['focal_length_mm'] * image_width / config['sensor_width_mm']
+
+
+def baseline_mm(config, calibration=None):
+    return calibration.baseline_mm if calibration is not None else config['baseline_mm']
+
+
+def disparity_to_depth(disparity, focal_px, baseline, min_disparity=0):
+    """
+    Depth in mm = focal_length_px * baseline_mm / disparity, invalid pixels are 0.
+    """
+    valid = disparity > min_disparity
+    depth = np.zeros_like(disparity)
+    np.divide(focal_px * baseline, disparity, out=depth, where=valid)
+    return depth
+
+
+def to_uint16(depth_mm):
+    return np.clip(depth_mm, 0, 65535).astype(np.uint16)
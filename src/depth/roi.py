@@ -0,0 +1,112 @@
+"""
+Tyre-ROI restricted, coarse-to-fine disparity.
+
+Most of a 3280x2464 frame is background that is thrown away after matching.
+Instead of running SGBM with the full disparity range over the whole frame:
+
+1. match a downscaled pyramid level with a proportionally smaller range,
+2. find the tyre as the region whose coarse depth lies in [tire_min_mm, tire_max_mm],
+3. match at full resolution only inside that ROI, with a narrow disparity
+   window around the coarse estimate.
+
+Pixels outside the ROI are 0 (invalid), like the background after masking.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from .matcher import create_matcher, compute_disparity
+
+
+def _downscale(image, levels):
+    for _ in range(levels):
+        image = cv2.pyrDown(image)
+    return image
+
+
+def _round_up_16(value):
+    return max(16, int(math.ceil(value / 16.0)) * 16)
+
+
+def find_roi(depth_mm, config):
+    """
+    Bounding box (x, y, w, h) of the largest region within the tyre depth range,
+    None if there is none.
+    """
+    mask = ((depth_mm > config['tire_min_mm']) & (depth_mm < config['tire_max_mm'])).astype(np.uint8)
+    # Close the gaps of invalid matches in the tread, drop speckles
+    kernel = np.ones((5, 5), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+    count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count <= 1:
+        return None
+    largest = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h, area = stats[largest]
+    if area < config['roi_min_area'] * mask.size:
+        return None
+    return int(x), int(y), int(w), int(h)
+
+
+def coarse_to_fine_disparity(left, right, config, focal_px, baseline):
+    """
+    Compute the disparity of the tyre region only.
+    :param left: Rectified grayscale left image
+    :param right: Rectified grayscale right image
+    :param focal_px: Focal length in pixels at full resolution
+    :param baseline: Baseline in mm
+    Returns:
+        tuple: (disparity, roi) with disparity as float32 in full resolution pixels
+               and roi as (x, y, w, h) in full resolution, None if the full frame was matched
+    """
+    levels = config['coarse_levels']
+    scale = 2 ** levels
+
+    # 1. Coarse disparity on the pyramid level
+    coarse_left = _downscale(left, levels)
+    coarse_right = _downscale(right, levels)
+    coarse_matcher = create_matcher(
+        config,
+        min_disparity=config['min_disparity'] // scale,
+        num_disparities=_round_up_16(config['num_disparities'] / scale),
+    )
+    coarse = compute_disparity(coarse_left, coarse_right, config, coarse_matcher) * scale
+
+    # 2. Tyre ROI from the coarse depth
+    valid = coarse > config['min_disparity']
+    coarse_depth = np.zeros_like(coarse)
+    np.divide(focal_px * baseline, coarse, out=coarse_depth, where=valid)
+    roi = find_roi(coarse_depth, config)
+    if roi is None:
+        # Nothing in the tyre range, fall back to the full frame
+        return compute_disparity(left, right, config), None
+
+    margin = config['roi_margin_px']
+    x0 = max(0, roi[0] * scale - margin)
+    y0 = max(0, roi[1] * scale - margin)
+    x1 = min(left.shape[1], (roi[0] + roi[2]) * scale + margin)
+    y1 = min(left.shape[0], (roi[1] + roi[3]) * scale + margin)
+
+    # 3. Narrow disparity window around the coarse estimate inside the ROI
+    window = (slice(roi[1], roi[1] + roi[3]), slice(roi[0], roi[0] + roi[2]))
+    in_range = (coarse_depth[window] > config['tire_min_mm']) & (coarse_depth[window] < config['tire_max_mm'])
+    roi_valid = coarse[window][in_range]
+    if roi_valid.size == 0:
+        return compute_disparity(left, right, config), None
+    low, high = np.percentile(roi_valid, (1, 99))
+    min_disparity = max(0, int(math.floor(low)) - config['disparity_margin'])
+    num_disparities = _round_up_16(high + config['disparity_margin'] - min_disparity)
+
+    # The right crop has to reach max_disparity further left than the left crop
+    xs = max(0, x0 - (min_disparity + num_disparities))
+    fine_matcher = create_matcher(config, min_disparity=min_disparity, num_disparities=num_disparities)
+    fine = compute_disparity(left[y0:y1, xs:x1], right[y0:y1, xs:x1], config, fine_matcher)
+
+    disparity = np.zeros(left.shape[:2], dtype=np.float32)
+    disparity[y0:y1, x0:x1] = fine[:, x0 - xs:]
+    # SGBM marks invalid pixels with min_disparity - 1
+    disparity[disparity < min_disparity] = 0
+    return disparity, (x0, y0, x1 - x0, y1 - y0)
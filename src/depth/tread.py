@@ -0,0 +1,211 @@
+"""
+Tread depth measurement from a captured stereo pair.
+
+The pair is matched at a reduced resolution with the coarse-to-fine ROI
+disparity, a quadratic surface is fitted to the tread blocks and the grooves
+are the pixels lying significantly behind that surface. All steps are
+vectorized NumPy/OpenCV, so a measurement fits into the capture loop.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from .matcher import load_config, focal_length_px, baseline_mm, disparity_to_depth
+from .roi import coarse_to_fine_disparity, find_roi
+
+
+class TreadMeasurement:
+    def __init__(self, depth_mm=None, confidence=0.0, groove_fraction=0.0, valid_fraction=0.0, seconds=0.0):
+        self.depth_mm = depth_mm
+        self.confidence = confidence
+        self.groove_fraction = groove_fraction
+        self.valid_fraction = valid_fraction
+        self.seconds = seconds
+
+    @property
+    def label(self):
+        # Format used for the Profile Depth label
+        return f"{self.depth_mm:.1f}" if self.depth_mm is not None else ""
+
+    def to_dict(self):
+        return {
+            'depth_mm': self.depth_mm,
+            'confidence': self.confidence,
+            'groove_fraction': self.groove_fraction,
+            'valid_fraction': self.valid_fraction,
+            'seconds': self.seconds,
+        }
+
+
+def _design_matrix(x, y):
+    # Quadratic surface a + bx + cy + dx² + exy + fy²
+    return np.stack([np.ones_like(x), x, y, x * x, x * y, y * y], axis=1)
+
+
+def fit_surface(depth_mm, mask, samples=20000, iterations=3, inlier_quantile=0.6, seed=0):
+    """
+    Robustly fit the tread surface to the valid pixels.
+    Grooves lie behind the surface (larger depth), so every iteration refits on
+    the pixels closest to the camera relative to the previous fit.
+    Returns:
+        np.ndarray: Fitted surface depth in mm for the whole image
+    """
+    ys, xs = np.nonzero(mask)
+    if len(xs) > samples:
+        pick = np.random.default_rng(seed).choice(len(xs), samples, replace=False)
+        ys, xs = ys[pick], xs[pick]
+
+    # Normalised coordinates keep the least squares problem well conditioned
+    height, width = depth_mm.shape
+    xn = xs.astype(np.float64) / width
+    yn = ys.astype(np.float64) / height
+    z = depth_mm[ys, xs].astype(np.float64)
+
+    A = _design_matrix(xn, yn)
+    inliers = np.ones(len(z), dtype=bool)
+    for _ in range(iterations):
+        coeffs, *_ = np.linalg.lstsq(A[inliers], z[inliers], rcond=None)
+        residual = z - A @ coeffs
+        inliers = residual <= np.quantile(residual, inlier_quantile)
+
+    grid_y, grid_x = np.mgrid[0:height, 0:width]
+    surface = _design_matrix((grid_x / width).ravel(), (grid_y / height).ravel()) @ coeffs
+    return surface.reshape(height, width)
+
+
+def block_level(residual, samples=20000, seed=0):
+    """
+    Half sample mode of the residuals: the densest half of the values is
+    halved until a few are left.
+    Returns:
+        float: Most frequent residual
+    """
+    values = np.asarray(residual, dtype=np.float64)
+    if len(values) > samples:
+        values = values[np.random.default_rng(seed).choice(len(values), samples, replace=False)]
+    values = np.sort(values)
+    while len(values) > 3:
+        half = (len(values) + 1) // 2
+        widths = values[half - 1:] - values[:len(values) - half + 1]
+        start = int(np.argmin(widths))
+        values = values[start:start + half]
+    return float(np.median(values))
+
+
+def measure_tread(depth_mm, config, roi=None, resolution_mm=0.0):
+    """
+    Estimate the tread depth from a depth map.
+    :param roi: (x, y, w, h) tyre region, detected from the depth range if None
+    :param resolution_mm: Depth change of one disparity pixel at the tyre distance,
+                          SGBM sub-pixel values lock onto whole pixels so steps
+                          below half of it are not trusted
+    Returns:
+        TreadMeasurement
+    """
+    if roi is None:
+        roi = find_roi(depth_mm, config)
+    if roi is None:
+        return TreadMeasurement()
+
+    x, y, w, h = roi
+    depth = depth_mm[y:y + h, x:x + w]
+    valid = (depth > config['tire_min_mm']) & (depth < config['tire_max_mm'])
+    valid_fraction = float(valid.mean())
+    # Matches along the tyre outline mix tyre and background, drop them
+    edge = 2 * config['tread_edge_px'] + 1
+    valid = cv2.erode(valid.astype(np.uint8), np.ones((edge, edge), np.uint8)).astype(bool)
+    if valid.sum() < 100:
+        return TreadMeasurement(valid_fraction=valid_fraction)
+
+    # Anything further off the surface than a groove can be is a mismatch,
+    # refit without those so they do not tilt the surface
+    residual = depth - fit_surface(depth, valid)
+    valid &= np.abs(residual) <= config['tread_max_groove_mm']
+    if valid.sum() < 100:
+        return TreadMeasurement(valid_fraction=valid_fraction)
+    residual = (depth - fit_surface(depth, valid))[valid]
+
+    # Tread blocks scatter around their level, grooves sit behind them. The
+    # most frequent residual is the block level whatever the groove share,
+    # the noise is taken from the front side of it only, grooves never lie there
+    blocks = block_level(residual)
+    noise = float(np.median(blocks - residual[residual <= blocks])) * 1.4826
+    offset = max(config['tread_min_groove_mm'], 3 * noise, resolution_mm / 2)
+    grooves = residual[residual > blocks + offset]
+    # Block noise reaches as far behind the blocks as in front of them, only
+    # the excess over the mirrored front tail are groove pixels
+    front = int(np.count_nonzero(residual < blocks - offset))
+    groove_fraction = max(0, len(grooves) - front) / len(residual)
+    if groove_fraction < config['tread_min_groove_fraction']:
+        return TreadMeasurement(0.0, confidence=0.0, groove_fraction=groove_fraction, valid_fraction=valid_fraction)
+
+    # Groove floor: robust high percentile of the groove pixels
+    depth_estimate = float(np.percentile(grooves, config['tread_floor_percentile']) - blocks)
+
+    # Confidence: coverage, a plausible groove share and signal over noise
+    coverage = min(1.0, valid_fraction / 0.8)
+    share = 1.0 if 0.05 <= groove_fraction <= 0.5 else 0.5
+    uncertainty = 2 * noise + resolution_mm / 2
+    signal = depth_estimate / (depth_estimate + uncertainty) if depth_estimate > 0 else 0.0
+    confidence = float(np.clip(coverage * share * signal, 0.0, 1.0))
+
+    return TreadMeasurement(depth_estimate, confidence, groove_fraction, valid_fraction)
+
+
+class TreadMeter:
+    """
+    Runs the measurement on a freshly captured pair, sized to stay within the
+    capture loop (tread_measure_width controls the working resolution).
+    """
+
+    def __init__(self, config=None, rectifier=None):
+        self.config = config or load_config()
+        self.rectifier = rectifier
+        if self.rectifier is None and self.config.get('calibration'):
+            from calibration import CalibrationStore
+            try:
+                self.rectifier = CalibrationStore().rectifier(self.config['calibration'])
+            except FileNotFoundError:
+                pass
+
+    def measure(self, left, right):
+        """
+        :param left: Left image (RGB or grayscale)
+        :param right: Right image (RGB or grayscale)
+        Returns:
+            TreadMeasurement
+        """
+        start = time.perf_counter()
+        left = np.asarray(left)
+        right = np.asarray(right)
+        if left.ndim == 3:
+            left = cv2.cvtColor(left, cv2.COLOR_RGB2GRAY)
+            right = cv2.cvtColor(right, cv2.COLOR_RGB2GRAY)
+
+        calibration = None
+        if self.rectifier is not None:
+            left, right = self.rectifier.rectify(left, right)
+            calibration = self.rectifier.calibration
+
+        # Work on a reduced resolution, the disparity range shrinks accordingly
+        scale = min(1.0, self.config['tread_measure_width'] / left.shape[1])
+        if scale < 1.0:
+            size = (int(left.shape[1] * scale), int(left.shape[0] * scale))
+            left = cv2.resize(left, size, interpolation=cv2.INTER_AREA)
+            right = cv2.resize(right, size, interpolation=cv2.INTER_AREA)
+        config = dict(self.config, num_disparities=max(16, int(np.ceil(self.config['num_disparities'] * scale / 16)) * 16))
+
+        focal_px = focal_length_px(config, left.shape[1], calibration)
+        baseline = baseline_mm(config, calibration)
+        disparity, roi = coarse_to_fine_disparity(left, right, config, focal_px, baseline)
+        depth = disparity_to_depth(disparity, focal_px, baseline, config['min_disparity'])
+
+        # Depth step of one disparity pixel at the tyre: z² / (f * b)
+        tyre = depth[(depth > config['tire_min_mm']) & (depth < config['tire_max_mm'])]
+        resolution = float(np.median(tyre)) ** 2 / (focal_px * baseline) if tyre.size else 0.0
+
+        measurement = measure_tread(depth, config, roi, resolution)
+        measurement.seconds = time.perf_counter() - start
+        return measurement
@@ -0,0 +1,213 @@
+"""
+Background animation engine for the NeoPixel strip.
+
+Effects are generators yielding frames ``(colors, brightness)`` with one colour
+per pixel. The Animator plays them on a daemon thread at a fixed frame rate, a
+new effect cancels the running one. Outside of effects the strip shows the
+steady state (colour and brightness), updates to it are coalesced: callers only
+store the latest value and return, the thread writes it with the next frame.
+"""
+
+import time
+import threading
+
+from metrics import timer
+
+OFF = (0, 0, 0)
+WHITE = (255, 255, 255)
+
+
+def _scale(color, level):
+    return tuple(int(channel * level) for channel in color)
+
+
+def fade(num_pixels, color, start, end, duration, frame_rate):
+    """
+    Fade all pixels from brightness start to end.
+    """
+    frames = max(1, int(duration * frame_rate))
+    for i in range(frames + 1):
+        yield [color] * num_pixels, start + (end - start) * i / frames
+
+
+def flash(num_pixels, color=WHITE, brightness=1.0, duration=0.1, frame_rate=60):
+    """
+    Light all pixels for duration, then off.
+    """
+    for _ in range(max(1, int(duration * frame_rate))):
+        yield [color] * num_pixels, brightness
+    yield [OFF] * num_pixels, brightness
+
+
+def pulse(num_pixels, color=WHITE, brightness=1.0, period=1.0, cycles=1, frame_rate=60):
+    """
+    Fade in and out cycles times.
+    """
+    for _ in range(cycles):
+        yield from fade(num_pixels, color, 0.0, brightness, period / 2, frame_rate)
+        yield from fade(num_pixels, color, brightness, 0.0, period / 2, frame_rate)
+
+
+def startup(num_pixels, duration=1.2, frame_rate=60):
+    """
+    Readiness signal: fade the pixels in one after the other, then a short flash.
+    """
+    colors = [OFF] * num_pixels
+    steps = max(1, int(duration * frame_rate / num_pixels))
+    for i in range(num_pixels):
+        for j in range(1, steps + 1):
+            colors[i] = _scale(WHITE, j / steps)
+            yield list(colors), 1.0
+    yield [OFF] * num_pixels, 1.0
+    yield from flash(num_pixels, WHITE, 1.0, 0.1, frame_rate)
+
+
+class Animator:
+    FRAME_RATE = 60
+
+    def __init__(self, pixels, frame_rate=FRAME_RATE):
+        """
+        :param pixels: NeoPixel_SPI compatible strip created with auto_write=False
+        :param frame_rate: Frames per second of effects
+        """
+        self.pixels = pixels
+        self.frame_rate = frame_rate
+        self.frames = 0  # frames written to the strip
+        self.shown_ns = None  # time.monotonic_ns() after the last write
+
+        self._condition = threading.Condition()
+        self._effect = None
+        self._state = ([OFF] * len(pixels), pixels.brightness)
+        self._dirty = False
+        self._urgent = False
+        self._shown_state = None
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="light-animator", daemon=True)
+        self._thread.start()
+
+    def play(self, effect):
+        """
+        Play an effect (iterable of frames), replacing the running one. Returns right away.
+        """
+        with self._condition:
+            self._effect = iter(effect)
+            self._condition.notify_all()
+
+    def cancel(self):
+        """
+        Stop the running effect, the strip returns to the steady state.
+        """
+        with self._condition:
+            if self._effect is not None:
+                self._effect = None
+                self._dirty = True
+                self._condition.notify_all()
+
+    def set_state(self, color, brightness):
+        """
+        Set the steady state. Returns right away, shown with the next frame
+        (or after the running effect).
+        """
+        with self._condition:
+            self._state = ([color] * len(self.pixels), brightness)
+            self._dirty = True
+            self._condition.notify_all()
+
+    def show(self, color, brightness, timeout=1.0):
+        """
+        Cancel the running effect and write the state right away, without waiting
+        for the frame interval.
+        Returns:
+            int: time.monotonic_ns() after the write, None on timeout
+        """
+        state = ([color] * len(self.pixels), brightness)
+        with self._condition:
+            self._effect = None
+            self._state = state
+            self._dirty = True
+            self._urgent = True
+            self._condition.notify_all()
+            if not self._condition.wait_for(lambda: self._closed or self._shown_state is state, timeout):
+                return None
+            return self.shown_ns if self._shown_state is state else None
+
+    @property
+    def playing(self):
+        return self._effect is not None
+
+    def idle(self):
+        with self._condition:
+            return self._effect is None and not self._dirty and not self._busy
+
+    def wait(self, timeout=None):
+        """
+        Wait until the running effect finished and the steady state is shown.
+        Returns:
+            bool: False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._closed or (self._effect is None and not self._dirty and not self._busy), timeout
+            )
+
+    def close(self, timeout=1.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def _next_frame(self):
+        # Called with the condition held
+        if self._effect is not None:
+            try:
+                return next(self._effect), True
+            except StopIteration:
+                self._effect = None
+                self._dirty = True
+        if self._dirty:
+            self._dirty = False
+            self._urgent = False
+            return self._state, False
+        return None, False
+
+    def _render(self, frame):
+        colors, brightness = frame
+        if len(set(colors)) == 1:
+            self.pixels.fill(colors[0])
+        else:
+            for i, color in enumerate(colors):
+                self.pixels[i] = color
+        self.pixels.brightness = brightness
+        with timer('light_spi_write'):
+            self.pixels.show()
+        self.shown_ns = time.monotonic_ns()
+        self.frames += 1
+
+    def _run(self):
+        interval = 1.0 / self.frame_rate
+        deadline = time.perf_counter()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or self._effect is not None or self._dirty)
+                if self._closed:
+                    return
+                frame, animated = self._next_frame()
+                self._busy = frame is not None
+            if frame is not None:
+                try:
+                    self._render(frame)
+                except Exception as e:
+                    print(f"Error writing light frame: {e}")
+            with self._condition:
+                self._busy = False
+                if frame is not None:
+                    self._shown_state = frame
+                self._condition.notify_all()
+                if animated:
+                    # Fixed frame rate, drop behind frames instead of catching up.
+                    # show() interrupts the wait, a cancel or new effect is picked up after it
+                    deadline = max(deadline + interval, time.perf_counter())
+                    self._condition.wait_for(lambda: self._closed or self._urgent, deadline - time.perf_counter())
+                else:
+                    deadline = time.perf_counter()
@@ -0,0 +1,78 @@
+"""
+Stand-in for ``neopixel_spi.NeoPixel_SPI`` that runs without a Raspberry Pi.
+
+Only the subset of the API used by ``LightController`` is implemented. Every
+``show()`` records a frame (timestamp, brightness and pixel colours) and takes
+``show_duration`` seconds like the SPI transfer of the real strip, so frame
+rates and latencies can be measured off-device.
+"""
+
+import time
+import threading
+
+GRB = "GRB"
+RGB = "RGB"
+
+
+class FakeNeoPixelSPI:
+    # 24 bits per pixel, each encoded as 8 SPI bits at 6.4 MHz, plus the latch
+    SHOW_DURATION_PER_PIXEL = 24 * 8 / 6.4e6
+    LATCH_DURATION = 80e-6
+
+    def __init__(self, spi, n, pixel_order=GRB, auto_write=True, brightness=1.0, show_duration=None, record=True):
+        """
+        :param spi: Ignored, for signature compatibility
+        :param n: Number of pixels
+        :param show_duration: Seconds a show() takes, defaults to the SPI transfer time of n pixels
+        :param record: Keep every shown frame in frames
+        """
+        self.n = n
+        self.pixel_order = pixel_order
+        self.auto_write = auto_write
+        self.brightness = brightness
+        self.show_duration = (
+            n * self.SHOW_DURATION_PER_PIXEL + self.LATCH_DURATION if show_duration is None else show_duration
+        )
+        self.record = record
+
+        self._pixels = [(0, 0, 0)] * n
+        self._lock = threading.Lock()
+        self.shows = 0
+        self.frames = []  # (timestamp, brightness, pixels)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = tuple(color)
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        self._pixels = [tuple(color)] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        with self._lock:
+            time.sleep(self.show_duration)
+            self.shows += 1
+            if self.record:
+                self.frames.append((time.perf_counter(), self.brightness, tuple(self._pixels)))
+
+    def deinit(self):
+        self.fill((0, 0, 0))
+        self.show()
+
+    def lit(self):
+        """
+        Returns:
+            bool: Whether the last shown frame had any pixel on
+        """
+        if not self.frames:
+            return False
+        _, brightness, pixels = self.frames[-1]
+        return brightness > 0 and any(any(channel for channel in color) for color in pixels)
@@ -1,82 +1,144 @@
-import time
-import board
-import neopixel_spi as neopixel
+import os
+from contextlib import contextmanager
 
 from utils.decorators import singleton
-
+from .animation import Animator, startup, flash, pulse, OFF, WHITE
+from .fake import FakeNeoPixelSPI
+
+
+def open_pixels(num_pixels, pixel_order, backend=None):
+    """
+    Open the NeoPixel strip with auto_write disabled.
+    :param backend: "neopixel" (SPI on the Pi) or "fake", defaults to LIGHT_BACKEND or "neopixel"
+    """
+    backend = backend or os.environ.get("LIGHT_BACKEND", "neopixel")
+    if backend == "fake":
+        return FakeNeoPixelSPI(None, num_pixels, pixel_order=pixel_order, auto_write=False)
+    if backend != "neopixel":
+        raise ValueError(f"Unknown light backend: {backend}, choose from ['neopixel', 'fake']")
+    # Imported lazily, board and neopixel_spi only exist on the Pi
+    import board
+    import neopixel_spi as neopixel
+    return neopixel.NeoPixel_SPI(board.SPI(), num_pixels, pixel_order=pixel_order, auto_write=False)
+
+
+class Strobe:
+    """
+    Timing of one strobe, on_ns/off_ns are time.monotonic_ns() after the frames
+    were written, the clock of the camera SensorTimestamp.
+    """
+
+    def __init__(self, brightness):
+        self.brightness = brightness
+        self.on_ns = None
+        self.off_ns = None
 
 
 @singleton
 class LightController:
-    PIXEL_ORDER = neopixel.GRB
+    PIXEL_ORDER = "GRB"  # neopixel_spi.GRB
     NUM_PIXELS = 8
+    COLOR = WHITE
 
-    def __init__(self):
-        self.spi = board.SPI()
-        self.pixels = neopixel.NeoPixel_SPI(self.spi, self.NUM_PIXELS, pixel_order=self.PIXEL_ORDER, auto_write=False)
+    def __init__(self, pixels=None, show_off=True, frame_rate=Animator.FRAME_RATE):
+        """
+        All writes to the strip happen on the animation thread, the methods
+        below only update the requested state and return right away.
+        :param pixels: NeoPixel_SPI compatible strip, defaults to open_pixels()
+        :param show_off: Play the startup animation
+        :param frame_rate: Frames per second of the animations
+        """
+        self.pixels = pixels if pixels is not None else open_pixels(self.NUM_PIXELS, self.PIXEL_ORDER)
 
         self.brightness = 1.0
         self.on = False
+        self.animator = Animator(self.pixels, frame_rate)
 
         # Show that light is working and the system is ready
-        self.show_off()
+        if show_off:
+            self.show_off()
+
+    @property
+    def hardware_writes(self):
+        # Number of show() calls, i.e. SPI transfers to the pixels
+        return self.animator.frames
+
+    def _update(self):
+        self.animator.set_state(self.COLOR if self.on else OFF, self.brightness)
 
     def set_brightness(self, brightness):
         """
-        Set the brightness of the light.
+        Set the brightness of the light, no-op if it is unchanged.
         :param brightness: Brightness level (0.0 to 1.0)
         """
+        if brightness == self.brightness:
+            return
         self.brightness = brightness
-        self.pixels.brightness = brightness
-        self.pixels.show()
+        self._update()
 
     def toggle(self):
         """
         Toggle the light on or off.
         """
-        self.on = not self.on
-        if self.on:
-            self.pixels.fill((255, 255, 255))
-        else:
-            self.pixels.fill((0, 0, 0))
-            
-        self.pixels.brightness = self.brightness
-        self.pixels.show()
+        self.turn(not self.on)
 
     def turn(self, on_off):
         """
-        Turn the light on or off.
+        Turn the light on or off, no-op if it already is.
         :param on_off: True to turn on, False to turn off
         """
+        if on_off == self.on:
+            return
         self.on = on_off
-        if self.on:
-            self.pixels.fill((255, 255, 255))
-        else:
-            self.pixels.fill((0, 0, 0))
-            
-        self.pixels.brightness = self.brightness
-        self.pixels.show()
+        self._update()
 
     def show_off(self):
-        steps = 500 # smoothness of the fade effect
-        for i in range(self.NUM_PIXELS):
-            for j in range(steps):
-                brightness = int(255 * j / (steps - 1))
-                self.pixels[i] = (brightness, brightness, brightness)
-                self.pixels.show()
-        
-        self.pixels.fill((0, 0, 0))
-        self.pixels.show()
-        time.sleep(0.1)
-        # Flashbang
-        self.pixels.fill((255, 255, 255))
-        self.pixels.show()   
-        time.sleep(0.1)
-        self.pixels.fill((0, 0, 0))
-        self.pixels.show()
-
-    
+        # Pixel by pixel fade in followed by a flash, runs in the background
+        self.animator.play(startup(self.NUM_PIXELS, frame_rate=self.animator.frame_rate))
+
+    def flash(self, duration=0.1):
+        self.animator.play(flash(self.NUM_PIXELS, self.COLOR, self.brightness, duration, self.animator.frame_rate))
+
+    def pulse(self, period=1.0, cycles=1):
+        self.animator.play(pulse(self.NUM_PIXELS, self.COLOR, self.brightness, period, cycles, self.animator.frame_rate))
+
+    @contextmanager
+    def strobe(self, brightness=1.0):
+        """
+        Switch the light on for the duration of the block, e.g. a capture, and
+        back to the current on/off state afterwards. Unlike turn() this waits
+        until the frames were written.
+        :param brightness: Brightness while the block runs
+        Yields:
+            Strobe: on_ns is set on entry, off_ns after the block
+        """
+        strobe = Strobe(brightness)
+        strobe.on_ns = self.animator.show(self.COLOR, brightness)
+        try:
+            yield strobe
+        finally:
+            strobe.off_ns = self.animator.show(self.COLOR if self.on else OFF, self.brightness)
+
+    def cancel(self):
+        """
+        Stop the running animation and return to the current on/off state.
+        """
+        self.animator.cancel()
+
+    def wait(self, timeout=None):
+        """
+        Wait until animations finished and the current state is shown.
+        """
+        return self.animator.wait(timeout)
+
+    def close(self):
+        self.animator.cancel()
+        self.animator.set_state(OFF, self.brightness)
+        self.animator.wait(1.0)
+        self.animator.close()
 
+        from utils.decorators import _instances
+        _instances.pop(self.__class__, None)
 
 
 
@@ -0,0 +1,4 @@
+from .registry import REGISTRY, MetricsRegistry, Histogram, STAGES, timer, observe, enable
+from .server import MetricsServer, serve
+
+__all__ = ["REGISTRY", "MetricsRegistry", "Histogram", "STAGES", "timer", "observe", "enable", "MetricsServer", "serve"]
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Latency histograms for the capture hot path.
+
+Stages record their duration with ``timer(name)`` (a context manager) or
+``observe(name, seconds)``. While the registry is disabled, timer() returns a
+shared no-op context manager and observe() returns right away, so the
+instrumentation can stay in the hot path. Enable it with ``METRICS_ENABLED=1``
+or ``enable()``.
+"""
+
+import os
+import time
+import bisect
+import threading
+
+# Seconds, 100 µs to 10 s
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+# Left/right skew, 10 µs to 50 ms
+SKEW_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05)
+
+# Instrumented stages: name -> (description, buckets)
+STAGES = {
+    'camera_start': ("Start of both camera pipelines", DEFAULT_BUCKETS),
+    'ae_settle': ("Capture of a pair until controls/strobe settled", DEFAULT_BUCKETS),
+    'request_capture': ("Capture of one left/right request pair", DEFAULT_BUCKETS),
+    'pair_skew': ("Absolute left/right SensorTimestamp skew", SKEW_BUCKETS),
+    'encode': ("Encoding one pair (PNG or container)", DEFAULT_BUCKETS),
+    'file_write': ("Writing one encoded pair to disk", DEFAULT_BUCKETS),
+    'numberplate_persist': ("Numberplate count update in the store", DEFAULT_BUCKETS),
+    'light_spi_write': ("One NeoPixel show() over SPI", DEFAULT_BUCKETS),
+    'quality_gate': ("Quality measures of one pair", DEFAULT_BUCKETS),
+    'fingerprint': ("Perceptual hash and duplicate lookup of one pair", DEFAULT_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, name, description="", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile by linear interpolation within its bucket,
+        like Prometheus' histogram_quantile().
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if index == len(self.buckets):
+                    return self.buckets[-1]  # in the +Inf bucket
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+            count = self.count
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+        return {
+            'description': self.description,
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    PREFIX = "stereo"
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    description, buckets = STAGES.get(name, ("", DEFAULT_BUCKETS))
+                    histogram = self._histograms[name] = Histogram(name, description, buckets)
+        return histogram
+
+    def timer(self, name):
+        """
+        Context manager recording the duration of the block in seconds.
+        """
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self.histogram(name))
+
+    def observe(self, name, value):
+        if self.enabled:
+            self.histogram(name).observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: name -> count, sum, mean, p50/p95/p99 and cumulative buckets (seconds)
+        """
+        return {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+
+    def to_prometheus(self):
+        """
+        Returns:
+            str: All histograms in the Prometheus text exposition format
+        """
+        lines = []
+        for name, snapshot in self.snapshot().items():
+            metric = f"{self.PREFIX}_{name}_seconds"
+            lines.append(f"# HELP {metric} {snapshot['description']}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in snapshot['buckets'].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum {snapshot['sum']}")
+            lines.append(f"{metric}_count {snapshot['count']}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry(enabled=os.environ.get("METRICS_ENABLED", "0") == "1")
+
+
+# Bound methods, one call less in the hot path
+timer = REGISTRY.timer
+observe = REGISTRY.observe
+
+
+def enable(enabled=True):
+    REGISTRY.enabled = enabled
@@ -0,0 +1,82 @@
+"""
+HTTP endpoint for the metrics registry, served from a daemon thread:
+
+    GET /metrics        Prometheus text format
+    GET /metrics.json   JSON snapshot
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .registry import REGISTRY
+
+
+class MetricsServer:
+    HOST = "127.0.0.1"
+    PORT = 9108
+
+    def __init__(self, registry=REGISTRY, host=HOST, port=PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def start(self):
+        """
+        Start serving, no-op while already running.
+        """
+        if self._server is not None:
+            return
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.to_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # no line per scrape
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+
+_server = None
+
+
+def serve(port=MetricsServer.PORT, host=MetricsServer.HOST):
+    """
+    Start the process wide metrics endpoint once, later calls return the running server.
+    """
+    global _server
+    if _server is None:
+        _server = MetricsServer(REGISTRY, host, port)
+        _server.start()
+    return _server
@@ -1,25 +1,36 @@
 import os
 from pathlib import Path
 import re
-import json
 import sys
 
 from utils.decorators import singleton
+from metrics import timer
+from .store import PlateStore
 
 @singleton
 class Numberplate:
     ROOT_DIR = Path(sys.prefix).parent 
-    NUMBERPLATE_PATH = "./data/numberplates.json"
-    
-    def __init__(self):
-        self.plates = self._load_numberplates()
+    NUMBERPLATE_PATH = "./data/numberplates.json"  # legacy counts, imported into the store once
+    STORE_PATH = "./data/numberplates.sqlite"
+    QUOTA = 4  # captures per numberplate, NUMBERPLATE_QUOTA overrides it
+
+    def __init__(self, quota=None, store=None):
+        """
+        :param quota: Captures allowed per numberplate, defaults to NUMBERPLATE_QUOTA or QUOTA
+        :param store: PlateStore, defaults to data/numberplates.sqlite
+        """
+        self.quota = quota if quota is not None else int(os.environ.get("NUMBERPLATE_QUOTA", self.QUOTA))
+        self.store = store if store is not None else PlateStore(
+            os.path.join(self.ROOT_DIR, self.STORE_PATH),
+            import_json=os.path.join(self.ROOT_DIR, self.NUMBERPLATE_PATH)
+        )
 
         self._numberplate = ""
         self.full = False
 
-    def _load_numberplates(self):
-        with open(os.path.join(self.ROOT_DIR, self.NUMBERPLATE_PATH), "r") as f:
-            return json.load(f)
+    @property
+    def plates(self):
+        return self.store.counts()
     
     @property
     def numberplate(self):
@@ -33,27 +44,24 @@ class Numberplate:
         self.validate()
         self.check_if_full()
 
-    def _save_numberplates(self):
-        with open(os.path.join(self.ROOT_DIR, self.NUMBERPLATE_PATH), "w") as f:
-            json.dump(self.plates, f, indent=2)
-
     def validate(self):
         pattern = r"^[A-Z]{1,3}-[A-Z]{1,2}-\d{1,4}$"
         return bool(re.match(pattern, self.numberplate))
 
     def check_if_full(self):
-        self.full = self.plates.get(self.numberplate, 0) >= 4
+        # Read from the store so captures of other processes are taken into account
+        self.full = self.store.get(self.numberplate) >= self.quota
 
 
     def add(self):
-        if not self.full:
-            self.plates[self.numberplate] = self.plates.get(self.numberplate, 0) + 1
-            self._save_numberplates()
+        with timer('numberplate_persist'):
+            if not self.full and self.store.increment(self.numberplate, self.quota):
+                self.check_if_full()
+                return True
             self.check_if_full()
-            return True
-        return False
+            return False
 
     def remove(self):
-        self.plates[self.numberplate] -= 1
-        self._save_numberplates()
-        self.check_if_full()
\ No newline at end of file
+        with timer('numberplate_persist'):
+            self.store.decrement(self.numberplate)
+            self.check_if_full()
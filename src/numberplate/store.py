@@ -0,0 +1,113 @@
+"""
+Crash- and process-safe storage of the capture count per numberplate.
+
+Counts live in a SQLite table, every add/remove is a single row upsert inside
+an IMMEDIATE transaction, so concurrent writers never lose updates and the
+quota check and increment happen atomically.
+"""
+
+import os
+import json
+import sqlite3
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plates (
+    numberplate TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class PlateStore:
+    def __init__(self, path, import_json=None):
+        """
+        :param path: SQLite file with the counts
+        :param import_json: Legacy numberplates.json, imported once if the store is empty
+        """
+        self.path = path
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+        with self._transaction() as db:
+            empty = db.execute("SELECT COUNT(*) FROM plates").fetchone()[0] == 0
+            if empty and import_json is not None and os.path.exists(import_json):
+                with open(import_json, "r") as f:
+                    legacy = json.load(f)
+                db.executemany(
+                    "INSERT OR IGNORE INTO plates (numberplate, count) VALUES (?, ?)",
+                    list(legacy.items())
+                )
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        db = self._connect()
+        try:
+            # IMMEDIATE takes the write lock up front, read-check-write is atomic across processes
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def get(self, numberplate):
+        db = self._connect()
+        try:
+            row = db.execute("SELECT count FROM plates WHERE numberplate = ?", (numberplate,)).fetchone()
+        finally:
+            db.close()
+        return row[0] if row else 0
+
+    def increment(self, numberplate, quota=None):
+        """
+        Add one capture to the numberplate unless the quota is reached.
+        Returns:
+            bool: True if the count was incremented
+        """
+        with self._transaction() as db:
+            row = db.execute("SELECT count FROM plates WHERE numberplate = ?", (numberplate,)).fetchone()
+            count = row[0] if row else 0
+            if quota is not None and count >= quota:
+                return False
+            db.execute(
+                "INSERT INTO plates (numberplate, count) VALUES (?, 1) "
+                "ON CONFLICT (numberplate) DO UPDATE SET count = count + 1",
+                (numberplate,)
+            )
+        return True
+
+    def decrement(self, numberplate):
+        """
+        Remove one capture from the numberplate, counts never go below zero.
+        """
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE plates SET count = count - 1 WHERE numberplate = ? AND count > 0",
+                (numberplate,)
+            )
+
+    def counts(self):
+        db = self._connect()
+        try:
+            return dict(db.execute("SELECT numberplate, count FROM plates").fetchall())
+        finally:
+            db.close()
+
+    def export_json(self, path):
+        """
+        Write all counts to a JSON file in the legacy numberplates.json format.
+        """
+        with open(path, "w") as f:
+            json.dump(self.counts(), f, indent=2)
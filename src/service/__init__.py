@@ -0,0 +1,8 @@
+from .server import CaptureService
+from .client import CaptureClient, ServiceError
+
+__all__ = [
+    "CaptureService",
+    "CaptureClient",
+    "ServiceError",
+]
\ No newline at end of file
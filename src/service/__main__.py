@@ -0,0 +1,131 @@
+"""
+Capture service and its command line client.
+
+    cd src && python -m service serve
+    cd src && python -m service status
+    cd src && python -m service capture --numberplate S-AB-1234 --label 4.5 --count 3 --repeat 10 --interval 2
+    cd src && python -m service preview --frames 5 --out ../data/preview
+    cd src && python -m service stop
+"""
+
+import os
+import json
+import time
+import signal
+import argparse
+
+from .server import CaptureService
+from .client import CaptureClient, ServiceError
+
+
+def serve(args):
+    if args.metrics_port:
+        import metrics
+        metrics.enable()
+        metrics.serve(args.metrics_port)
+    service = CaptureService(address=args.socket).start()
+    if args.zsl:
+        service.cam.enable_zsl(args.zsl_mb, args.zsl)
+    # The shutdown command and SIGTERM only end serve_forever(), the cameras
+    # and the light are released here on the main thread before the interpreter exits
+    signal.signal(signal.SIGTERM, lambda *_: service.request_stop())
+    print(f"Capture service listening on {service.address}")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+def status(args):
+    with CaptureClient(args.socket) as client:
+        print(json.dumps(client.status(), indent=4))
+
+
+def capture(args):
+    with CaptureClient.connect(args.socket) as client:
+        for index in range(args.repeat):
+            if index:
+                time.sleep(args.interval)
+            for retake in range(args.retakes + 1):
+                try:
+                    result = client.capture(
+                        args.label, args.numberplate, args.count, args.bracket, images=False,
+                        check_quality=not args.no_quality_gate,
+                    )
+                    break
+                except ServiceError as e:
+                    if e.kind != "CaptureRejected" or retake == args.retakes:
+                        raise
+                    print(f"{e}, retaking")
+            for pair in result['captures']:
+                print(f"{pair['id']}  {' '.join(pair['paths'])}")
+            if result['duplicates']:
+                print(f"Looks like earlier capture(s) {', '.join(result['duplicates'])}")
+            if result['full']:
+                print(f"Numberplate {args.numberplate} is full")
+                break
+
+
+def preview(args):
+    from PIL import Image
+
+    os.makedirs(args.out, exist_ok=True)
+    with CaptureClient.connect(args.socket) as client:
+        for frame_id, left, right in client.preview_stream(args.fps, args.frames):
+            Image.fromarray(left).save(os.path.join(args.out, f"preview_{frame_id}_L.png"))
+            Image.fromarray(right).save(os.path.join(args.out, f"preview_{frame_id}_R.png"))
+            print(f"Saved preview {frame_id}")
+
+
+def stop(args):
+    with CaptureClient(args.socket) as client:
+        client.shutdown()
+    print("Capture service stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m service", description="Headless capture service")
+    parser.add_argument("--socket", help="Service socket, defaults to CAPTURE_SOCKET or data/capture.sock")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the service in the foreground")
+    serve_parser.add_argument("--socket", default=argparse.SUPPRESS, help=argparse.SUPPRESS)
+    serve_parser.add_argument(
+        "--metrics-port", type=int, default=int(os.environ.get("METRICS_PORT", 0)) or None,
+        help="Serve stage latencies on this port, defaults to METRICS_PORT",
+    )
+    serve_parser.add_argument("--zsl", choices=["nearest", "sharpest"], help="Record zero shutter lag pairs")
+    serve_parser.add_argument("--zsl-mb", type=float, help="Zero shutter lag ring size, defaults to CAM_ZSL_MB or 512")
+    serve_parser.set_defaults(func=serve)
+
+    status_parser = commands.add_parser("status", help="Show the state of the running service")
+    status_parser.set_defaults(func=status)
+
+    capture_parser = commands.add_parser("capture", help="Capture pairs, starts the service if needed")
+    capture_parser.add_argument("--numberplate", required=True)
+    capture_parser.add_argument("--label", required=True, help="Profile depth in mm")
+    capture_parser.add_argument("--count", type=int, default=1, help="Pairs per burst")
+    capture_parser.add_argument("--bracket", action="store_true", help="Exposure bracket the burst")
+    capture_parser.add_argument("--repeat", type=int, default=1, help="Number of bursts")
+    capture_parser.add_argument("--interval", type=float, default=0.0, help="Seconds between bursts")
+    capture_parser.add_argument("--retakes", type=int, default=2, help="Retakes of a burst failing the quality gate")
+    capture_parser.add_argument("--no-quality-gate", action="store_true", help="Keep pairs failing the quality gate")
+    capture_parser.set_defaults(func=capture)
+
+    preview_parser = commands.add_parser("preview", help="Save streamed preview frames")
+    preview_parser.add_argument("--frames", type=int, default=1)
+    preview_parser.add_argument("--fps", type=float, default=5.0)
+    preview_parser.add_argument("--out", default=".", help="Output directory")
+    preview_parser.set_defaults(func=preview)
+
+    stop_parser = commands.add_parser("stop", help="Stop the running service")
+    stop_parser.set_defaults(func=stop)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
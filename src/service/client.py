@@ -0,0 +1,172 @@
+"""
+Client of the capture service, used by the app and the command line.
+"""
+
+import os
+import sys
+import time
+import threading
+import subprocess
+from multiprocessing.connection import Client
+
+from .server import default_address, default_authkey
+
+
+class ServiceError(RuntimeError):
+    """
+    A command failed in the capture service.
+    """
+
+    def __init__(self, error, kind=None, message=None):
+        super().__init__(error)
+        self.kind = kind  # exception name in the service, e.g. CaptureRejected
+        self.message = message if message is not None else error  # without the exception name
+
+
+class CaptureClient:
+    def __init__(self, address=None, authkey=None):
+        """
+        :param address: Unix socket path, defaults to CAPTURE_SOCKET or data/capture.sock
+        :param authkey: Shared secret, defaults to CAPTURE_AUTHKEY
+        """
+        self.address = address or default_address()
+        self.authkey = authkey or default_authkey()
+        self._connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        # One request at a time per connection, Streamlit sessions share the client
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, address=None, authkey=None, autostart=True, timeout=30.0):
+        """
+        Connect to the running service, start it in the background if there is none.
+        :param timeout: Seconds to wait for a started service to listen
+        """
+        address = address or default_address()
+        try:
+            return cls(address, authkey)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not autostart:
+                raise
+        # Own session, the service outlives the process that started it
+        src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.Popen(
+            [sys.executable, "-m", "service", "serve", "--socket", address],
+            cwd=src_dir, start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return cls(address, authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Capture service did not start within {timeout}s")
+                time.sleep(0.1)
+
+    def call(self, command, **kwargs):
+        """
+        Send a command and wait for its result.
+        Raises:
+            ServiceError: The command failed in the service
+        """
+        with self._lock:
+            self._connection.send({'cmd': command, **kwargs})
+            response = self._connection.recv()
+        if not response['ok']:
+            raise ServiceError(response['error'], response.get('type'), response.get('message'))
+        return response['result']
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # -----------------------------------------------------------
+    # Commands
+    def ping(self):
+        return self.call('ping')
+
+    def status(self):
+        return self.call('status')
+
+    def options(self):
+        return self.call('options')
+
+    def preview(self, max_age=0.0):
+        """
+        Returns:
+            tuple: (left, right) arrays, shared with other clients asking within max_age seconds
+        """
+        result = self.call('preview', max_age=max_age)
+        return result['left'], result['right']
+
+    def preview_stream(self, fps=5.0, max_frames=None):
+        """
+        Yields (frame_id, left, right) on a dedicated connection until closed.
+        """
+        connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        try:
+            connection.send({'cmd': 'preview_stream', 'fps': fps, 'max_frames': max_frames})
+            while True:
+                try:
+                    response = connection.recv()
+                except EOFError:
+                    return
+                if not response['ok']:
+                    raise ServiceError(response['error'], response.get('type'), response.get('message'))
+                frame = response['result']
+                yield frame['frame_id'], frame['left'], frame['right']
+        finally:
+            connection.close()
+
+    def capture(
+        self, label, numberplate, count=1, bracket=False, images=True, at_ns=None, check_quality=True,
+        measure_width=None,
+    ):
+        """
+        Capture a pair or burst, queued behind captures of other clients.
+        :param at_ns: Click time (time.monotonic_ns()), picks the zero shutter lag pair
+        :param check_quality: Reject pairs failing the quality gate, a ServiceError names the reasons
+        :param measure_width: Width of the grayscale pair returned for the tread measurement
+        Returns:
+            dict: 'captures' (id, paths, metadata per pair), 'full', 'rejected', 'duplicates' (group ids of
+                  similar earlier captures), with images the display sized middle 'left' / 'right' and
+                  with measure_width also 'measure_left' / 'measure_right'
+        """
+        return self.call(
+            'capture', label=label, numberplate=numberplate, count=count, bracket=bracket, images=images, at_ns=at_ns,
+            check_quality=check_quality, measure_width=measure_width,
+        )
+
+    def delete_last(self):
+        return self.call('delete_last')
+
+    def numberplate(self, numberplate):
+        return self.call('numberplate', numberplate=numberplate)
+
+    def zsl(self, enabled=None, select=None, window=None, memory_mb=None):
+        return self.call('zsl', enabled=enabled, select=select, window=window, memory_mb=memory_mb)
+
+    def adjust_config(self, controls):
+        return self.call('adjust_config', controls=controls)
+
+    def save_config(self, name):
+        return self.call('save_config', name=name)
+
+    def configs(self):
+        return self.call('configs')
+
+    def load_config(self, name):
+        return self.call('load_config', name=name)
+
+    def light(self, brightness=None, on=None, strobe=None):
+        return self.call('light', brightness=brightness, on=on, strobe=strobe)
+
+    def metrics(self, enable=None):
+        return self.call('metrics', enable=enable)
+
+    def shutdown(self):
+        return self.call('shutdown')
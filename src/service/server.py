@@ -0,0 +1,463 @@
+"""
+Headless capture service.
+
+One long-running process owns StereoCamera, LightController and Numberplate
+and serves them over a local Unix socket (multiprocessing.connection with an
+authkey), so browser tabs, reruns and scripts never open the cameras
+themselves. Requests are dicts {'cmd': name, **kwargs}, responses
+{'ok': True, 'result': ...} or {'ok': False, 'error': "Name: message", 'type': name, 'message': message}.
+
+Everything touching the cameras or the numberplate runs on a single worker
+thread, concurrent captures are queued in arrival order. Preview requests are
+coalesced: callers arriving while a preview is grabbed, or within max_age of
+the last one, share that frame, so any number of clients can stream previews.
+"""
+
+import os
+import sys
+import time
+import socket
+import threading
+import contextlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Listener
+
+import numpy as np
+
+from utils import Resources
+
+ROOT_DIR = Path(sys.prefix).parent
+SOCKET_PATH = "./data/capture.sock"
+AUTHKEY = b"stereo-capture"
+DISPLAY_WIDTH = 820  # width of the display copies sent to clients, see utils.display.DisplayImages
+
+
+def create_cam():
+    from cam import StereoCamera
+    return StereoCamera()
+
+
+def create_light():
+    from light import LightController
+    return LightController()
+
+
+def create_numberplate():
+    from numberplate import Numberplate
+    return Numberplate()
+
+
+def downscale(array, width):
+    """
+    Every n-th pixel so the array is at most width wide, like the preview stream scaler.
+    """
+    step = max(1, -(-array.shape[1] // width))
+    return np.ascontiguousarray(array[::step, ::step])
+
+
+def downscale_gray(array, width):
+    """
+    Grayscale (uint8) of every n-th pixel so the array is at most width wide.
+    """
+    from cam.quality import luma
+    step = max(1, -(-array.shape[1] // width))
+    return luma(array, step).astype(np.uint8)
+
+
+def default_address():
+    return os.environ.get("CAPTURE_SOCKET", os.path.join(ROOT_DIR, SOCKET_PATH))
+
+
+def default_authkey():
+    return os.environ.get("CAPTURE_AUTHKEY", AUTHKEY.decode()).encode()
+
+
+class PreviewHub:
+    """
+    Coalesces preview grabs of all clients.
+    """
+
+    def __init__(self, worker, grab):
+        """
+        :param worker: Executor the grab runs on
+        :param grab: Callable returning (left, right) arrays
+        """
+        self.worker = worker
+        self.grab = grab
+        self.frame = None  # (frame_id, timestamp, left, right)
+        self._inflight = None
+        self._lock = threading.Lock()
+
+    def get(self, max_age=0.0):
+        """
+        Returns:
+            tuple: (frame_id, timestamp, left, right) not older than max_age seconds
+        """
+        with self._lock:
+            frame = self.frame
+            if frame is not None and time.monotonic() - frame[1] <= max_age:
+                return frame
+            if self._inflight is None:
+                self._inflight = self.worker.submit(self._grab)
+            future = self._inflight
+        return future.result()
+
+    def _grab(self):
+        try:
+            left, right = self.grab()
+            frame_id = self.frame[0] + 1 if self.frame is not None else 0
+            self.frame = (frame_id, time.monotonic(), left, right)
+            return self.frame
+        finally:
+            with self._lock:
+                self._inflight = None
+
+
+class CaptureService:
+    MAX_PREVIEW_FPS = 15.0
+
+    def __init__(self, cam=None, light=None, numberplate=None, address=None, authkey=None):
+        """
+        Controllers default to the singletons, created on start().
+        :param address: Unix socket path, defaults to CAPTURE_SOCKET or data/capture.sock
+        :param authkey: Shared secret, defaults to CAPTURE_AUTHKEY
+        """
+        self.cam = cam
+        self.light = light
+        self.numberplate = numberplate
+        self.address = address or default_address()
+        self.authkey = authkey or default_authkey()
+
+        # Single camera thread, jobs run in submission order
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture-worker")
+        self.previews = PreviewHub(self.worker, self._grab_preview)
+        self.clients = 0
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stopping = threading.Event()  # serve_forever() returns
+        self._stopped = threading.Event()  # controllers released
+
+    # -----------------------------------------------------------
+    # Lifecycle
+    def start(self):
+        # Missing controllers are created in parallel
+        resources = Resources({
+            name: factory for name, factory in (
+                ('cam', create_cam), ('light', create_light), ('numberplate', create_numberplate),
+            ) if getattr(self, name) is None
+        }).start()
+        for name in resources.factories:
+            setattr(self, name, resources.get(name))
+        resources.shutdown()
+        self.cam.set_strobe(self.light)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.address)), exist_ok=True)
+        if os.path.exists(self.address):
+            os.remove(self.address)  # stale socket of a crashed service
+        # Only the owner may connect
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        return self
+
+    def serve_forever(self):
+        """
+        Accept clients until request_stop() or stop(), one thread per connection.
+        The caller releases the controllers with stop() afterwards.
+        """
+        while not self._stopping.is_set():
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                break  # listener closed by stop()
+            except Exception as e:
+                if not self._stopping.is_set():
+                    print(f"Rejected client: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(connection,), name="capture-client", daemon=True).start()
+
+    def _wake(self):
+        # Closing the socket does not interrupt a blocked accept(), a connection does
+        with contextlib.suppress(OSError), socket.socket(socket.AF_UNIX) as wake:
+            wake.connect(self.address)
+
+    def request_stop(self):
+        """
+        Let serve_forever() return, safe to call from client threads and signal handlers.
+        """
+        if not self._stopping.is_set():
+            self._stopping.set()
+            self._wake()
+
+    def stop(self):
+        """
+        Stop serving and release the cameras and the light. Call it from the main
+        thread, daemon threads are killed at interpreter exit before they finish.
+        """
+        if self._stopped.is_set():
+            return
+        self._stopping.set()
+        self._stopped.set()
+        if self._listener is not None:
+            self._wake()
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        self.worker.shutdown(wait=True)
+        self.cam.close()
+        self.light.close()
+
+    # -----------------------------------------------------------
+    # Connections
+    def _handle(self, connection):
+        with self._lock:
+            self.clients += 1
+        try:
+            while not self._stopped.is_set():
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    break
+                command = request.pop('cmd', None)
+                if command == 'preview_stream':
+                    self._stream_previews(connection, **request)
+                    break
+                try:
+                    result = self.dispatch(command, **request)
+                    response = {'ok': True, 'result': result}
+                except Exception as e:
+                    name = type(e).__name__
+                    response = {'ok': False, 'error': f"{name}: {e}", 'type': name, 'message': str(e)}
+                try:
+                    connection.send(response)
+                except (OSError, ValueError):
+                    break
+                if command == 'shutdown':
+                    # The process owning serve_forever() releases the controllers
+                    self.request_stop()
+        finally:
+            connection.close()
+            with self._lock:
+                self.clients -= 1
+
+    def _stream_previews(self, connection, fps=5.0, max_frames=None):
+        """
+        Send preview frames until the client disconnects.
+        """
+        interval = 1.0 / min(fps, self.MAX_PREVIEW_FPS)
+        last_id = None
+        sent = 0
+        while not self._stopped.is_set() and (max_frames is None or sent < max_frames):
+            start = time.monotonic()
+            frame_id, timestamp, left, right = self.previews.get(max_age=interval)
+            if frame_id != last_id:
+                try:
+                    connection.send({'ok': True, 'result': {'frame_id': frame_id, 'left': left, 'right': right}})
+                except (OSError, ValueError):
+                    return
+                last_id = frame_id
+                sent += 1
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+    def _on_worker(self, fn, *args, **kwargs):
+        # Run on the camera thread, wait for the result
+        with self._lock:
+            self._queued += 1
+        try:
+            return self.worker.submit(fn, *args, **kwargs).result()
+        finally:
+            with self._lock:
+                self._queued -= 1
+
+    # -----------------------------------------------------------
+    # Commands
+    def dispatch(self, command, **kwargs):
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            raise ValueError(f"Unknown command: {command}")
+        return handler(**kwargs)
+
+    def cmd_ping(self):
+        return "pong"
+
+    def cmd_status(self):
+        cam = self.cam
+        return {
+            'pid': os.getpid(),
+            'clients': self.clients,
+            'queued': self._queued,
+            'streaming': cam.streaming,
+            'mode': cam.mode,
+            'can_delete': cam.can_delete_last_images(),
+            'pending_writes': cam.writer.pending,
+            'current_config': cam.current_config,
+            'current_controls': dict(cam.current_controls),
+            'hardware_writes': {'camera': cam.hardware_writes, 'light': self.light.hardware_writes},
+            'zsl': self._zsl_status(),
+            'light': {
+                'on': self.light.on, 'brightness': self.light.brightness, 'strobe': cam.light is not None,
+            },
+        }
+
+    def cmd_options(self):
+        cam = self.cam
+        return {
+            'controls': cam.get_camera_options(),
+            'control_types': {control: cast.__name__ for control, cast in cam.CONTROLS.items()},
+            'max_burst': cam.MAX_BURST,
+            'cam_dims': cam.get_cam_dims(),
+            'preview_dims': cam.get_preview_dims(),
+        }
+
+    def _grab_preview(self):
+        left, right = self.cam.get_preview()
+        return np.asarray(left), np.asarray(right)
+
+    def cmd_preview(self, max_age=0.0):
+        _, _, left, right = self.previews.get(max_age)
+        return {'left': left, 'right': right}
+
+    def cmd_capture(
+        self, label, numberplate, count=1, bracket=False, images=True, at_ns=None, check_quality=True,
+        measure_width=None,
+    ):
+        """
+        Capture a pair or burst. Queued behind running captures.
+        :param images: Return display copies (DISPLAY_WIDTH) of the middle pair, not the full resolution arrays
+        :param at_ns: Click time, picks the zero shutter lag pair
+        :param check_quality: Reject pairs failing the quality gate (CaptureRejected)
+        :param measure_width: With images, also return the middle pair in grayscale at this width
+                              for the tread measurement (tread_measure_width)
+        """
+        return self._on_worker(
+            self._capture, label, numberplate, count, bracket, images, at_ns, check_quality, measure_width,
+        )
+
+    def _capture(self, label, numberplate, count, bracket, images, at_ns, check_quality, measure_width=None):
+        if not str(label).strip():
+            raise ValueError("A label is required")
+        self.numberplate.numberplate = numberplate
+        if not self.numberplate.validate():
+            raise ValueError(f"Invalid numberplate: {numberplate}")
+        if self.numberplate.full:
+            raise ValueError(f"Numberplate {self.numberplate.numberplate} is full")
+
+        overrides = self.cam.exposure_bracket(count) if bracket and count > 1 else None
+        handles = self.cam.capture_burst(
+            label=label, numberplate=self.numberplate, count=count, bracket=overrides, at_ns=at_ns,
+            check_quality=check_quality,
+        )
+        if handles is None:
+            # Filled by another process while capturing, nothing was written
+            raise ValueError(f"Numberplate {self.numberplate.numberplate} is full")
+        result = {
+            'captures': [
+                {'id': handle.metadata['id'], 'paths': handle.paths, 'metadata': handle.metadata}
+                for handle in handles
+            ],
+            'full': self.numberplate.full,
+            'rejected': count - len(handles),  # pairs of the burst that failed the quality gate
+            # Earlier captures of the numberplate that look the same
+            'duplicates': sorted({match['group_id'] for handle in handles for match in handle.metadata['duplicates']}),
+        }
+        if images:
+            # A full resolution pair is 48 MB, clients only get what they show and measure
+            middle = handles[len(handles) // 2]
+            result.update(
+                left=downscale(middle.left_image, DISPLAY_WIDTH), right=downscale(middle.right_image, DISPLAY_WIDTH),
+            )
+            if measure_width:
+                result.update(
+                    measure_left=downscale_gray(middle.left_image, measure_width),
+                    measure_right=downscale_gray(middle.right_image, measure_width),
+                )
+        return result
+
+    def cmd_delete_last(self):
+        return self._on_worker(self._delete_last)
+
+    def _delete_last(self):
+        if not self.cam.can_delete_last_images():
+            return False
+        # The count belongs to the numberplate of the deleted capture
+        self.numberplate.numberplate = self.cam.last_captured[0].metadata['numberplate']
+        return self.cam.delete_last_images(self.numberplate)
+
+    def cmd_numberplate(self, numberplate):
+        """
+        Returns:
+            dict: numberplate, valid, full, count and quota for the given plate
+        """
+        return self._on_worker(self._numberplate_status, numberplate)
+
+    def _numberplate_status(self, numberplate):
+        self.numberplate.numberplate = numberplate
+        return {
+            'numberplate': self.numberplate.numberplate,
+            'valid': self.numberplate.validate(),
+            'full': self.numberplate.full,
+            'count': self.numberplate.store.get(self.numberplate.numberplate),
+            'quota': self.numberplate.quota,
+        }
+
+    def cmd_zsl(self, enabled=None, select=None, window=None, memory_mb=None):
+        """
+        Switch zero shutter lag recording on or off.
+        Returns:
+            dict: Recording state, see _zsl_status()
+        """
+        if enabled:
+            self._on_worker(self.cam.enable_zsl, memory_mb, select, window)
+        elif enabled is not None:
+            self._on_worker(self.cam.disable_zsl)
+        return self._zsl_status()
+
+    def _zsl_status(self):
+        recorder = self.cam.zsl
+        if recorder is None:
+            return {'enabled': False}
+        return {
+            'enabled': True,
+            'select': self.cam.zsl_select,
+            'window': self.cam.zsl_window,
+            'capacity': recorder.ring.capacity,
+            'memory_mb': recorder.ring.nbytes / 2**20,
+            'recorded': recorder.ring.written,
+            'dropped': recorder.dropped,
+            'running': recorder.running,
+        }
+
+    def cmd_adjust_config(self, controls):
+        return self._on_worker(self.cam.adjust_config, controls)
+
+    def cmd_save_config(self, name):
+        return self._on_worker(self.cam.save_cam_config, name)
+
+    def cmd_configs(self):
+        return self.cam.get_saved_configs()
+
+    def cmd_load_config(self, name):
+        return self._on_worker(self.cam.load_config, name)
+
+    def cmd_light(self, brightness=None, on=None, strobe=None):
+        if brightness is not None:
+            self.light.set_brightness(brightness)
+        if on is not None:
+            self.light.turn(on)
+        if strobe is not None:
+            self.cam.set_strobe(self.light if strobe else None)
+        return {'on': self.light.on, 'brightness': self.light.brightness, 'strobe': self.cam.light is not None}
+
+    def cmd_metrics(self, enable=None):
+        import metrics
+        if enable is not None:
+            metrics.enable(enable)
+        return {'enabled': metrics.REGISTRY.enabled, 'stages': metrics.REGISTRY.snapshot()}
+
+    def cmd_shutdown(self):
+        return True
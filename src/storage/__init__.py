@@ -0,0 +1,9 @@
+from .container import StereoPairFile, write_pair, read_pair, pair_from_bytes
+from .catalog import CaptureCatalog
+from .shards import export_shards, iter_samples, decode_sample
+from .duplicates import DuplicateIndex, fingerprint, find_duplicates
+
+__all__ = [
+    "StereoPairFile", "write_pair", "read_pair", "pair_from_bytes", "CaptureCatalog",
+    "export_shards", "iter_samples", "decode_sample", "DuplicateIndex", "fingerprint", "find_duplicates",
+]
\ No newline at end of file
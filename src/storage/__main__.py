@@ -0,0 +1,256 @@
+"""
+Command line tools for the capture storage.
+
+    cd src && python -m storage pack ../data/images ../data/pairs
+    cd src && python -m storage index ../data/images
+    cd src && python -m storage query --numberplate S-AB-1234 --max-depth 3 --config camera_settings_day.json
+    cd src && python -m storage export ../data/shards --shard-size-mb 256 --workers 4
+    cd src && python -m storage dedupe --numberplate S-AB-1234 --max-distance 12
+"""
+
+import os
+import json
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .container import EXTENSION, write_pair, read_header
+from .catalog import CaptureCatalog
+from .shards import export_shards
+from .duplicates import MAX_DISTANCE, fingerprint_files, find_duplicates
+
+
+def find_png_pairs(images_dir):
+    """
+    Find {id}_{label}_L.png / _R.png pairs in a directory.
+    Returns:
+        list: (pair_name, left_path, right_path, sidecar_path or None)
+    """
+    pairs = []
+    for filename in sorted(os.listdir(images_dir)):
+        if not filename.endswith("_L.png"):
+            continue
+        name = filename[:-len("_L.png")]
+        right_path = os.path.join(images_dir, f"{name}_R.png")
+        if not os.path.exists(right_path):
+            continue
+        sidecar = os.path.join(images_dir, f"{name}.json")
+        pairs.append((name, os.path.join(images_dir, filename), right_path, sidecar if os.path.exists(sidecar) else None))
+    return pairs
+
+
+def pack(args):
+    from PIL import Image
+    import numpy as np
+
+    os.makedirs(args.output, exist_ok=True)
+    packed = 0
+    for name, left_path, right_path, sidecar in find_png_pairs(args.images):
+        target = os.path.join(args.output, f"{name}{EXTENSION}")
+        if os.path.exists(target):
+            continue
+        metadata = {}
+        if sidecar is not None:
+            with open(sidecar) as f:
+                metadata = json.load(f)
+        unique_id, _, label = name.partition("_")
+        metadata.setdefault('label', label)
+        metadata.setdefault('id', unique_id)
+        with Image.open(left_path) as left, Image.open(right_path) as right:
+            write_pair(target, np.asarray(left), np.asarray(right), metadata, compression=args.compression)
+        packed += 1
+    print(f"Packed {packed} pairs into {args.output}")
+
+
+def index(args):
+    """
+    Backfill the catalog from the files in an image directory.
+    """
+    catalog = CaptureCatalog(args.catalog)
+    # Absolute paths, the catalog is read from other working directories (app, service, src/)
+    images_dir = os.path.abspath(args.images)
+    records = []
+    for name, left_path, right_path, sidecar in find_png_pairs(images_dir):
+        metadata = {}
+        if sidecar is not None:
+            with open(sidecar) as f:
+                metadata = json.load(f)
+        unique_id, _, label = name.partition("_")
+        records.append({
+            'id': metadata.get('id', unique_id),
+            'group_id': metadata.get('group_id', unique_id),
+            'numberplate': metadata.get('numberplate'),
+            'label': metadata.get('label', label),
+            'config_name': metadata.get('config_name'),
+            'created_at': os.path.getmtime(left_path),
+            'storage_format': "png",
+            'paths': [left_path, right_path] + ([sidecar] if sidecar else []),
+            'metadata': metadata,
+        })
+    for filename in sorted(os.listdir(images_dir)):
+        if not filename.endswith(EXTENSION):
+            continue
+        path = os.path.join(images_dir, filename)
+        metadata = read_header(path)['metadata']
+        unique_id, _, label = filename[:-len(EXTENSION)].partition("_")
+        records.append({
+            'id': metadata.get('id', unique_id),
+            'group_id': metadata.get('group_id', unique_id),
+            'numberplate': metadata.get('numberplate'),
+            'label': metadata.get('label', label),
+            'config_name': metadata.get('config_name'),
+            'created_at': os.path.getmtime(path),
+            'storage_format': "stpair",
+            'paths': [path],
+            'metadata': metadata,
+        })
+    catalog.add(records)
+    print(f"Indexed {len(records)} captures into {catalog.path}")
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+def query(args):
+    catalog = CaptureCatalog(args.catalog)
+    captures = catalog.query(
+        numberplate=args.numberplate, label=args.label,
+        min_depth=args.min_depth, max_depth=args.max_depth,
+        config_name=args.config, since=args.since, until=args.until, limit=args.limit,
+    )
+    if args.json:
+        print(json.dumps(captures, indent=2, default=str))
+        return
+    for capture in captures:
+        created = datetime.fromtimestamp(capture['created_at']).isoformat(timespec="seconds")
+        print(f"{created}  {capture['numberplate'] or '-':<12} {capture['label'] or '-':<6} {' '.join(capture['paths'])}")
+
+
+def export(args):
+    catalog = CaptureCatalog(args.catalog)
+    entries = export_shards(
+        args.output, catalog, max_bytes=int(args.shard_size_mb * 2**20), workers=args.workers,
+        numberplate=args.numberplate, since=args.since,
+    )
+    pairs = sum(len(entry['ids']) for entry in entries)
+    size_mb = sum(entry['bytes'] for entry in entries) / 2**20
+    print(f"Exported {pairs} captures into {len(entries)} new shards ({size_mb:.1f} MB) in {args.output}")
+
+
+def _fingerprint(capture):
+    try:
+        return capture['id'], fingerprint_files(capture['paths'])
+    except Exception as e:
+        print(f"Skipping {capture['id']}: {e}")
+        return capture['id'], None
+
+
+def _remove_groups(catalog, clusters):
+    """
+    Delete the duplicate groups (catalog rows and files), each one gives its numberplate count back.
+    """
+    from numberplate import Numberplate
+
+    store = Numberplate().store
+    removed = 0
+    for cluster in clusters:
+        for duplicate in cluster['duplicates']:
+            captures = catalog.query(group_id=duplicate['group_id'])
+            with catalog.transaction() as db:
+                catalog.remove([capture['id'] for capture in captures], db=db)
+                for capture in captures:
+                    for path in capture['paths']:
+                        if os.path.exists(path):
+                            os.remove(path)
+            # With --across-plates the duplicate may belong to another plate than the kept capture
+            numberplate = captures[0]['numberplate'] if captures else None
+            if numberplate:
+                store.decrement(numberplate)
+            removed += 1
+    print(f"Removed {removed} duplicate captures")
+
+
+def dedupe(args):
+    """
+    Fingerprint the captures stored without one, then report later shots of
+    the same tyre position, the earliest capture is kept.
+    """
+    catalog = CaptureCatalog(args.catalog)
+    missing = catalog.fingerprints(args.numberplate, missing=True)
+    if missing:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            fingerprints = {capture_id: value for capture_id, value in executor.map(_fingerprint, missing) if value}
+        catalog.set_fingerprints(fingerprints)
+        print(f"Fingerprinted {len(fingerprints)} of {len(missing)} captures")
+
+    clusters = find_duplicates(catalog.fingerprints(args.numberplate), args.max_distance, args.across_plates)
+    if args.json:
+        print(json.dumps(clusters, indent=2))
+    else:
+        for cluster in clusters:
+            duplicates = ", ".join(f"{entry['group_id']} ({entry['distance']} bits)" for entry in cluster['duplicates'])
+            print(f"{cluster['numberplate'] or '-':<12} {cluster['keep']}  duplicates: {duplicates}")
+        count = sum(len(cluster['duplicates']) for cluster in clusters)
+        print(f"{count} duplicate captures of {len(clusters)} tyre positions")
+    if args.remove:
+        _remove_groups(catalog, clusters)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m storage", description="Capture storage tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pack_parser = commands.add_parser("pack", help="Convert PNG pairs into .stpair containers")
+    pack_parser.add_argument("images", help="Directory with {id}_{label}_L/R.png files")
+    pack_parser.add_argument("output", help="Directory for the containers")
+    pack_parser.add_argument("--compression", default="none", choices=["none", "zlib"])
+    pack_parser.set_defaults(func=pack)
+
+    index_parser = commands.add_parser("index", help="Add the captures in a directory to the catalog")
+    index_parser.add_argument("images", help="Directory with PNG pairs or .stpair containers")
+    index_parser.add_argument("--catalog", help="Catalog file, defaults to data/catalog.sqlite")
+    index_parser.set_defaults(func=index)
+
+    query_parser = commands.add_parser("query", help="Search the capture catalog")
+    query_parser.add_argument("--catalog", help="Catalog file, defaults to data/catalog.sqlite")
+    query_parser.add_argument("--numberplate")
+    query_parser.add_argument("--label")
+    query_parser.add_argument("--min-depth", type=float, help="Minimum profile depth in mm")
+    query_parser.add_argument("--max-depth", type=float, help="Profile depth below this value in mm")
+    query_parser.add_argument("--config", help="Camera config name")
+    query_parser.add_argument("--since", type=_timestamp, help="ISO date, e.g. 2025-06-01")
+    query_parser.add_argument("--until", type=_timestamp, help="ISO date, e.g. 2025-07-01")
+    query_parser.add_argument("--limit", type=int)
+    query_parser.add_argument("--json", action="store_true", help="Print full records as JSON")
+    query_parser.set_defaults(func=query)
+
+    export_parser = commands.add_parser("export", help="Append new captures to tar shards for training")
+    export_parser.add_argument("output", help="Shard directory, manifest.json tracks what is exported")
+    export_parser.add_argument("--catalog", help="Catalog file, defaults to data/catalog.sqlite")
+    export_parser.add_argument("--shard-size-mb", type=float, default=256, help="Upper bound of a shard")
+    export_parser.add_argument("--workers", type=int, default=4, help="Shards written in parallel")
+    export_parser.add_argument("--numberplate")
+    export_parser.add_argument("--since", type=_timestamp, help="ISO date, e.g. 2025-06-01")
+    export_parser.set_defaults(func=export)
+
+    dedupe_parser = commands.add_parser("dedupe", help="Find captures of the same tyre position in the archive")
+    dedupe_parser.add_argument("--catalog", help="Catalog file, defaults to data/catalog.sqlite")
+    dedupe_parser.add_argument("--numberplate")
+    dedupe_parser.add_argument(
+        "--max-distance", type=int, default=MAX_DISTANCE, help="Differing fingerprint bits (of 128) of a duplicate",
+    )
+    dedupe_parser.add_argument("--across-plates", action="store_true", help="Also compare different numberplates")
+    dedupe_parser.add_argument("--workers", type=int, default=4, help="Captures fingerprinted in parallel")
+    dedupe_parser.add_argument("--json", action="store_true", help="Print the duplicate groups as JSON")
+    dedupe_parser.add_argument(
+        "--remove", action="store_true", help="Delete the later duplicates and decrement their numberplate counts",
+    )
+    dedupe_parser.set_defaults(func=dedupe)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+SQLite catalog of all captures.
+
+Every stored pair is one row with the numberplate, label, camera config name,
+capture time, the file paths, the full capture metadata and the perceptual
+fingerprint of the pair, so queries such as "all captures of plate X with less
+than 3 mm profile depth under config Y" hit an index instead of listing and
+parsing data/images.
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+from pathlib import Path
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id TEXT PRIMARY KEY,
+    group_id TEXT NOT NULL,
+    numberplate TEXT,
+    label TEXT,
+    depth_mm REAL,
+    config_name TEXT,
+    created_at REAL NOT NULL,
+    storage_format TEXT,
+    paths TEXT NOT NULL,
+    metadata TEXT,
+    fingerprint TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_captures_numberplate ON captures (numberplate);
+CREATE INDEX IF NOT EXISTS idx_captures_label ON captures (label);
+CREATE INDEX IF NOT EXISTS idx_captures_depth_mm ON captures (depth_mm);
+CREATE INDEX IF NOT EXISTS idx_captures_config_name ON captures (config_name);
+CREATE INDEX IF NOT EXISTS idx_captures_created_at ON captures (created_at);
+CREATE INDEX IF NOT EXISTS idx_captures_group_id ON captures (group_id);
+"""
+
+
+def _parse_depth(label):
+    # Labels are the profile depth in mm, e.g. "3" or "2,5"
+    try:
+        return float(str(label).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+class CaptureCatalog:
+    ROOT_DIR = Path(sys.prefix).parent
+    CATALOG_PATH = "./data/catalog.sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(self.ROOT_DIR, self.CATALOG_PATH)
+        with self.transaction() as db:
+            db.executescript(SCHEMA)
+            # Catalogs created before fingerprints were recorded
+            columns = {row['name'] for row in db.execute("PRAGMA table_info(captures)")}
+            if 'fingerprint' not in columns:
+                db.execute("ALTER TABLE captures ADD COLUMN fingerprint TEXT")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        # WAL lets readers (UI, CLI, depth jobs) run while the app writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    @contextmanager
+    def transaction(self):
+        """
+        Connection whose changes are committed on success and rolled back on error.
+        """
+        db = self._connect()
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, records, db=None):
+        """
+        Insert capture records in one transaction.
+        :param records: dicts with id, group_id, paths and optionally numberplate,
+                        label, config_name, created_at, storage_format, metadata, fingerprint
+        """
+        rows = [(
+            record['id'],
+            record.get('group_id', record['id']),
+            record.get('numberplate'),
+            record.get('label'),
+            _parse_depth(record.get('label')),
+            record.get('config_name'),
+            record.get('created_at', time.time()),
+            record.get('storage_format'),
+            json.dumps(record['paths']),
+            json.dumps(record.get('metadata', {}), default=str),
+            record.get('fingerprint'),
+        ) for record in records]
+
+        sql = "INSERT OR REPLACE INTO captures VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        if db is not None:
+            db.executemany(sql, rows)
+            return
+        with self.transaction() as db:
+            db.executemany(sql, rows)
+
+    def remove(self, ids, db=None):
+        ids = list(ids)
+        sql = f"DELETE FROM captures WHERE id IN ({','.join('?' * len(ids))})"
+        if db is not None:
+            db.execute(sql, ids)
+            return
+        with self.transaction() as db:
+            db.execute(sql, ids)
+
+    def query(self, numberplate=None, label=None, min_depth=None, max_depth=None,
+              config_name=None, since=None, until=None, group_id=None, limit=None):
+        """
+        Find captures, all given filters must match.
+        :param min_depth: Minimum profile depth in mm (inclusive)
+        :param max_depth: Maximum profile depth in mm (exclusive)
+        :param since: Unix timestamp (inclusive)
+        :param until: Unix timestamp (exclusive)
+        Returns:
+            list: dicts with the capture columns, paths and metadata decoded
+        """
+        filters = []
+        params = []
+        for column, operator, value in (
+            ('numberplate', '=', numberplate),
+            ('label', '=', label),
+            ('depth_mm', '>=', min_depth),
+            ('depth_mm', '<', max_depth),
+            ('config_name', '=', config_name),
+            ('created_at', '>=', since),
+            ('created_at', '<', until),
+            ('group_id', '=', group_id),
+        ):
+            if value is not None:
+                filters.append(f"{column} {operator} ?")
+                params.append(value)
+
+        sql = "SELECT * FROM captures"
+        if filters:
+            sql += " WHERE " + " AND ".join(filters)
+        sql += " ORDER BY created_at"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        db = self._connect()
+        try:
+            rows = db.execute(sql, params).fetchall()
+        finally:
+            db.close()
+
+        captures = []
+        for row in rows:
+            capture = dict(row)
+            capture['paths'] = json.loads(capture['paths'])
+            capture['metadata'] = json.loads(capture['metadata'] or "{}")
+            captures.append(capture)
+        return captures
+
+    def fingerprints(self, numberplate=None, missing=False):
+        """
+        Fingerprints of the captures, by capture time.
+        :param numberplate: Only captures of this numberplate
+        :param missing: Return the captures without a fingerprint instead, with their paths
+        Returns:
+            list: dicts with id, group_id, numberplate, created_at and fingerprint (or paths)
+        """
+        columns = "id, group_id, numberplate, created_at, " + ("paths" if missing else "fingerprint")
+        sql = f"SELECT {columns} FROM captures WHERE fingerprint IS {'' if missing else 'NOT '}NULL"
+        params = []
+        if numberplate is not None:
+            sql += " AND numberplate = ?"
+            params.append(numberplate)
+        sql += " ORDER BY created_at"
+
+        db = self._connect()
+        try:
+            rows = [dict(row) for row in db.execute(sql, params).fetchall()]
+        finally:
+            db.close()
+        if missing:
+            for row in rows:
+                row['paths'] = json.loads(row['paths'])
+        return rows
+
+    def set_fingerprints(self, fingerprints):
+        """
+        :param fingerprints: {capture id: fingerprint}
+        """
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE captures SET fingerprint = ? WHERE id = ?",
+                [(value, capture_id) for capture_id, value in fingerprints.items()]
+            )
+
+    def plate_counts(self):
+        """
+        Number of captures per numberplate, a burst counts once.
+        Returns:
+            dict: {numberplate: count}
+        """
+        db = self._connect()
+        try:
+            rows = db.execute(
+                "SELECT numberplate, COUNT(DISTINCT group_id) FROM captures "
+                "WHERE numberplate IS NOT NULL GROUP BY numberplate"
+            ).fetchall()
+        finally:
+            db.close()
+        return {numberplate: count for numberplate, count in rows}
+
+    def __len__(self):
+        db = self._connect()
+        try:
+            return db.execute("SELECT COUNT(*) FROM captures").fetchone()[0]
+        finally:
+            db.close()
@@ -0,0 +1,207 @@
+"""
+Perceptual fingerprints of stereo pairs and a Hamming distance index.
+
+A fingerprint is the 64 bit difference hash (dHash) of the left frame followed
+by the one of the right frame: every frame is reduced to 8x9 grey cells and
+each bit tells whether a cell is brighter than its right neighbour. Shooting
+the same tyre position twice gives fingerprints a few bits apart, another
+position or tyre differs in about half of the 128 bits. The hash only depends
+on relative brightness, so exposure and strobe changes barely move it.
+
+BKTree finds every fingerprint within a distance without comparing against all
+captures, DuplicateIndex keeps one tree per numberplate, loaded from the
+catalog on first use.
+"""
+
+import threading
+
+import numpy as np
+
+from .catalog import CaptureCatalog
+from .container import EXTENSION, read_pair
+
+HASH_SIZE = 8  # 8x8 bits per frame
+STEP = 8  # pixel stride before the reduction, 3280x2464 -> 410x308
+MAX_DISTANCE = 12  # differing bits of a pair (of 128) still counted as a duplicate
+
+
+def dhash(array, step=STEP):
+    """
+    Difference hash of one frame.
+    Returns:
+        int: 64 bit hash
+    """
+    sample = array[::step, ::step].astype(np.float32)
+    # (R + 2G + B), independent of RGB/BGR order
+    gray = sample[..., 0] + 2 * sample[..., 1] + sample[..., 2] if sample.ndim == 3 else sample
+
+    # Mean of HASH_SIZE x (HASH_SIZE + 1) cells
+    height, width = gray.shape
+    rows = np.linspace(0, height, HASH_SIZE + 1).astype(int)
+    cols = np.linspace(0, width, HASH_SIZE + 2).astype(int)
+    cells = np.add.reduceat(np.add.reduceat(gray, rows[:-1], axis=0), cols[:-1], axis=1)
+    cells /= np.outer(np.diff(rows), np.diff(cols))
+
+    bits = cells[:, 1:] > cells[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def fingerprint(left, right, step=STEP):
+    """
+    Returns:
+        str: 128 bit fingerprint of a pair as 32 hex digits, as stored in the catalog
+    """
+    return f"{dhash(left, step):016x}{dhash(right, step):016x}"
+
+
+def fingerprint_files(paths):
+    """
+    Fingerprint of a stored pair, a .stpair container or the left and right PNG.
+    """
+    if paths[0].endswith(EXTENSION):
+        left, right, _ = read_pair(paths[0])
+        return fingerprint(left, right)
+    from PIL import Image
+    with Image.open(paths[0]) as left, Image.open(paths[1]) as right:
+        return fingerprint(np.asarray(left), np.asarray(right))
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with the Hamming distance.
+    Children are keyed by their distance to the parent, the triangle inequality
+    prunes every subtree that cannot be within the searched distance.
+    """
+
+    def __init__(self):
+        self.root = None  # [key, items, {distance: child}]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, key, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    def find(self, key, max_distance):
+        """
+        Returns:
+            list: (distance, item) of every item within max_distance, closest first
+        """
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda entry: entry[0])
+        return found
+
+
+class DuplicateIndex:
+    """
+    Fingerprints of the catalog captures, one BKTree per numberplate.
+    """
+
+    def __init__(self, catalog=None, max_distance=MAX_DISTANCE):
+        """
+        :param catalog: CaptureCatalog, defaults to data/catalog.sqlite
+        :param max_distance: Differing bits still counted as a duplicate
+        """
+        self.catalog = catalog if catalog is not None else CaptureCatalog()
+        self.max_distance = max_distance
+        self._trees = {}
+        self._removed = set()  # BK-trees cannot delete, removed ids are skipped
+        self._lock = threading.Lock()
+
+    def _tree(self, numberplate):
+        tree = self._trees.get(numberplate)
+        if tree is None:
+            tree = BKTree()
+            for capture in self.catalog.fingerprints(numberplate):
+                tree.add(int(capture['fingerprint'], 16), (capture['id'], capture['group_id']))
+            self._trees[numberplate] = tree
+        return tree
+
+    def find(self, numberplate, fingerprint, group_id=None, max_distance=None):
+        """
+        Earlier captures of the numberplate that look like the fingerprint.
+        :param group_id: Skip the pairs of this burst
+        Returns:
+            list: dicts with id, group_id and distance, closest first
+        """
+        max_distance = self.max_distance if max_distance is None else max_distance
+        with self._lock:
+            found = self._tree(numberplate).find(int(fingerprint, 16), max_distance)
+            removed = set(self._removed)
+        return [
+            {'id': capture_id, 'group_id': capture_group, 'distance': distance}
+            for distance, (capture_id, capture_group) in found
+            if capture_id not in removed and (group_id is None or capture_group != group_id)
+        ]
+
+    def add(self, numberplate, capture_id, group_id, fingerprint):
+        with self._lock:
+            self._removed.discard(capture_id)
+            # Plates not loaded yet read the capture from the catalog later
+            tree = self._trees.get(numberplate)
+            if tree is not None:
+                tree.add(int(fingerprint, 16), (capture_id, group_id))
+
+    def remove(self, ids):
+        with self._lock:
+            self._removed.update(ids)
+
+
+def find_duplicates(captures, max_distance=MAX_DISTANCE, across_plates=False):
+    """
+    Group the earlier and later shots of the same tyre position in an archive.
+    Captures are visited by time, a group (burst) is a duplicate if one of its
+    pairs is within max_distance of a pair of an earlier kept group.
+    :param captures: Catalog rows with id, group_id, numberplate, created_at and fingerprint
+    :param across_plates: Also compare captures of different numberplates
+    Returns:
+        list: dicts with numberplate, keep (group id) and duplicates (group_id, distance), one per kept group with duplicates
+    """
+    groups = {}
+    for capture in sorted(captures, key=lambda capture: capture['created_at']):
+        groups.setdefault(capture['group_id'], []).append(capture)
+
+    trees = {}
+    kept = {}
+    for group_id, members in groups.items():
+        tree = trees.setdefault(None if across_plates else members[0]['numberplate'], BKTree())
+        matches = [
+            entry for member in members
+            for entry in tree.find(int(member['fingerprint'], 16), max_distance)
+        ]
+        if matches:
+            distance, keep = min(matches, key=lambda entry: entry[0])
+            kept[keep]['duplicates'].append({'group_id': group_id, 'distance': distance})
+            continue
+        kept[group_id] = {'numberplate': members[0]['numberplate'], 'keep': group_id, 'duplicates': []}
+        for member in members:
+            tree.add(int(member['fingerprint'], 16), group_id)
+    return [entry for entry in kept.values() if entry['duplicates']]
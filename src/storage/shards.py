@@ -0,0 +1,249 @@
+"""
+Size bounded tar shards of the captured pairs for training.
+
+Reading data/images file by file over the network is dominated by per-file
+overhead. export_shards() packs the pairs recorded in the catalog into
+shard-000000.tar, shard-000001.tar, ... of at most max_bytes each, one sample
+per capture:
+
+    {id}.left.png, {id}.right.png  encoded files as captured (PNG storage)
+    {id}.stpair                    container as captured (stpair storage)
+    {id}.json                      label, depth_mm, numberplate, config_name, controls, fingerprint, ...
+
+Members of a sample are consecutive, so the shards stream sequentially
+(WebDataset layout). Shards are written in parallel. manifest.json lists the
+shards and the exported capture ids, another export only appends shards with
+the captures added since.
+"""
+
+import io
+import os
+import json
+import random
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .catalog import CaptureCatalog
+from .container import EXTENSION, pair_from_bytes
+
+MANIFEST = "manifest.json"
+SHARD_SIZE = 256 * 2**20
+SHARD_PATTERN = "shard-{:06d}.tar"
+BLOCK = 512  # tar header and padding unit
+
+
+def _member_size(nbytes):
+    return BLOCK + (nbytes + BLOCK - 1) // BLOCK * BLOCK
+
+
+def _archive_size(members_bytes):
+    # Two zero end-of-archive blocks, then padded to a multiple of the record size
+    return (members_bytes + 2 * BLOCK + tarfile.RECORDSIZE - 1) // tarfile.RECORDSIZE * tarfile.RECORDSIZE
+
+
+def _sample_files(capture):
+    """
+    Returns:
+        list: (member suffix, path) of the pixel data of a capture
+    """
+    paths = capture['paths']
+    if capture.get('storage_format') == "stpair" or paths[0].endswith(EXTENSION):
+        return [("stpair", paths[0])]
+    return [("left.png", paths[0]), ("right.png", paths[1])]
+
+
+def _sample_metadata(capture):
+    metadata = capture['metadata'] or {}
+    return {
+        'id': capture['id'],
+        'group_id': capture['group_id'],
+        'numberplate': capture['numberplate'],
+        'label': capture['label'],
+        'depth_mm': capture['depth_mm'],
+        'config_name': capture['config_name'],
+        'created_at': capture['created_at'],
+        'fingerprint': capture.get('fingerprint'),
+        'controls': metadata.get('controls', {}),
+        'metadata': metadata,
+    }
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'version': 1, 'shards': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST)
+    with open(f"{path}.part", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.part", path)
+
+
+def plan_shards(captures, max_bytes=SHARD_SIZE):
+    """
+    Split captures (in order) into shards of at most max_bytes, a capture larger
+    than that gets a shard of its own. Captures with missing files are skipped.
+    Returns:
+        list: Lists of (capture, files, metadata_json)
+    """
+    shards = []
+    current, current_bytes = [], 0
+    for capture in captures:
+        files = _sample_files(capture)
+        try:
+            nbytes = sum(_member_size(os.path.getsize(path)) for _, path in files)
+        except OSError as e:
+            print(f"Skipping {capture['id']}: {e}")
+            continue
+        metadata_json = json.dumps(_sample_metadata(capture), default=str).encode("utf-8")
+        nbytes += _member_size(len(metadata_json))
+        if current and _archive_size(current_bytes + nbytes) > max_bytes:
+            shards.append(current)
+            current, current_bytes = [], 0
+        current.append((capture, files, metadata_json))
+        current_bytes += nbytes
+    if current:
+        shards.append(current)
+    return shards
+
+
+def write_shard(path, samples):
+    """
+    Write the samples of one shard, atomically.
+    Returns:
+        dict: Manifest entry of the shard
+    """
+    tmp_path = f"{path}.part"
+    with tarfile.open(tmp_path, "w", format=tarfile.USTAR_FORMAT) as tar:
+        for capture, files, metadata_json in samples:
+            key = capture['id']
+            for suffix, file_path in files:
+                info = tar.gettarinfo(file_path, arcname=f"{key}.{suffix}")
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                with open(file_path, "rb") as f:
+                    tar.addfile(info, f)
+            info = tarfile.TarInfo(f"{key}.json")
+            info.size = len(metadata_json)
+            info.mtime = int(capture['created_at'])
+            tar.addfile(info, io.BytesIO(metadata_json))
+    os.replace(tmp_path, path)
+    return {
+        'name': os.path.basename(path),
+        'bytes': os.path.getsize(path),
+        'ids': [capture['id'] for capture, _, _ in samples],
+    }
+
+
+def export_shards(output_dir, catalog=None, max_bytes=SHARD_SIZE, workers=4, **filters):
+    """
+    Append the catalog captures that are not exported yet as new shards.
+    :param catalog: CaptureCatalog, defaults to data/catalog.sqlite
+    :param max_bytes: Upper bound of a shard
+    :param workers: Shards written in parallel
+    :param filters: CaptureCatalog.query() filters
+    Returns:
+        list: Manifest entries of the new shards
+    """
+    catalog = catalog or CaptureCatalog()
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    exported = {capture_id for shard in manifest['shards'] for capture_id in shard['ids']}
+
+    captures = [capture for capture in catalog.query(**filters) if capture['id'] not in exported]
+    shards = plan_shards(captures, max_bytes)
+
+    first = len(manifest['shards'])
+    paths = [os.path.join(output_dir, SHARD_PATTERN.format(first + index)) for index in range(len(shards))]
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="shard-writer") as executor:
+        entries = list(executor.map(write_shard, paths, shards))
+
+    manifest['shards'].extend(entries)
+    _write_manifest(output_dir, manifest)
+    return entries
+
+
+def shard_paths(source):
+    """
+    Shard files of an export directory in manifest order, or the given list.
+    """
+    if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+        return [os.path.join(source, shard['name']) for shard in load_manifest(source)['shards']]
+    if isinstance(source, (str, os.PathLike)):
+        return [source]
+    return list(source)
+
+
+def _read_samples(shard):
+    """
+    Yield the samples of one shard (path or binary file object) in a single sequential pass.
+    """
+    if hasattr(shard, "read"):
+        tar = tarfile.open(fileobj=shard, mode="r|")
+    else:
+        tar = tarfile.open(shard, mode="r|")
+    with tar:
+        sample = None
+        for member in tar:
+            if not member.isfile():
+                continue
+            key, _, suffix = member.name.partition(".")
+            if sample is None or sample['__key__'] != key:
+                if sample is not None:
+                    yield sample
+                sample = {'__key__': key}
+            sample[suffix] = tar.extractfile(member).read()
+        if sample is not None:
+            yield sample
+
+
+def decode_sample(sample):
+    """
+    Returns:
+        dict: __key__, metadata and the left and right arrays of a raw sample
+    """
+    if 'stpair' in sample:
+        left, right, _ = pair_from_bytes(sample['stpair'])
+    else:
+        import numpy as np
+        from PIL import Image
+        left = np.asarray(Image.open(io.BytesIO(sample['left.png'])))
+        right = np.asarray(Image.open(io.BytesIO(sample['right.png'])))
+    return {'__key__': sample['__key__'], 'metadata': json.loads(sample['json']), 'left': left, 'right': right}
+
+
+def iter_samples(source, shuffle=0, seed=None, decode=False):
+    """
+    Stream the samples of shards, each shard is read sequentially once.
+    :param source: Export directory, shard path or list of paths / binary file objects
+    :param shuffle: Size of the shuffle buffer, 0 keeps the order. Shuffling also shuffles the shard order.
+    :param seed: Random seed of the shuffling
+    :param decode: Yield decoded arrays (see decode_sample) instead of the raw member bytes
+    Yields:
+        dict: __key__ and one entry per member suffix (left.png, right.png or stpair, json)
+    """
+    rng = random.Random(seed)
+    shards = shard_paths(source)
+    if shuffle:
+        rng.shuffle(shards)
+
+    buffer = []
+    for shard in shards:
+        for sample in _read_samples(shard):
+            if not shuffle:
+                yield decode_sample(sample) if decode else sample
+                continue
+            # Replace a random buffered sample once the buffer is full
+            if len(buffer) < shuffle:
+                buffer.append(sample)
+                continue
+            index = rng.randrange(len(buffer))
+            buffer[index], sample = sample, buffer[index]
+            yield decode_sample(sample) if decode else sample
+    rng.shuffle(buffer)
+    for sample in buffer:
+        yield decode_sample(sample) if decode else sample
@@ -1,5 +1,7 @@
 from .decorators import *
+from .resources import Resources
 
 __all__ = [
     "singleton",
+    "Resources",
 ]
\ No newline at end of file
@@ -1,10 +1,22 @@
+import threading
+
 _instances = {}
+_locks = {}
+_locks_lock = threading.Lock()
 
 def singleton(cls):
+    # Thread-safe: concurrent first calls (e.g. several Streamlit sessions) create one instance.
+    # Each class has its own lock, so different singletons can be created in parallel.
     def wrapper(*args, **kwargs):
-        if cls not in _instances:
-            _instances[cls] = cls(*args, **kwargs)
-        return _instances[cls]
+        instance = _instances.get(cls)
+        if instance is None:
+            with _locks_lock:
+                lock = _locks.setdefault(cls, threading.Lock())
+            with lock:
+                if cls not in _instances:
+                    _instances[cls] = cls(*args, **kwargs)
+                instance = _instances[cls]
+        return instance
     return wrapper
 
 # This allows importing _instances from outside
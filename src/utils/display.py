@@ -0,0 +1,116 @@
+"""
+Display copies of camera frames, shared by all Streamlit sessions.
+
+A full resolution frame is 24 MB, keeping the last pair of every browser
+session in st.session_state and encoding it again on every rerun does not
+scale to several tablets. DisplayImages downscales a frame once to the
+display width and keeps it JPEG encoded in an LRU cache with a byte budget,
+sessions only keep the key. The encoded bytes are handed to st.image as is,
+so an unchanged image keeps its media URL and is neither encoded nor
+downloaded again.
+"""
+
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+
+class DisplayImages:
+    WIDTH = 820  # half of the wide layout, a quarter of the 3280 px sensor
+    QUALITY = 85
+    MAX_BYTES = 32 * 2**20  # all sessions together, about 300 images
+
+    def __init__(self, width=WIDTH, quality=QUALITY, max_bytes=MAX_BYTES):
+        """
+        :param width: Maximum width of a display copy in pixels
+        :param quality: JPEG quality
+        :param max_bytes: Budget of the cached images, least recently shown ones are dropped first
+        """
+        self.width = width
+        self.quality = quality
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()  # key -> JPEG bytes
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Black placeholders are never evicted
+        self._placeholders = {}  # key -> JPEG bytes
+        self._blank_keys = {}  # (width, height) -> key
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._images)
+
+    def _encode(self, image):
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.quality)
+        return buffer.getvalue()
+
+    def _display_size(self, width, height):
+        scale = min(1.0, self.width / width)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def put(self, frame):
+        """
+        Store the display copy of a frame.
+        :param frame: RGB array or PIL image
+        Returns:
+            str: Key of the image
+        """
+        if isinstance(frame, Image.Image):
+            image = frame.convert("RGB")
+        else:
+            array = np.asarray(frame)
+            # Striding is enough for display and skips a full resolution resample
+            step = max(1, -(-array.shape[1] // self.width))
+            image = Image.fromarray(np.ascontiguousarray(array[::step, ::step]))
+        if image.width > self.width:
+            image = image.resize(self._display_size(*image.size), Image.BILINEAR)
+
+        data = self._encode(image)
+        key = hashlib.blake2b(data, digest_size=12).hexdigest()
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return key
+            self._images[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, dropped = self._images.popitem(last=False)
+                self._bytes -= len(dropped)
+        return key
+
+    def placeholder(self, width, height):
+        """
+        Key of the black image shown before the first capture, one per size for all sessions.
+        """
+        size = self._display_size(width, height)
+        with self._lock:
+            key = self._blank_keys.get(size)
+            if key is None:
+                data = self._encode(Image.new("RGB", size))
+                key = hashlib.blake2b(data, digest_size=12).hexdigest()
+                self._blank_keys[size] = key
+                self._placeholders[key] = data
+            return key
+
+    def get(self, key, default=None):
+        """
+        Returns:
+            bytes: JPEG of the key, the one of the default key if it was evicted
+        """
+        with self._lock:
+            for candidate in (key, default):
+                data = self._placeholders.get(candidate)
+                if data is None and candidate in self._images:
+                    self._images.move_to_end(candidate)
+                    data = self._images[candidate]
+                if data is not None:
+                    return data
+        return None
@@ -0,0 +1,68 @@
+"""
+Shared resources created lazily and in parallel.
+
+Opening the cameras, the light and the numberplate store takes seconds, mostly
+waiting on hardware. Resources starts every factory on its own thread and
+returns right away, get() blocks only for the resource that is asked for.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Resources:
+    def __init__(self, factories):
+        """
+        :param factories: name -> callable creating the resource
+        """
+        self.factories = dict(factories)
+        self.seconds = {}  # name -> creation time, for startup diagnostics
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _create(self, name):
+        start = time.perf_counter()
+        try:
+            return self.factories[name]()
+        finally:
+            self.seconds[name] = time.perf_counter() - start
+
+    def start(self, *names):
+        """
+        Start creating the resources (all if none are given) in the background,
+        resources that are already started are skipped. Returns right away.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, len(self.factories)), thread_name_prefix="resource-init"
+                )
+            for name in names or self.factories:
+                if name not in self._futures:
+                    self._futures[name] = self._executor.submit(self._create, name)
+        return self
+
+    def get(self, name, timeout=None):
+        """
+        The resource, waits until it is created. A failed creation raises its
+        exception here, every time it is asked for.
+        """
+        self.start(name)
+        return self._futures[name].result(timeout)
+
+    def ready(self, *names):
+        """
+        Returns:
+            bool: Whether the resources (all if none are given) are created
+        """
+        with self._lock:
+            futures = [self._futures.get(name) for name in names or self.factories]
+        return all(future is not None and future.done() for future in futures)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
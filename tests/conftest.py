@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+from utils.decorators import _instances
+from cam import StereoCamera
+from cam.backends import ReplayBackend
+from cam.fake import FakePicamera2
+from storage import CaptureCatalog
+from numberplate import Numberplate
+from numberplate.store import PlateStore
+
+# The left test image is black, the right one has texture
+LEFT_IMAGE = os.path.join(REPO_DIR, "left_test.jpg")
+RIGHT_IMAGE = os.path.join(REPO_DIR, "right_test.jpg")
+
+
+class FastCamera(FakePicamera2):
+    START_DELAY = 0.0
+    SWITCH_DELAY = 0.0
+
+
+def _forget(name):
+    # Singletons are cached per class, every test gets fresh controllers
+    for cls in list(_instances):
+        if cls.__name__ == name:
+            _instances.pop(cls)
+
+
+@pytest.fixture
+def make_cam(tmp_path):
+    """
+    StereoCamera on the replay backend, storing into tmp_path/data.
+    """
+    cams = []
+
+    def make(left=RIGHT_IMAGE, right=RIGHT_IMAGE, **kwargs):
+        _forget("StereoCamera")
+        os.makedirs(tmp_path / "data" / "images", exist_ok=True)
+        os.makedirs(tmp_path / "data" / "cam_configs", exist_ok=True)
+        kwargs.setdefault('idle_timeout', None)
+        backend = ReplayBackend([left], [right], frame_interval=1 / 30, start_delay=0.0, switch_delay=0.0)
+        cam = StereoCamera(backend=backend, catalog=CaptureCatalog(str(tmp_path / "catalog.sqlite")), **kwargs)
+        cam.ROOT_DIR = str(tmp_path)
+        cams.append(cam)
+        return cam
+
+    yield make
+    for cam in cams:
+        cam.close()
+
+
+@pytest.fixture
+def cam(make_cam):
+    cam = make_cam()
+    # The upscaled test image is too soft for the default sharpness threshold
+    cam.quality.update({'min_sharpness': 1.0})
+    return cam
+
+
+@pytest.fixture
+def numberplate(tmp_path):
+    _forget("Numberplate")
+    plate = Numberplate(quota=2, store=PlateStore(str(tmp_path / "numberplates.sqlite")))
+    plate.numberplate = "S-AB-1234"
+    yield plate
+    _forget("Numberplate")
+
+
+@pytest.fixture
+def light():
+    from light import LightController
+    from light.fake import FakeNeoPixelSPI
+
+    _forget("LightController")
+    light = LightController(pixels=FakeNeoPixelSPI(None, 8, auto_write=False), show_off=False, frame_rate=200)
+    yield light
+    light.close()
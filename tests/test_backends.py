@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from cam.backends import ReplayBackend, Picamera2Backend, get_backend
+from conftest import LEFT_IMAGE, RIGHT_IMAGE
+
+
+def test_get_backend_by_name(monkeypatch):
+    assert isinstance(get_backend("replay"), ReplayBackend)
+    monkeypatch.setenv("CAM_BACKEND", "replay")
+    assert isinstance(get_backend(), ReplayBackend)
+    with pytest.raises(ValueError):
+        get_backend("usb")
+
+
+def test_picamera2_backend_opens_the_given_class():
+    opened = []
+    backend = Picamera2Backend(camera_cls=lambda index: opened.append(index) or index)
+
+    assert [backend.open(0), backend.open(1)] == [0, 1] and opened == [0, 1]
+
+
+def test_replay_camera_cycles_resized_files():
+    backend = ReplayBackend([LEFT_IMAGE, RIGHT_IMAGE], [RIGHT_IMAGE], frame_interval=0)
+    camera = backend.open(1)
+    try:
+        camera.configure(camera.create_preview_configuration(main={'size': (320, 240), 'format': 'BGR888'}))
+        camera.start()
+        frames = [camera.capture_array() for _ in range(3)]
+    finally:
+        backend.close_all()
+
+    with Image.open(RIGHT_IMAGE) as image:
+        expected = np.asarray(image.convert("RGB").resize((320, 240), Image.BILINEAR))
+    assert all(frame.shape == (240, 320, 3) for frame in frames)
+    assert np.array_equal(frames[1], expected)
+    assert np.array_equal(frames[0], frames[2]) and not np.array_equal(frames[0], frames[1])
+    assert camera.closed
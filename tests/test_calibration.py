@@ -0,0 +1,113 @@
+import cv2
+import numpy as np
+import pytest
+
+from calibration import StereoCalibration, Rectifier, CalibrationStore, calibrate
+from calibration.calibration import find_corners
+
+PATTERN = (7, 5)  # inner corners
+SQUARE_MM = 20.0
+SIZE = (640, 480)
+K = np.array([[700.0, 0, 320], [0, 700.0, 240], [0, 0, 1]])
+BASELINE_MM = 60.0
+PX_PER_MM = 4
+
+
+def board_texture():
+    # Checkerboard with a one square white margin, PX_PER_MM pixels per mm
+    squares = (PATTERN[0] + 1, PATTERN[1] + 1)
+    cell = int(SQUARE_MM * PX_PER_MM)
+    board = np.full(((squares[1] + 2) * cell, (squares[0] + 2) * cell), 255, np.uint8)
+    for row in range(squares[1]):
+        for col in range(squares[0]):
+            if (row + col) % 2 == 0:
+                board[(row + 1) * cell:(row + 2) * cell, (col + 1) * cell:(col + 2) * cell] = 0
+    return board
+
+
+def render(board, rotation, translation):
+    # Board plane point (x, y, 0) in mm seen by a pinhole camera, margin offset included
+    R, _ = cv2.Rodrigues(np.asarray(rotation, dtype=np.float64))
+    plane_to_image = K @ np.column_stack([R[:, 0], R[:, 1], translation])
+    texture_to_plane = np.array([[1 / PX_PER_MM, 0, -SQUARE_MM], [0, 1 / PX_PER_MM, -SQUARE_MM], [0, 0, 1]])
+    return cv2.warpPerspective(board, plane_to_image @ texture_to_plane, SIZE, borderValue=255)
+
+
+def synthetic_pairs():
+    board = board_texture()
+    pairs = []
+    for rotation, translation in [
+        ((0.0, 0.0, 0.0), (-80, -60, 320)),
+        ((0.3, 0.0, 0.05), (-120, -90, 340)),
+        ((-0.3, 0.1, 0.0), (-40, -30, 330)),
+        ((0.0, 0.35, -0.05), (-130, -40, 350)),
+        ((0.1, -0.35, 0.1), (-20, -80, 340)),
+        ((0.25, 0.25, 0.0), (-60, -100, 360)),
+        ((-0.2, -0.2, 0.2), (-110, -20, 330)),
+        ((0.15, -0.1, -0.2), (-30, -30, 310)),
+    ]:
+        translation = np.asarray(translation, dtype=np.float64)
+        # The right camera sits BASELINE_MM to the right of the left one
+        left = render(board, rotation, translation)
+        right = render(board, rotation, translation - (BASELINE_MM, 0, 0))
+        pairs.append((left, right))
+    return pairs
+
+
+@pytest.fixture(scope="module")
+def calibration():
+    return calibrate(synthetic_pairs(), PATTERN, SQUARE_MM)
+
+
+def test_calibration_recovers_the_rig(calibration):
+    assert calibration.rms < 0.5
+    assert calibration.image_size == SIZE
+    assert calibration.baseline_mm == pytest.approx(BASELINE_MM, rel=0.02)
+    assert calibration.K1[0, 0] == pytest.approx(700, rel=0.02)
+
+
+def test_too_few_boards_are_rejected():
+    blank = np.full((SIZE[1], SIZE[0]), 255, np.uint8)
+
+    with pytest.raises(ValueError):
+        calibrate([(blank, blank)] * 3, PATTERN, SQUARE_MM)
+
+
+def test_rectified_corners_share_rows(calibration):
+    # Board parallel to the sensors at z = 320 mm
+    left, right = synthetic_pairs()[0]
+
+    left, right = Rectifier(calibration).rectify(left, right)
+
+    left_corners = find_corners(left, PATTERN).reshape(-1, 2)
+    right_corners = find_corners(right, PATTERN).reshape(-1, 2)
+    assert np.abs(left_corners[:, 1] - right_corners[:, 1]).max() < 0.5
+    # Disparity of a point at z mm is f * B / z
+    disparity = left_corners[:, 0] - right_corners[:, 0]
+    assert disparity.mean() == pytest.approx(calibration.focal_length_px * BASELINE_MM / 320, rel=0.05)
+
+
+def test_maps_are_cached_on_disk(calibration, tmp_path, monkeypatch):
+    store = CalibrationStore(str(tmp_path))
+    store.save(calibration)
+    loaded = store.load()
+    assert loaded.fingerprint() == calibration.fingerprint()
+
+    maps = store.rectifier().maps((320, 240))
+    assert maps[0].shape[:2] == (240, 320)
+    assert store.rectifier().maps((320, 240)) is maps
+
+    # A new process loads the maps instead of computing them
+    monkeypatch.setattr(Rectifier, "_compute_maps", lambda self, size: pytest.fail("maps recomputed"))
+    cached = CalibrationStore(str(tmp_path)).rectifier().maps((320, 240))
+    assert all(np.array_equal(a, b) for a, b in zip(maps, cached))
+    with pytest.raises(FileNotFoundError):
+        store.load("night")
+
+
+def test_calibration_roundtrip(calibration, tmp_path):
+    path = str(tmp_path / "calibration.json")
+    calibration.save(path)
+
+    loaded = StereoCalibration.load(path)
+    assert loaded.to_dict() == calibration.to_dict()
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+
+import pytest
+
+from cam import CaptureRejected
+from conftest import LEFT_IMAGE
+
+
+def test_session_keeps_cameras_streaming(cam, numberplate):
+    cam.get_preview()
+    cam.get_preview()
+    cam.capture_images("3", numberplate)
+
+    assert cam.streaming
+    assert cam.left_cam.start_count == cam.right_cam.start_count == 1
+    assert cam.left_cam.stop_count == 0
+
+
+def test_nested_sessions_share_the_stream(make_cam):
+    cam = make_cam(idle_timeout=0)
+
+    with cam.session():
+        with cam.session():
+            cam.get_preview()
+        assert cam.streaming
+    assert not cam.streaming
+    assert cam.left_cam.start_count == cam.left_cam.stop_count == 1
+
+
+def test_idle_timeout_stops_cameras(make_cam):
+    cam = make_cam(idle_timeout=0.05)
+
+    cam.get_preview()
+    assert cam.streaming
+    time.sleep(0.3)
+    assert not cam.streaming
+    assert cam.left_cam.stop_count == 1
+
+    # The next user restarts the pipeline
+    cam.get_preview()
+    assert cam.left_cam.start_count == 2
+
+
+def test_session_within_timeout_keeps_streaming(make_cam):
+    cam = make_cam(idle_timeout=0.3)
+
+    cam.get_preview()
+    time.sleep(0.1)
+    cam.get_preview()
+    time.sleep(0.25)
+    assert cam.streaming
+    assert cam.left_cam.start_count == 1
+
+
+def test_capture_writes_pair(cam, numberplate):
+    handle = cam.capture_images("3", numberplate)
+
+    left_path, right_path = handle.result(timeout=60)
+    assert handle.left_image.shape == handle.right_image.shape
+    assert os.path.exists(left_path) and os.path.exists(right_path)
+    assert numberplate.store.get("S-AB-1234") == 1
+
+    captures = cam.catalog.query(numberplate="S-AB-1234")
+    assert [capture['id'] for capture in captures] == [handle.metadata['id']]
+    assert captures[0]['depth_mm'] == 3.0
+    assert captures[0]['paths'] == [left_path, right_path, handle.metadata_path]
+
+    assert cam.delete_last_images(numberplate)
+    assert not os.path.exists(left_path) and not os.path.exists(right_path)
+    assert numberplate.store.get("S-AB-1234") == 0
+    assert len(cam.catalog) == 0
+
+
+def test_preview_streams_display_sized_frames(cam):
+    left, right = cam.get_preview()
+
+    assert left.size == right.size == cam.PREVIEW_SIZE
+    assert cam.mode == "preview"
+
+
+def test_captures_switch_mode_without_restarting(cam, numberplate):
+    cam.get_preview()
+    for _ in range(2):
+        handle = cam.capture_images("3", numberplate)
+        assert handle.left_image.shape == (2464, 3280, 3)
+    assert cam.mode == "still"
+    # Back-to-back captures stay in still mode
+    assert cam.left_cam.switch_count == cam.right_cam.switch_count == 1
+
+    cam.get_preview()
+    assert cam.mode == "preview"
+    assert cam.left_cam.switch_count == 2
+    assert cam.left_cam.start_count == 1 and cam.left_cam.stop_count == 0
+
+
+def test_stopped_cameras_are_only_reconfigured(cam):
+    cam.set_mode("still")
+
+    assert cam.left_cam.camera_config is cam.left_config
+    assert cam.left_cam.switch_count == 0 and not cam.streaming
+    with pytest.raises(ValueError):
+        cam.set_mode("video")
+
+
+def test_capture_records_pair_timestamps(cam, numberplate):
+    handle = cam.capture_images("3", numberplate)
+    handle.result(timeout=60)
+    metadata_path = handle.metadata_path
+
+    with open(metadata_path) as f:
+        sidecar = json.load(f)
+    assert sidecar['label'] == "3"
+    assert sidecar['left_timestamp'] and sidecar['right_timestamp']
+    assert sidecar['quality']['passed']
+    assert abs(sidecar['skew_ns']) <= cam.MAX_SKEW_MS * 1e6
+
+    assert cam.delete_last_images(numberplate)
+    assert not os.path.exists(metadata_path)
+
+
+def test_stop_ends_the_session(cam):
+    cam.acquire()
+    cam.acquire()
+    cam.stop()
+
+    assert not cam.streaming
+    cam.release()
+    assert cam.left_cam.start_count == 1
+
+
+def test_burst_counts_once_and_delete_removes_it(cam, numberplate):
+    handles = cam.capture_burst("3", numberplate, count=3)
+    for handle in handles:
+        handle.result(timeout=60)
+
+    assert len({handle.metadata['group_id'] for handle in handles}) == 1
+    assert [handle.metadata['group_index'] for handle in handles] == [0, 1, 2]
+    assert numberplate.store.get("S-AB-1234") == 1
+    assert len(cam.catalog) == 3
+    assert cam.catalog.plate_counts() == {"S-AB-1234": 1}
+
+    assert cam.delete_last_images(numberplate)
+    assert numberplate.store.get("S-AB-1234") == 0
+    assert len(cam.catalog) == 0
+    for handle in handles:
+        assert not any(os.path.exists(path) for path in handle.paths + [handle.metadata_path])
+    assert not cam.can_delete_last_images()
+
+
+def test_exposure_bracket_steps_each_pair(cam, numberplate):
+    default = cam.get_camera_options()['ExposureTime']['default']
+    bracket = cam.exposure_bracket(3)
+
+    assert [overrides['ExposureTime'] for overrides in bracket] == [default // 2, default, default * 2]
+    handles = cam.capture_burst("3", numberplate, count=3, bracket=bracket)
+    exposures = [handle.metadata['left_metadata']['ExposureTime'] for handle in handles]
+    assert exposures == [default // 2, default, default * 2]
+    assert [handle.metadata['controls']['ExposureTime'] for handle in handles] == exposures
+
+
+def test_bracket_restores_controls(cam, numberplate):
+    default = cam.get_camera_options()['ExposureTime']['default']
+
+    handles = cam.capture_burst("3", numberplate, count=3, bracket=cam.exposure_bracket(3))
+
+    exposures = [handle.metadata['left_metadata']['ExposureTime'] for handle in handles]
+    assert exposures == sorted(exposures) and exposures[0] < default < exposures[-1]
+    # Nothing was set explicitly, the exposure is automatic again instead of fixed
+    assert cam.left_cam.controls['ExposureTime'] == cam.right_cam.controls['ExposureTime'] == 0
+    assert cam.left_cam.controls['AeEnable'] and cam.right_cam.controls['AeEnable']
+    _, _, metadata = cam.grab_pair()
+    assert metadata['left_metadata']['ExposureTime'] == default
+
+
+def test_bracket_restores_explicit_controls(cam, numberplate):
+    cam.adjust_config({'ExposureTime': 10000})
+
+    cam.capture_burst("3", numberplate, count=3, bracket=cam.exposure_bracket(3))
+
+    assert cam.left_cam.controls['ExposureTime'] == cam.right_cam.controls['ExposureTime'] == 10000
+    assert 'AeEnable' not in cam.left_cam.controls
+
+
+def test_burst_limits(cam, numberplate):
+    with pytest.raises(ValueError):
+        cam.capture_burst("3", numberplate, count=cam.MAX_BURST + 1)
+    with pytest.raises(ValueError):
+        cam.exposure_bracket(3, control='Contrast')
+
+    numberplate.full = True
+    assert cam.capture_burst("3", numberplate, count=2) is None
+    assert not cam.can_delete_last_images()
+
+
+def test_failed_write_is_dropped_from_the_catalog(cam, numberplate, tmp_path):
+    os.rmdir(tmp_path / "data" / "images")
+
+    handle = cam.capture_images("3", numberplate)
+
+    assert handle.exception(timeout=60) is not None
+    # The row is removed by a done callback, which may run after the waiter woke up
+    deadline = time.monotonic() + 5
+    while len(cam.catalog) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(cam.catalog) == 0
+
+
+def test_repeated_capture_is_reported_as_duplicate(cam, numberplate):
+    first = cam.capture_images("3", numberplate)
+    second = cam.capture_images("3", numberplate)
+
+    assert first.metadata['duplicates'] == []
+    assert [match['id'] for match in second.metadata['duplicates']] == [first.metadata['id']]
+
+
+def test_full_numberplate_writes_nothing(cam, numberplate):
+    cam.capture_images("3", numberplate)
+    cam.capture_images("3", numberplate)
+
+    assert numberplate.full
+    assert cam.capture_images("3", numberplate) is None
+    assert cam.catalog.plate_counts() == {"S-AB-1234": 2}
+
+    # Filled by another process after the full check
+    numberplate.numberplate = "S-AB-5678"
+    numberplate.store.increment("S-AB-5678")
+    numberplate.store.increment("S-AB-5678")
+    numberplate.full = False
+    assert cam.capture_images("3", numberplate) is None
+    assert cam.catalog.query(numberplate="S-AB-5678") == []
+
+
+def test_grab_pair_is_not_stored(cam, tmp_path):
+    left, right, metadata = cam.grab_pair()
+
+    assert left.shape == right.shape == (2464, 3280, 3)
+    assert cam.mode == "still"
+    assert abs(metadata['skew_ns']) <= cam.MAX_SKEW_MS * 1e6
+    assert os.listdir(tmp_path / "data" / "images") == [] and len(cam.catalog) == 0
+
+
+def test_adjust_config_only_writes_changes(cam):
+    controls = {'ExposureTime': "10000", 'AnalogueGain': 2, 'Contrast': 1.0}
+
+    assert cam.adjust_config(controls) == {'ExposureTime': 10000, 'AnalogueGain': 2.0, 'Contrast': 1.0}
+    assert cam.left_cam.controls == cam.right_cam.controls == {'ExposureTime': 10000, 'AnalogueGain': 2.0, 'Contrast': 1.0}
+    assert cam.hardware_writes == 2
+
+    # A rerun with the same values does not touch the sensors
+    assert cam.adjust_config(controls) == {}
+    assert cam.hardware_writes == 2
+
+    assert cam.adjust_config(dict(controls, Contrast=1.5)) == {'Contrast': 1.5}
+    assert cam.hardware_writes == 4
+    assert controls['ExposureTime'] == "10000"
+    assert cam.get_camera_options() is cam.get_camera_options()
+
+
+def test_strobe_lights_every_captured_pair(cam, numberplate, light):
+    cam.set_strobe(light, brightness=0.8)
+    handles = cam.capture_burst("3", numberplate, count=2)
+
+    assert len(cam.last_strobe) == 2
+    for handle in handles:
+        strobe = handle.metadata['strobe']
+        assert strobe['brightness'] == 0.8
+        # Every pair was exposed after the light went on and before it went off
+        assert strobe['lead_ms'] >= 0 and strobe['lag_ms'] is not None
+    assert not light.pixels.lit()
+
+
+def test_quality_gate_rejects_unlit_pair(make_cam, numberplate):
+    cam = make_cam(left=LEFT_IMAGE)
+
+    with pytest.raises(CaptureRejected, match="left too dark"):
+        cam.capture_images("3", numberplate)
+    assert numberplate.store.get("S-AB-1234") == 0
+    assert len(cam.catalog) == 0
+
+    assert cam.capture_images("3", numberplate, check_quality=False) is not None
+
+
+def test_quality_thresholds_are_saved_with_the_config(cam):
+    cam.quality.update({'min_brightness': 42, 'unknown': 1})
+    cam.save_cam_config("gate")
+    cam.quality.update({'min_brightness': 1})
+
+    cam.load_config("camera_settings_gate.json")
+    assert cam.quality.thresholds['min_brightness'] == 42.0
+    assert 'unknown' not in cam.quality.thresholds
+
+
+def test_controls_survive_mode_switches(cam, numberplate):
+    cam.get_preview()
+    cam.adjust_config({'ExposureTime': 10000, 'Contrast': 1.5})
+
+    handle = cam.capture_images("3", numberplate)
+    assert handle.metadata['left_metadata']['ExposureTime'] == 10000
+    cam.get_preview()
+    assert cam.left_cam.switch_count == 2
+    assert cam.left_cam.controls == cam.right_cam.controls == {'ExposureTime': 10000, 'Contrast': 1.5}
@@ -0,0 +1,89 @@
+import argparse
+
+import pytest
+
+from storage import CaptureCatalog
+from storage.__main__ import index, _remove_groups
+from storage.duplicates import find_duplicates
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return CaptureCatalog(str(tmp_path / "catalog.sqlite"))
+
+
+def record(capture_id, created_at, label="3", numberplate="S-AB-1234", group_id=None, config_name=None):
+    return {
+        'id': capture_id, 'group_id': group_id or capture_id, 'numberplate': numberplate, 'label': label,
+        'config_name': config_name, 'created_at': created_at, 'paths': [f"{capture_id}_L.png", f"{capture_id}_R.png"],
+        'metadata': {'label': label},
+    }
+
+
+def test_query_filters(catalog):
+    catalog.add([
+        record("a", 1, label="2,5", config_name="day.json"),
+        record("b", 2, label="5"),
+        record("c", 3, label="1", numberplate="M-XY-1"),
+        record("d", 4, label="new"),
+    ])
+
+    assert [capture['id'] for capture in catalog.query()] == ["a", "b", "c", "d"]
+    assert [capture['id'] for capture in catalog.query(numberplate="S-AB-1234", max_depth=3)] == ["a"]
+    assert [capture['id'] for capture in catalog.query(min_depth=2, max_depth=5)] == ["a"]
+    assert [capture['id'] for capture in catalog.query(config_name="day.json")] == ["a"]
+    assert [capture['id'] for capture in catalog.query(since=2, until=4)] == ["b", "c"]
+    assert [capture['id'] for capture in catalog.query(limit=1)] == ["a"]
+    capture = catalog.query(label="new")[0]
+    assert capture['depth_mm'] is None
+    assert capture['paths'] == ["d_L.png", "d_R.png"] and capture['metadata'] == {'label': "new"}
+
+
+def test_plate_counts_count_a_burst_once(catalog):
+    catalog.add([record("g-00", 1, group_id="g"), record("g-01", 1, group_id="g"), record("h", 2)])
+    catalog.add([record("i", 3, numberplate="M-XY-1")])
+
+    assert catalog.plate_counts() == {"S-AB-1234": 2, "M-XY-1": 1}
+    catalog.remove(["g-00", "g-01"])
+    assert catalog.plate_counts() == {"S-AB-1234": 1, "M-XY-1": 1}
+    assert len(catalog) == 2
+
+
+def test_failed_transaction_is_rolled_back(catalog):
+    catalog.add([record("a", 1)])
+
+    with pytest.raises(OSError):
+        with catalog.transaction() as db:
+            catalog.remove(["a"], db=db)
+            raise OSError("file in use")
+    assert len(catalog) == 1
+
+
+def test_index_backfills_files(tmp_path, catalog, monkeypatch):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    for name in ("abc_3_L.png", "abc_3_R.png", "def_5_L.png"):
+        (images_dir / name).write_bytes(b"")
+
+    # Relative to the working directory, like "cd src && python -m storage index ../data/images"
+    monkeypatch.chdir(tmp_path)
+    index(argparse.Namespace(images="images", catalog=catalog.path))
+
+    (capture,) = catalog.query()
+    assert capture['id'] == capture['group_id'] == "abc"
+    assert capture['label'] == "3" and capture['storage_format'] == "png"
+    assert capture['paths'] == [str(images_dir / "abc_3_L.png"), str(images_dir / "abc_3_R.png")]
+
+
+def test_removed_duplicate_gives_back_its_own_plate(cam, numberplate):
+    cam.capture_images("3", numberplate)
+    numberplate.numberplate = "S-CD-5678"
+    cam.capture_images("3", numberplate)
+    cam.writer.flush()
+
+    clusters = find_duplicates(cam.catalog.fingerprints(None), across_plates=True)
+    _remove_groups(cam.catalog, clusters)
+
+    assert numberplate.store.get("S-AB-1234") == 1
+    assert numberplate.store.get("S-CD-5678") == 0
+    assert cam.catalog.plate_counts() == {"S-AB-1234": 1}
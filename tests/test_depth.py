@@ -0,0 +1,260 @@
+import cv2
+import numpy as np
+import pytest
+
+from depth import load_config, save_config, compute_disparity, disparity_to_depth, find_pairs, run_batch
+from depth.batch import output_paths
+
+SHIFT = 8  # disparity of the synthetic pairs in pixels
+
+
+def textured_pair(shape=(240, 320), shift=SHIFT, seed=0):
+    """
+    Grayscale pair of a random texture, the right view shifted by shift pixels.
+    """
+    rng = np.random.default_rng(seed)
+    texture = rng.integers(0, 255, (shape[0], shape[1] + shift), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (3, 3), 0)
+    return texture[:, :-shift].copy(), texture[:, shift:].copy()
+
+
+@pytest.fixture
+def config():
+    config = load_config("/nonexistent/matcher.json")
+    config.update(num_disparities=32, block_size=5, calibration=None)
+    return config
+
+
+def test_disparity_of_a_shifted_texture(config):
+    left, right = textured_pair()
+
+    disparity = compute_disparity(left, right, config)
+
+    interior = disparity[20:-20, config['num_disparities'] + 10:-10]
+    assert np.median(interior) == pytest.approx(SHIFT, abs=0.25)
+    assert (np.abs(interior - SHIFT) < 1).mean() > 0.95
+
+
+def test_disparity_to_depth():
+    disparity = np.array([[0.0, -1.0, 10.0, 20.0]], dtype=np.float32)
+
+    depth = disparity_to_depth(disparity, focal_px=1000.0, baseline=60.0)
+
+    assert depth.tolist() == [[0.0, 0.0, 6000.0, 3000.0]]
+
+
+def test_config_roundtrip(tmp_path, config):
+    path = str(tmp_path / "matcher.json")
+    save_config({'block_size': 9}, path)
+
+    loaded = load_config(path)
+    assert loaded['block_size'] == 9
+    assert loaded['num_disparities'] == 160
+
+
+def test_batch_skips_finished_pairs(tmp_path, config):
+    images_dir, output_dir = tmp_path / "images", tmp_path / "depth"
+    images_dir.mkdir()
+    for index in range(2):
+        left, right = textured_pair(seed=index)
+        cv2.imwrite(str(images_dir / f"pair{index}_3_L.png"), left)
+        cv2.imwrite(str(images_dir / f"pair{index}_3_R.png"), right)
+    pairs = find_pairs(str(images_dir))
+    assert [name for name, _ in pairs] == ["pair0_3", "pair1_3"]
+
+    result = run_batch(pairs, str(output_dir), config, workers=2)
+
+    assert result['processed'] == 2 and result['skipped'] == 0 and result['failed'] == []
+    paths = output_paths(str(output_dir), "pair0_3")
+    depth = cv2.imread(paths['depth'], cv2.IMREAD_UNCHANGED)
+    assert depth.dtype == np.uint16
+    focal_px = config['focal_length_mm'] * 320 / config['sensor_width_mm']
+    expected = focal_px * config['baseline_mm'] / SHIFT
+    assert np.median(depth[20:-20, 60:-10]) == pytest.approx(expected, rel=0.05)
+    assert cv2.imread(paths['disparity'], cv2.IMREAD_UNCHANGED)[120, 160] == pytest.approx(16 * SHIFT, abs=8)
+
+    # A rerun only processes what is missing
+    (output_dir / "pair1_3_depth_mm.png").unlink()
+    result = run_batch(pairs, str(output_dir), config, workers=2)
+    assert result['processed'] == 1 and result['skipped'] == 1
+
+
+def test_pairs_of_a_catalog_query(tmp_path):
+    from storage import CaptureCatalog
+    from depth.batch import catalog_pairs
+
+    catalog = CaptureCatalog(str(tmp_path / "catalog.sqlite"))
+    catalog.add([
+        {'id': "a", 'label': "3", 'paths': ["/images/a_3_L.png", "/images/a_3_R.png", "/images/a_3.json"]},
+        {'id': "b", 'label': "7", 'paths': ["/images/b_7.stpair"]},
+    ])
+
+    assert catalog_pairs(catalog, max_depth=5) == [("a_3", ["/images/a_3_L.png", "/images/a_3_R.png"])]
+    assert catalog_pairs(catalog, label="7") == [("b_7", ["/images/b_7.stpair"])]
+
+
+def tyre_scene(shape=(480, 640), tyre=(200, 120, 240, 240), tyre_shift=48, background_shift=4, seed=0):
+    """
+    Grayscale pair of a far textured background with a near textured rectangle (the tyre).
+    :param tyre: (x, y, w, h) of the rectangle in the left image
+    """
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width + background_shift), dtype=np.uint8), (3, 3), 0)
+    left, right = background[:, :width].copy(), background[:, background_shift:].copy()
+    x, y, w, h = tyre
+    front = cv2.GaussianBlur(rng.integers(0, 255, (h, w), dtype=np.uint8), (3, 3), 0)
+    left[y:y + h, x:x + w] = front
+    right[y:y + h, x - tyre_shift:x - tyre_shift + w] = front
+    return left, right
+
+
+def test_coarse_to_fine_matches_only_the_tyre(config):
+    from depth.roi import coarse_to_fine_disparity
+
+    config.update(num_disparities=64, disparity_mode='roi')
+    left, right = tyre_scene()
+
+    # 1000 px * 60 mm / 48 px = 1250 mm is within the tyre range, the background at 15 m is not
+    disparity, roi = coarse_to_fine_disparity(left, right, config, focal_px=1000.0, baseline=60.0)
+
+    x, y, w, h = roi
+    assert x <= 200 and y <= 120 and x + w >= 440 and y + h >= 360
+    assert w * h < 0.6 * left.size
+    assert np.median(disparity[140:340, 220:420]) == pytest.approx(48, abs=0.5)
+    assert not disparity[:y].any() and not disparity[y + h:].any()
+
+    full = compute_disparity(left, right, config)
+    assert np.median(np.abs(disparity[140:340, 220:420] - full[140:340, 220:420])) < 0.5
+
+
+def test_roi_falls_back_to_the_full_frame(config):
+    from depth.roi import coarse_to_fine_disparity
+
+    left, right = textured_pair()
+
+    # The whole frame is 15 m away, nothing is in the tyre range
+    disparity, roi = coarse_to_fine_disparity(left, right, config, focal_px=15000.0, baseline=8.0)
+
+    assert roi is None
+    assert np.array_equal(disparity, compute_disparity(left, right, config))
+
+
+def test_cache_hit_and_miss(tmp_path, config):
+    from depth.cache import DepthCache
+
+    left_path, right_path = tmp_path / "a_L.png", tmp_path / "a_R.png"
+    left, right = textured_pair()
+    cv2.imwrite(str(left_path), left)
+    cv2.imwrite(str(right_path), right)
+    cache = DepthCache(str(tmp_path / "cache"))
+    key = DepthCache.key([left_path, right_path], config)
+
+    assert cache.get(key) is None
+    cache.put(key, depth=np.ones((4, 4), np.uint16))
+    assert cache.get(key)['depth'].tolist() == np.ones((4, 4)).tolist()
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    # Any parameter or content change is another entry
+    assert DepthCache.key([left_path, right_path], dict(config, block_size=7)) != key
+    cv2.imwrite(str(left_path), right)
+    assert DepthCache.key([left_path, right_path], config) != key
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    import os
+    from depth.cache import DepthCache
+
+    cache = DepthCache(str(tmp_path / "cache"))
+    keys = [f"{index:02d}" + "0" * 62 for index in range(3)]
+    for index, key in enumerate(keys):
+        cache.put(key, depth=np.full((64, 64), index, np.uint16))
+        os.utime(cache._path(key), (1000 + index, 1000 + index))
+
+    # Reading the oldest entry makes the second one the least recently used
+    assert cache.get(keys[0]) is not None
+    cache.max_bytes = cache.size() - 1
+    assert cache.evict() == 1
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.size() <= cache.max_bytes
+
+
+def test_batch_reuses_cached_results(tmp_path, config):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    left, right = textured_pair()
+    cv2.imwrite(str(images_dir / "pair_3_L.png"), left)
+    cv2.imwrite(str(images_dir / "pair_3_R.png"), right)
+    pairs = find_pairs(str(images_dir))
+    cache_dir = str(tmp_path / "cache")
+
+    first = run_batch(pairs, str(tmp_path / "depth"), config, workers=1, cache_dir=cache_dir)
+    depth = cv2.imread(output_paths(str(tmp_path / "depth"), "pair_3")['depth'], cv2.IMREAD_UNCHANGED)
+    second = run_batch(pairs, str(tmp_path / "depth"), config, workers=1, cache_dir=cache_dir, force=True)
+
+    assert (first['cache_hits'], first['cache_misses']) == (0, 1)
+    assert (second['cache_hits'], second['cache_misses']) == (1, 0)
+    again = cv2.imread(output_paths(str(tmp_path / "depth"), "pair_3")['depth'], cv2.IMREAD_UNCHANGED)
+    assert np.array_equal(depth, again)
+
+
+def grooved_depth(groove_mm=6.0, noise_mm=0.3, shape=(400, 500), tyre=(50, 40, 400, 320), seed=0):
+    """
+    Depth map of a slightly curved tread 600 mm away with vertical grooves groove_mm deep.
+    """
+    rng = np.random.default_rng(seed)
+    depth = np.zeros(shape, dtype=np.float32)
+    x, y, w, h = tyre
+    grid_y, grid_x = np.mgrid[0:h, 0:w]
+    surface = 600 + 0.0002 * (grid_x - w / 2) ** 2 + 0.01 * grid_y
+    grooves = (grid_x % 50) < 10  # 20 % of the tread
+    depth[y:y + h, x:x + w] = surface + groove_mm * grooves + rng.normal(0, noise_mm, (h, w))
+    return depth
+
+
+def test_measure_tread_of_grooved_depth(config):
+    from depth.tread import measure_tread
+
+    measurement = measure_tread(grooved_depth(groove_mm=6.0), config)
+
+    assert measurement.depth_mm == pytest.approx(6.0, abs=0.7)
+    assert measurement.groove_fraction == pytest.approx(0.2, abs=0.05)
+    assert measurement.confidence > 0.5
+    assert measurement.label == f"{measurement.depth_mm:.1f}"
+
+
+def test_measure_tread_without_resolved_grooves(config):
+    from depth.tread import measure_tread
+
+    # Grooves shallower than half a disparity step are not resolved
+    shallow = measure_tread(grooved_depth(groove_mm=2.0), config, resolution_mm=8.0)
+    assert shallow.depth_mm == 0.0
+
+    nothing = measure_tread(np.zeros((100, 100), np.float32), config)
+    assert nothing.depth_mm is None and nothing.label == ""
+
+
+def test_measure_tread_of_worn_tread(config):
+    from depth.tread import measure_tread
+
+    # Block noise behind the surface is no groove
+    for noise_mm in (0.3, 1.0):
+        worn = measure_tread(grooved_depth(groove_mm=0.0, noise_mm=noise_mm), config)
+        assert worn.depth_mm == 0.0 and worn.confidence == 0.0
+
+
+def test_tread_meter_on_a_pair(config):
+    from depth import TreadMeter
+
+    # 1000 px focal length at the full 640 px width, the tyre is 1.25 m away at any working width
+    config.update(num_disparities=64, tread_measure_width=320, focal_length_mm=1000 * 3.68 / 640)
+    left, right = tyre_scene()
+
+    measurement = TreadMeter(config).measure(np.dstack([left] * 3), np.dstack([right] * 3))
+
+    # The flat tyre has no grooves
+    assert measurement.depth_mm is not None and measurement.depth_mm < 1.0
+    assert measurement.valid_fraction > 0.3
+    assert measurement.seconds > 0
@@ -0,0 +1,46 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from utils.display import DisplayImages
+
+
+def frame(seed, shape=(2464, 3280, 3)):
+    return np.random.default_rng(seed).integers(0, 255, shape, dtype=np.uint8)
+
+
+def test_frames_are_stored_display_sized():
+    images = DisplayImages(width=820)
+
+    key = images.put(frame(0))
+    image = Image.open(io.BytesIO(images.get(key)))
+    assert image.format == "JPEG" and image.size == (820, 616)
+    # The same frame is encoded to the same key, it is not stored twice
+    assert images.put(frame(0)) == key and len(images) == 1
+
+
+def test_least_recently_shown_images_are_evicted():
+    images = DisplayImages(width=64)
+    keys = [images.put(frame(seed, (48, 64, 3))) for seed in range(3)]
+    images.max_bytes = images.nbytes
+
+    # Showing the first image makes the second one the oldest
+    assert images.get(keys[0]) is not None
+    images.put(frame(3, (48, 64, 3)))
+    assert images.get(keys[1]) is None
+    assert images.get(keys[0]) is not None and images.get(keys[2]) is not None
+    assert images.nbytes <= images.max_bytes
+
+
+def test_evicted_keys_fall_back_to_the_placeholder():
+    images = DisplayImages(width=64, max_bytes=1)
+    blank = images.placeholder(3280, 2464)
+    first = images.put(frame(0, (48, 64, 3)))
+    images.put(frame(1, (48, 64, 3)))
+
+    # The budget keeps at least the latest image, placeholders are never evicted
+    assert len(images) == 1
+    assert images.get(first, default=blank) == images.get(blank)
+    assert Image.open(io.BytesIO(images.get(blank))).size == (64, 48)
+    assert images.placeholder(3280, 2464) == blank
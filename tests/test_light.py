@@ -0,0 +1,89 @@
+import time
+
+from light import LightController
+from light.animation import fade, flash, startup, OFF, WHITE
+from light.fake import FakeNeoPixelSPI
+from conftest import _forget
+
+
+def test_effects_yield_frames():
+    frames = list(fade(2, WHITE, 0.0, 1.0, duration=0.1, frame_rate=100))
+    assert [brightness for _, brightness in frames] == [i / 10 for i in range(11)]
+
+    frames = list(flash(2, duration=0.05, frame_rate=100))
+    assert frames[0] == ([WHITE, WHITE], 1.0) and frames[-1] == ([OFF, OFF], 1.0)
+
+    frames = list(startup(4, duration=0.4, frame_rate=100))
+    assert frames[0][0] == [(25, 25, 25), OFF, OFF, OFF]
+    assert frames[-1][0] == [OFF] * 4
+
+
+def test_setters_return_before_the_strip_is_written(light):
+    start = time.perf_counter()
+    light.turn(True)
+    light.set_brightness(0.5)
+    assert time.perf_counter() - start < 0.05
+
+    assert light.wait(1.0)
+    assert light.pixels.lit() and light.pixels.brightness == 0.5
+
+    light.turn(False)
+    assert light.wait(1.0)
+    assert not light.pixels.lit()
+
+
+def test_unchanged_state_is_not_written(light):
+    light.turn(True)
+    light.wait(1.0)
+    writes = light.hardware_writes
+
+    light.turn(True)
+    light.set_brightness(light.brightness)
+    light.wait(1.0)
+    assert light.hardware_writes == writes
+
+
+def test_updates_are_coalesced(light):
+    light.turn(True)
+    for step in range(100):
+        light.set_brightness(step / 100)
+    light.wait(1.0)
+
+    # Only the latest state is shown, not every intermediate one
+    assert light.hardware_writes < 20
+    assert light.pixels.frames[-1][1] == 0.99
+
+
+def test_startup_animation_runs_in_the_background():
+    _forget("LightController")
+    pixels = FakeNeoPixelSPI(None, 8, auto_write=False)
+    start = time.perf_counter()
+    light = LightController(pixels=pixels, show_off=True, frame_rate=200)
+    try:
+        assert time.perf_counter() - start < 0.1
+        assert light.animator.playing
+
+        light.cancel()
+        assert light.wait(1.0)
+        assert not light.animator.playing and not pixels.lit()
+    finally:
+        light.close()
+
+
+def test_flash_returns_to_the_steady_state(light):
+    light.turn(True)
+    light.flash(duration=0.05)
+    assert light.wait(2.0)
+
+    # The flash ends dark, the steady state (on) is shown again afterwards
+    assert any(not any(any(color) for color in frame[2]) for frame in light.pixels.frames)
+    assert light.pixels.lit()
+
+
+def test_strobe_shows_the_light_during_the_block(light):
+    with light.strobe(0.5) as strobe:
+        # show() writes before returning, no waiting for the next frame
+        assert light.pixels.frames[-1][1] == 0.5 and light.pixels.lit()
+        assert strobe.on_ns is not None and strobe.off_ns is None
+    assert strobe.off_ns >= strobe.on_ns
+    assert not light.pixels.lit() and not light.on
@@ -0,0 +1,85 @@
+import json
+import time
+import urllib.request
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry, MetricsServer, Histogram
+
+
+@pytest.fixture
+def registry():
+    metrics.REGISTRY.reset()
+    metrics.enable()
+    yield metrics.REGISTRY
+    metrics.enable(False)
+    metrics.REGISTRY.reset()
+
+
+def test_histogram_quantiles():
+    histogram = Histogram("stage", buckets=(0.1, 0.2, 0.5))
+    for value in (0.05, 0.05, 0.15, 0.3, 1.0):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5
+    assert snapshot['sum'] == pytest.approx(1.55)
+    assert snapshot['buckets'] == {'0.1': 2, '0.2': 3, '0.5': 4, '+Inf': 5}
+    assert snapshot['p50'] == pytest.approx(0.15)
+    # Beyond the last bucket the quantile is capped
+    assert snapshot['p99'] == 0.5
+    assert Histogram("empty").quantile(0.5) is None
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+
+    with registry.timer('encode'):
+        pass
+    registry.observe('encode', 0.1)
+    assert registry.snapshot() == {}
+    assert registry.timer('encode') is registry.timer('file_write')
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe('pair_skew', 0.0003)
+
+    text = registry.to_prometheus()
+    assert "# TYPE stereo_pair_skew_seconds histogram" in text
+    assert 'stereo_pair_skew_seconds_bucket{le="0.0005"} 1' in text
+    assert 'stereo_pair_skew_seconds_bucket{le="+Inf"} 1' in text
+    assert "stereo_pair_skew_seconds_count 1" in text
+
+
+def test_server_serves_both_formats():
+    registry = MetricsRegistry(enabled=True)
+    registry.observe('encode', 0.02)
+    server = MetricsServer(registry, port=0)
+    server.start()
+    try:
+        base = f"http://{server.host}:{server.port}"
+        with urllib.request.urlopen(f"{base}/metrics.json") as response:
+            assert json.load(response)['encode']['count'] == 1
+        with urllib.request.urlopen(f"{base}/metrics") as response:
+            assert b"stereo_encode_seconds_sum 0.02" in response.read()
+    finally:
+        server.stop()
+    assert not server.running
+
+
+def test_capture_records_the_stages(cam, numberplate, registry):
+    handle = cam.capture_images("3", numberplate)
+    handle.result(timeout=60)
+
+    snapshot = registry.snapshot()
+    for stage in ('camera_start', 'request_capture', 'pair_skew', 'numberplate_persist'):
+        assert snapshot[stage]['count'] >= 1, stage
+    assert set(snapshot) <= set(metrics.STAGES)
+
+    # Encode/write timings are recorded by a done callback, which may run after the waiter woke up
+    deadline = time.monotonic() + 5
+    while 'file_write' not in registry.snapshot() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert registry.snapshot()['encode']['count'] == registry.snapshot()['file_write']['count'] == 1
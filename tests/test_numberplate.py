@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+from numberplate.store import PlateStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PlateStore(str(tmp_path / "numberplates.sqlite"))
+
+
+def test_increment_stops_at_the_quota(store):
+    assert store.increment("S-AB-1234", quota=2)
+    assert store.increment("S-AB-1234", quota=2)
+    assert not store.increment("S-AB-1234", quota=2)
+    assert store.get("S-AB-1234") == 2
+
+    store.decrement("S-AB-1234")
+    store.decrement("S-AB-1234")
+    store.decrement("S-AB-1234")
+    assert store.get("S-AB-1234") == 0
+    assert store.get("M-XY-1") == 0
+
+
+def test_concurrent_increments_never_exceed_the_quota(store):
+    results = []
+
+    def add():
+        # One store per thread, like separate app processes
+        results.append(PlateStore(store.path).increment("S-AB-1234", quota=5))
+
+    threads = [threading.Thread(target=add) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 5
+    assert store.get("S-AB-1234") == 5
+
+
+def test_legacy_json_is_imported_once(tmp_path):
+    legacy = tmp_path / "numberplates.json"
+    legacy.write_text(json.dumps({"S-AB-1234": 3}))
+    path = str(tmp_path / "numberplates.sqlite")
+
+    store = PlateStore(path, import_json=str(legacy))
+    store.increment("S-AB-1234")
+    legacy.write_text(json.dumps({"S-AB-1234": 1, "M-XY-1": 2}))
+
+    assert PlateStore(path, import_json=str(legacy)).counts() == {"S-AB-1234": 4}
+    store.export_json(str(legacy))
+    assert json.loads(legacy.read_text()) == {"S-AB-1234": 4}
+
+
+def test_numberplate_fills_up(numberplate):
+    assert numberplate.validate() and not numberplate.full
+
+    assert numberplate.add() and numberplate.add()
+    assert numberplate.full
+    assert not numberplate.add()
+    assert numberplate.plates == {"S-AB-1234": 2}
+
+    numberplate.remove()
+    assert not numberplate.full
+
+    # Counts of other processes are seen when switching plates
+    numberplate.store.increment("M-XY-1")
+    numberplate.store.increment("M-XY-1")
+    numberplate.numberplate = "m-xy-1 "
+    assert numberplate.numberplate == "M-XY-1" and numberplate.full
@@ -0,0 +1,104 @@
+import pytest
+
+from cam.pairing import PairCapturer
+from conftest import FastCamera
+
+
+class LaggingCamera(FastCamera):
+    """
+    Delivers its first stale frames 50 ms older than the stream, records every request.
+    """
+
+    def __init__(self, camera_num=0, stale=0, **kwargs):
+        super().__init__(camera_num, **kwargs)
+        self.stale = stale
+        self.requests = []
+
+    def capture_request(self):
+        request = super().capture_request()
+        if self.stale:
+            self.stale -= 1
+            request.metadata['SensorTimestamp'] -= 50_000_000
+        self.requests.append(request)
+        return request
+
+
+def start(camera):
+    camera.configure(camera.create_preview_configuration())
+    camera.start()
+    return camera
+
+
+@pytest.fixture
+def cameras():
+    # Frames 2 ms apart, a replaced frame is within the skew limit
+    left, right = start(LaggingCamera(1, frame_interval=0.002)), start(LaggingCamera(0, frame_interval=0.002))
+    yield left, right
+    left.close()
+    right.close()
+
+
+def test_pair_is_within_skew(cameras):
+    pairs = PairCapturer(*cameras)
+    try:
+        with pairs.capture() as pair:
+            assert pair.attempts == 1
+            assert pair.skew_ms <= pairs.max_skew_ms
+            assert pair.to_dict()['skew_ns'] == pair.left_timestamp - pair.right_timestamp
+        assert all(request.released for camera in cameras for request in camera.requests)
+    finally:
+        pairs.shutdown()
+
+
+def test_stale_frame_is_replaced(cameras):
+    left, right = cameras
+    left.stale = 2
+    pairs = PairCapturer(left, right)
+    try:
+        with pairs.capture() as pair:
+            assert pair.attempts == 3
+            assert pair.skew_ms <= pairs.max_skew_ms
+            # Only the stale side was captured again
+            assert len(left.requests) == 3 and len(right.requests) == 1
+            assert all(request.released for request in left.requests[:2])
+    finally:
+        pairs.shutdown()
+
+
+def test_best_effort_pair_after_max_retries(cameras):
+    left, right = cameras
+    right.stale = 10
+    pairs = PairCapturer(left, right, max_retries=2)
+    try:
+        with pairs.capture() as pair:
+            assert pair.attempts == 3
+            assert pair.skew_ms > pairs.max_skew_ms
+    finally:
+        pairs.shutdown()
+    assert all(request.released for camera in cameras for request in camera.requests)
+
+
+def test_map_runs_both_sides(cameras):
+    pairs = PairCapturer(*cameras)
+    try:
+        assert pairs.map(lambda value: value * 2, 1, 2) == (2, 4)
+    finally:
+        pairs.shutdown()
+
+
+class FailingCamera(FastCamera):
+    def capture_request(self):
+        raise RuntimeError("Camera timed out")
+
+
+def test_failed_pair_releases_the_delivered_request(cameras):
+    left, _ = cameras
+    right = start(FailingCamera(0))
+    pairs = PairCapturer(left, right)
+    try:
+        with pytest.raises(RuntimeError):
+            pairs.capture()
+        assert left.requests and all(request.released for request in left.requests)
+    finally:
+        pairs.shutdown()
+        right.close()
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+
+import pytest
+
+from utils import Resources, singleton
+from conftest import REPO_DIR
+
+
+def test_resources_are_created_in_parallel():
+    def slow(value):
+        def factory():
+            time.sleep(0.2)
+            return value
+        return factory
+
+    resources = Resources({'light': slow(1), 'cam': slow(2), 'numberplate': slow(3)})
+    start = time.perf_counter()
+    resources.start()
+    assert not resources.ready()
+
+    assert [resources.get(name) for name in ('light', 'cam', 'numberplate')] == [1, 2, 3]
+    assert time.perf_counter() - start < 0.5
+    assert resources.ready() and set(resources.seconds) == {'light', 'cam', 'numberplate'}
+    resources.shutdown()
+
+
+def test_get_creates_only_what_is_asked_for():
+    created = []
+    resources = Resources({name: (lambda name=name: created.append(name) or name) for name in ('a', 'b')})
+
+    assert resources.get('a') == 'a'
+    assert created == ['a']
+    assert resources.ready('a') and not resources.ready()
+    resources.shutdown()
+
+
+def test_failed_creation_raises_on_every_get():
+    def broken():
+        raise RuntimeError("no camera")
+
+    resources = Resources({'cam': broken})
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            resources.get('cam')
+    resources.shutdown()
+
+
+def test_singleton_is_created_once_under_threads():
+    created = []
+
+    @singleton
+    class Slow:
+        def __init__(self):
+            created.append(self)
+            time.sleep(0.05)
+
+    barrier = threading.Barrier(8)
+    results = []
+
+    def create():
+        barrier.wait()
+        results.append(Slow())
+
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(instance) for instance in results}) == 1
+    assert len(results) == 8 and created == [results[0]]
+
+
+def test_utils_import_does_not_load_pil():
+    # The service and CLIs import utils, PIL is only needed by the app
+    code = "import sys, utils; sys.exit('PIL' in sys.modules)"
+    src_dir = os.path.join(REPO_DIR, "src")
+    assert subprocess.run([sys.executable, "-c", code], cwd=src_dir).returncode == 0
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+import pytest
+
+from cam.ring import FrameRing
+from cam.quality import sharpness
+
+SHAPE = (8, 8, 3)
+
+
+def fill(ring, count, start_ns=1000):
+    for index in range(count):
+        slot = ring.reserve()
+        ring.left[slot] = index
+        ring.commit(slot, start_ns + 100 * index, -abs(index - 3.0), {'index': index})
+
+
+def test_capacity_for_a_memory_budget():
+    pair_bytes = 2 * 8 * 8 * 3
+    assert FrameRing.capacity_for(10 * pair_bytes, SHAPE) == 10
+    assert FrameRing.capacity_for(1, SHAPE) == 2
+    with pytest.raises(ValueError):
+        FrameRing(0, SHAPE)
+
+
+def test_select_nearest_latest_and_sharpest():
+    ring = FrameRing(4, SHAPE)
+    assert ring.select() is None
+    fill(ring, 6)
+
+    # Frames 2..5 are left, exposed at 1200..1500
+    assert len(ring) == 4
+    assert ring.select() == 5
+    assert ring.select(at_ns=1310) == 3
+    assert ring.select(at_ns=0) == 2
+    assert ring.select(sharpest=True) == 3
+    assert ring.select(window=2, sharpest=True) == 4
+    assert ring.neighbours(3, 3) == [2, 3]
+
+
+def test_pinned_slots_are_not_overwritten():
+    ring = FrameRing(2, SHAPE)
+    fill(ring, 2)
+
+    with ring.read(0) as [(left, _, metadata)]:
+        fill(ring, 2)
+        assert metadata == {'index': 0} and left[0, 0, 0] == 0
+    assert ring.sequence.tolist() == [0, 3]
+
+    [(left, _, metadata)] = ring.copy(3)
+    assert metadata == {'index': 1} and left[0, 0, 0] == 1
+    with pytest.raises(KeyError):
+        ring.copy(1)
+
+
+def test_sharpness_prefers_detail():
+    flat = np.full((64, 64, 3), 128, dtype=np.uint8)
+    noisy = np.random.default_rng(0).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+
+    assert sharpness(noisy) > sharpness(flat) == 0.0
+
+
+def test_zsl_capture_picks_an_exposed_pair(cam, numberplate):
+    ring = cam.enable_zsl(memory_mb=100)
+    assert ring.capacity == 2 and cam.mode == "zsl"
+    assert ring.wait(2, timeout=10)
+
+    click_ns = time.monotonic_ns()
+    handle = cam.capture_images("3", numberplate, at_ns=click_ns)
+    handle.result(timeout=60)
+    assert handle.left_image.shape == (2464, 3280, 3)
+    # The pair was exposed before the capture was asked for
+    assert min(handle.metadata['left_timestamp'], handle.metadata['right_timestamp']) <= click_ns
+
+    assert cam.get_preview()[0].size == cam.PREVIEW_SIZE
+    cam.disable_zsl()
+    assert cam.zsl is None
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import pytest
+
+from service import CaptureService, CaptureClient, ServiceError
+
+
+@pytest.fixture
+def service(cam, light, numberplate, tmp_path):
+    service = CaptureService(cam, light, numberplate, address=str(tmp_path / "capture.sock"), authkey=b"test").start()
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    service.thread = thread
+    yield service
+    service.stop()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(service):
+    with CaptureClient(service.address, b"test") as client:
+        yield client
+
+
+def test_status_and_unknown_commands(client):
+    assert client.ping() == "pong"
+    status = client.status()
+    assert status['clients'] == 1 and status['light']['strobe']
+    with pytest.raises(ServiceError):
+        client.call('format_disk')
+
+
+def test_wrong_authkey_is_rejected(service):
+    with pytest.raises(Exception):
+        CaptureClient(service.address, b"wrong")
+
+
+def test_capture_roundtrip(client, service):
+    result = client.capture("3", "S-AB-1234", count=2, images=False)
+
+    assert len(result['captures']) == 2 and 'left' not in result
+    assert service.cam.catalog.plate_counts() == {"S-AB-1234": 1}
+    assert client.numberplate("S-AB-1234")['count'] == 1
+    assert client.numberplate("S-AB-1234")['quota'] == 2
+    assert client.delete_last()
+    assert client.numberplate("S-AB-1234")['count'] == 0
+
+    with pytest.raises(ServiceError) as error:
+        client.capture(" ", "S-AB-1234")
+    assert error.value.kind == "ValueError" and error.value.message == "A label is required"
+
+
+def test_previews_are_shared(client, service):
+    left, right = client.preview()
+    assert left.shape[:2] == right.shape[:2] == service.cam.PREVIEW_SIZE[::-1]
+
+    frame_id = service.previews.frame[0]
+    client.preview(max_age=60)
+    assert service.previews.frame[0] == frame_id
+
+    frames = list(client.preview_stream(fps=15, max_frames=2))
+    assert len(frames) == 2 and frames[0][0] != frames[1][0]
+
+
+def test_zsl_state_is_shared_by_all_clients(client, service):
+    assert client.zsl(enabled=True, select="sharpest", memory_mb=100)['enabled']
+
+    with CaptureClient(service.address, b"test") as other:
+        # A new session reads the state instead of sending its defaults
+        assert other.status()['zsl']['select'] == "sharpest"
+        assert other.zsl()['enabled']
+    assert client.zsl(enabled=False) == {'enabled': False}
+
+
+def test_shutdown_leaves_the_release_to_the_serving_thread(client, service):
+    assert client.shutdown()
+
+    service.thread.join(timeout=5)
+    assert not service.thread.is_alive()
+    # Nothing is released until the owner calls stop()
+    assert client.ping() == "pong"
+    assert not service.worker._shutdown
+
+    service.stop()
+    assert service.worker._shutdown and not os.path.exists(service.address)
+
+
+def test_capture_sends_display_and_measurement_copies(client):
+    result = client.capture("3", "S-AB-1234", measure_width=1640)
+
+    assert result['left'].shape == result['right'].shape == (616, 820, 3)
+    assert result['measure_left'].shape == result['measure_right'].shape == (1232, 1640)
+    assert 'measure_left' not in client.capture("3", "S-AB-1234")
@@ -0,0 +1,175 @@
+import os
+import json
+import random
+import argparse
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from storage.container import write_pair, read_pair, read_header, StereoPairFile
+from storage.shards import export_shards, iter_samples, load_manifest, plan_shards, write_shard
+from storage.duplicates import BKTree, hamming, fingerprint, find_duplicates
+from storage.__main__ import find_png_pairs, pack
+
+
+def random_pair(shape=(48, 64, 3), seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, shape, dtype=np.uint8), rng.integers(0, 255, shape, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("compression", ["none", "zlib"])
+def test_container_roundtrip(tmp_path, compression):
+    left, right = random_pair()
+    path = str(tmp_path / "pair.stpair")
+
+    write_pair(path, left, right, {'label': "3"}, compression=compression)
+    read_left, read_right, metadata = read_pair(path)
+
+    assert np.array_equal(read_left, left) and np.array_equal(read_right, right)
+    assert metadata == {'label': "3"}
+    assert read_header(path)['arrays']['left']['compression'] == compression
+
+
+def test_uncompressed_container_is_memory_mapped(tmp_path):
+    left, right = random_pair()
+    path = str(tmp_path / "pair.stpair")
+    write_pair(path, left, right)
+
+    pair = StereoPairFile(path)
+    assert isinstance(pair.left, np.memmap) and not pair.left.flags.writeable
+    assert pair.header['arrays']['left']['offset'] % 4096 == 0
+    with pytest.raises(ValueError):
+        write_pair(path, left, right, compression="lz4")
+
+
+def test_not_a_container(tmp_path):
+    path = tmp_path / "pair.stpair"
+    path.write_bytes(b"PNG" * 10)
+
+    with pytest.raises(ValueError):
+        read_header(str(path))
+
+
+def test_capture_into_container(make_cam, numberplate):
+    cam = make_cam(storage_format="stpair")
+    cam.quality.update({'min_sharpness': 1.0})
+
+    handle = cam.capture_images("3", numberplate)
+    (path,) = handle.result(timeout=60)
+
+    left, right, metadata = read_pair(path)
+    assert path.endswith("_3.stpair")
+    assert left.shape == right.shape == (2464, 3280, 3)
+    assert metadata['label'] == "3" and metadata['numberplate'] == "S-AB-1234"
+    assert np.array_equal(left, handle.left_image)
+
+
+def test_pack_png_pairs(tmp_path):
+    images_dir, output_dir = tmp_path / "images", tmp_path / "pairs"
+    images_dir.mkdir()
+    left, right = random_pair()
+    Image.fromarray(left).save(images_dir / "abc_3_L.png")
+    Image.fromarray(right).save(images_dir / "abc_3_R.png")
+    (images_dir / "abc_3.json").write_text(json.dumps({'numberplate': "S-AB-1234"}))
+    # A left image without its right partner is not a pair
+    Image.fromarray(left).save(images_dir / "def_5_L.png")
+
+    assert [pair[0] for pair in find_png_pairs(str(images_dir))] == ["abc_3"]
+    pack(argparse.Namespace(images=str(images_dir), output=str(output_dir), compression="zlib"))
+
+    read_left, read_right, metadata = read_pair(str(output_dir / "abc_3.stpair"))
+    assert np.array_equal(read_left, left) and np.array_equal(read_right, right)
+    assert metadata == {'numberplate': "S-AB-1234", 'label': "3", 'id': "abc"}
+    assert os.listdir(output_dir) == ["abc_3.stpair"]
+
+
+def test_shards_stay_within_budget_and_export_incrementally(cam, numberplate, tmp_path):
+    handles = [cam.capture_images(label, numberplate) for label in ("3", "5")]
+    cam.writer.flush()
+    output_dir = str(tmp_path / "shards")
+    max_bytes = max(sum(os.path.getsize(path) for path in handle.paths) for handle in handles) + 64 * 1024
+
+    entries = export_shards(output_dir, catalog=cam.catalog, max_bytes=max_bytes, workers=2)
+
+    assert len(entries) == 2
+    for entry in entries:
+        assert os.path.getsize(os.path.join(output_dir, entry['name'])) == entry['bytes'] <= max_bytes
+    samples = list(iter_samples(output_dir, decode=True))
+    assert [sample['__key__'] for sample in samples] == [handle.metadata['id'] for handle in handles]
+    assert [sample['metadata']['depth_mm'] for sample in samples] == [3.0, 5.0]
+    assert samples[0]['left'].shape == (2464, 3280, 3)
+
+    # Only captures added since the last export are appended
+    assert export_shards(output_dir, catalog=cam.catalog, max_bytes=max_bytes) == []
+    numberplate.quota = 3
+    numberplate.check_if_full()
+    cam.capture_images("7", numberplate)
+    cam.writer.flush()
+    entries = export_shards(output_dir, catalog=cam.catalog, max_bytes=max_bytes)
+    assert [entry['name'] for entry in entries] == ["shard-000002.tar"]
+    assert len(load_manifest(output_dir)['shards']) == 3
+
+
+def test_shard_budget_includes_the_tar_trailer(tmp_path):
+    captures = []
+    for index in range(3):
+        path = str(tmp_path / f"{index}.stpair")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 4000)
+        captures.append({
+            'id': str(index), 'group_id': str(index), 'numberplate': "P1", 'label': "3", 'depth_mm': 3.0,
+            'config_name': None, 'created_at': index, 'metadata': {}, 'paths': [path],
+        })
+    # The members of all three captures (3 x 5632 bytes) fit, the tar with its
+    # end blocks and record padding (20480 bytes) does not
+    max_bytes = 20000
+
+    shards = plan_shards(captures, max_bytes=max_bytes)
+    assert len(shards) > 1
+    for number, samples in enumerate(shards):
+        entry = write_shard(str(tmp_path / f"shard-{number}.tar"), samples)
+        assert entry['bytes'] <= max_bytes
+
+def test_bktree_matches_brute_force():
+    rng = random.Random(0)
+    keys = [rng.getrandbits(64) for _ in range(500)]
+    # Near copies of some keys
+    keys += [key ^ (1 << rng.randrange(64)) for key in keys[:50]]
+    tree = BKTree()
+    for index, key in enumerate(keys):
+        tree.add(key, index)
+
+    assert len(tree) == len(keys)
+    for query in keys[:20] + [rng.getrandbits(64) for _ in range(20)]:
+        expected = sorted(index for index, key in enumerate(keys) if hamming(query, key) <= 20)
+        assert sorted(index for _, index in tree.find(query, 20)) == expected
+
+
+def test_fingerprint_ignores_exposure():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 200, (616, 820, 3), dtype=np.uint8)
+    brighter = (frame.astype(np.uint16) * 5 // 4).astype(np.uint8)
+    other = rng.integers(0, 200, (616, 820, 3), dtype=np.uint8)
+
+    assert int(fingerprint(frame, frame), 16) == int(fingerprint(brighter, brighter), 16)
+    assert hamming(int(fingerprint(frame, frame), 16), int(fingerprint(other, other), 16)) > 32
+
+
+def test_find_duplicates_keeps_earliest_group():
+    near = f"{1:016x}{0:016x}"
+    far = "f" * 32
+    captures = [
+        {'id': "a", 'group_id': "g1", 'numberplate': "P1", 'created_at': 1, 'fingerprint': "0" * 32},
+        {'id': "b", 'group_id': "g2", 'numberplate': "P1", 'created_at': 2, 'fingerprint': near},
+        {'id': "c", 'group_id': "g3", 'numberplate': "P1", 'created_at': 3, 'fingerprint': far},
+        {'id': "d", 'group_id': "g4", 'numberplate': "P2", 'created_at': 4, 'fingerprint': "0" * 32},
+    ]
+
+    assert find_duplicates(captures) == [
+        {'numberplate': "P1", 'keep': "g1", 'duplicates': [{'group_id': "g2", 'distance': 1}]},
+    ]
+    assert find_duplicates(captures, across_plates=True)[0]['duplicates'] == [
+        {'group_id': "g2", 'distance': 1},
+        {'group_id': "g4", 'distance': 0},
+    ]
@@ -0,0 +1,40 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from cam.writer import ImageWriter
+
+
+@pytest.fixture
+def writer():
+    writer = ImageWriter(workers=1, queue_size=2)
+    yield writer
+    writer.shutdown()
+
+
+def test_pair_is_written_in_the_background(writer, tmp_path):
+    left = np.zeros((48, 64, 3), dtype=np.uint8)
+    right = np.full((48, 64, 3), 255, dtype=np.uint8)
+    paths = [str(tmp_path / "pair_L.png"), str(tmp_path / "pair_R.png")]
+
+    handle = writer.submit(left, right, *paths, str(tmp_path / "pair.json"), {'label': "3"})
+
+    assert handle.result(timeout=60) == tuple(paths)
+    assert handle.done() and writer.pending == 0
+    assert sorted(os.listdir(tmp_path)) == ["pair.json", "pair_L.png", "pair_R.png"]
+    with open(handle.metadata_path) as f:
+        assert json.load(f) == {'label': "3"}
+
+
+def test_failed_write_frees_its_slot(writer, tmp_path):
+    array = np.zeros((8, 8, 3), dtype=np.uint8)
+    missing = str(tmp_path / "missing" / "pair_L.png")
+
+    handles = [writer.submit(array, array, missing, missing) for _ in range(3)]
+
+    for handle in handles:
+        assert isinstance(handle.exception(timeout=60), OSError)
+    writer.flush()
+    assert writer.pending == 0